@@ -1,24 +1,274 @@
-
-import io
-import time
+import datetime as dt
+import functools
 import json
 import os
-import requests
+import time
 import pandas as pd
 import streamlit as st
-import datetime as dt
-
-def load_set_code_map():
+from background_jobs import BackgroundJob
+from batch_runner import DEFAULT_PROCESSES, BatchSource, ProcessBudget, run_batch
+from color_table import load_offline_index
+from card_cache import CardCache
+from checkpoint import RunCheckpoint, checkpoint_path, remove_stale, run_id
+from instrumentation import RunMetrics
+from lookup_engine import DEFAULT_RATE, DEFAULT_WORKERS
+from lookup_service import LookupService
+from result_store import ResultStore, process_rss_bytes
+from pipeline import (DEFAULT_TIMEOUT, build_report, checklist_bytes, export_bytes, fill_colors, frame_digest,
+                      load_set_code_map, missing_columns, pa, read_pull_list)
+from run_memory import RunMemory
+
+def load_default_set_code_map():
     """Load set code mapping from JSON file, with fallback to empty dict"""
     try:
-        with open('set_code_map.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+        return load_set_code_map('set_code_map.json')
     except Exception as e:
         st.warning(f"Could not load set_code_map.json: {e}. Using empty mapping.")
         return {}
 
+@st.cache_resource(show_spinner="Loading offline card index…")
+def load_bulk_index(path):
+    """Open the offline color table or card index built by build_bulk_index.py"""
+    return load_offline_index(path)
+
+def get_run_memory():
+    """Colors from this session's earlier runs, loaded from RUN_MEMORY_PATH on first use if persisted"""
+    if 'run_memory' not in st.session_state:
+        memory = RunMemory()
+        if PERSIST_RUN_MEMORY:
+            try:
+                memory = RunMemory.load(RUN_MEMORY_PATH)
+            except Exception as e:
+                st.warning(f"Could not load {RUN_MEMORY_PATH}: {e}. Starting with no previous results.")
+        st.session_state['run_memory'] = memory
+    return st.session_state['run_memory']
+
+def reuse_controls(run_memory, disabled=False):
+    """Checkbox to reuse earlier results and a button to forget them; returns whether to reuse"""
+    reuse_previous = st.checkbox(
+        f"Reuse colors from previous uploads ({len(run_memory):,} rows remembered)", value=True, disabled=disabled,
+        help="Rows with the same Set, Number, Product Name and Condition as an earlier run skip the lookup.",
+    )
+    if len(run_memory) and st.button("Forget previous results", disabled=disabled,
+                                     help="Stops reusing them in this session; other sessions keep theirs."):
+        run_memory.clear()
+        st.rerun()
+    return reuse_previous
+
+def save_run_memory(run_memory):
+    """Merge this session's new results into RUN_MEMORY_PATH, keeping what other sessions saved there"""
+    if PERSIST_RUN_MEMORY:
+        try:
+            run_memory.save(RUN_MEMORY_PATH)
+        except (OSError, ValueError) as e:
+            st.warning(f"Could not save {RUN_MEMORY_PATH}: {e}")
+
+def upload_checkpoint(files):
+    """Path of the checkpoint for a run over these uploaded files"""
+    return checkpoint_path(CHECKPOINT_DIR, run_id(f.getvalue() for f in files))
+
+def open_checkpoint(files):
+    """Checkpoint to resume a run over these files from, after deleting stale ones; None if it can't be used"""
+    try:
+        remove_stale(CHECKPOINT_DIR, CHECKPOINT_MAX_AGE_HOURS * 3600)
+        return RunCheckpoint(upload_checkpoint(files))
+    except OSError as e:
+        st.warning(f"Could not open a checkpoint in {CHECKPOINT_DIR}: {e}. This run can't be resumed if interrupted.")
+        return None
+
+def resume_caption(files):
+    """Say so if an earlier run over these files was interrupted"""
+    path = upload_checkpoint(files)
+    if os.path.exists(path):
+        st.caption(f"An earlier run of this upload stopped before finishing; {len(RunCheckpoint(path)):,} cards it "
+                   "looked up are saved, and running again resumes from there.")
+
+def fill_colors_job(df, user_map, metrics, checkpoint, store, progress, cancel, **kwargs):
+    """Background job for a single upload; returns the session state entries for its results"""
+    lookup_stats = {}
+    result_df, filled, skipped = fill_colors(df, user_map, stats=lookup_stats, progress=progress, cancel=cancel,
+                                             metrics=metrics, checkpoint=checkpoint, **kwargs)
+    # Keys that weren't looked up, or whose lookup failed, are left in the checkpoint for the next run
+    if checkpoint is not None and not (lookup_stats['cancelled'] or lookup_stats['rate_limited'] or lookup_stats['lookup_errors']):
+        checkpoint.discard()
+    return {'result_key': store.put_frame(result_df), 'result_hash': frame_digest(result_df), 'filled': filled,
+            'skipped': skipped, 'lookup_stats': lookup_stats, 'metrics': metrics}
+
+def batch_job(sources, user_map, checkpoint, store, budget, progress, cancel, **kwargs):
+    """Background job for a multi-file upload, on the worker processes free in `budget`; returns its session state entries"""
+    with budget.reserve(len(sources)) as processes:
+        batch_results, batch_summary = run_batch(sources, user_map, processes=processes, progress=progress,
+                                                 cancel=cancel, checkpoint=checkpoint, **kwargs)
+    if checkpoint is not None and not (batch_summary['cancelled_lookups'] or batch_summary['rate_limited_lookups']
+                                       or batch_summary['failed_lookups']):
+        checkpoint.discard()
+    keys = store.put_bytes_many([data for result in batch_results for data in (result.pop('csv'), result.pop('checklist'))])
+    for result, csv_key, checklist_key in zip(batch_results, keys[::2], keys[1::2]):
+        result['csv_key'], result['checklist_key'] = csv_key, checklist_key
+    return {'batch_results': batch_results, 'batch_summary': batch_summary}
+
+def stored_result_keys():
+    """Result store keys of this session's results"""
+    keys = [st.session_state['result_key']] if 'result_key' in st.session_state else []
+    for result in st.session_state.get('batch_results', []):
+        keys += [result['csv_key'], result['checklist_key']]
+    return keys
+
+def forget_results(store):
+    """Drop this session's results, and their entries in the result store"""
+    store.discard(stored_result_keys())
+    for key in RESULT_KEYS:
+        st.session_state.pop(key, None)
+
+def results_evicted(store):
+    """If the store evicted any of this session's results, forget them all and say so; returns whether it did"""
+    keys = stored_result_keys()
+    if all(key in store for key in keys):
+        return False
+    forget_results(store)
+    st.warning("These results were cleared to free server memory. Run again to rebuild them; "
+               "cards already looked up are not requested again.")
+    return True
+
+def memory_gauge(store):
+    """Compacted results of all sessions against their memory budget, and the server process's RSS"""
+    stats = store.stats()
+    rss = process_rss_bytes()
+    st.write("**Server memory**")
+    st.progress(min(stats['used_bytes'] / stats['budget_bytes'], 1.0),
+                text=f"Stored results: {stats['used_bytes'] / 2**20:.1f} of {stats['budget_bytes'] / 2**20:.0f} MB"
+                     f" | {stats['entries']} entries | {stats['evictions']} evicted"
+                     + (f" | Process RSS: {rss / 2**20:.0f} MB" if rss is not None else ""))
+
+def start_job(fn, *args, **kwargs):
+    """Start a run in the background, dropping the results of the previous one"""
+    forget_results(result_store)
+    st.session_state['job'] = BackgroundJob(fn, *args, **kwargs)
+    # Redraw the page with the run buttons disabled
+    st.rerun()
+
+def finish_job():
+    """Move the results of a finished job into session state; they stay there across reruns"""
+    job = st.session_state.get('job')
+    if job is None or not job.done():
+        return
+    del st.session_state['job']
+    if job.error is not None:
+        st.session_state['job_error'] = str(job.error)
+    else:
+        st.session_state.update(job.result)
+    save_run_memory(get_run_memory())
+
+def job_progress():
+    """Progress bar and Cancel button of the running job, redrawn every PROGRESS_REFRESH_SECONDS as a fragment"""
+    job = st.session_state.get('job')
+    if job is None:
+        return
+    if job.done():
+        # Rerun the whole page so finish_job() picks the results up
+        st.rerun()
+    fraction, text = job.progress
+    st.progress(min(max(fraction, 0.0), 1.0), text=f"{text} ({job.elapsed:.0f} s)")
+    if job.cancelled:
+        st.caption("Cancelling… lookups already in flight are finishing.")
+    elif st.button("⏹️ Cancel", key="cancel_job"):
+        job.cancel()
+
+EXPORTERS = {
+    'csv': functools.partial(export_bytes, export_format="csv"),
+    'csv.gz': functools.partial(export_bytes, export_format="csv.gz"),
+    'parquet': functools.partial(export_bytes, export_format="parquet"),
+    'checklist': checklist_bytes,
+}
+
+def build_export(kind, result_hash, day, _load_frame):
+    """
+    One of a result's EXPORTERS files, cached per content hash as export_file(); returns it with the seconds it took.
+
+    `day` is part of the cache key only: the checklist is stamped with the date it was generated, so it's
+    rebuilt the next day; the other files pass None and stay cached.
+    """
+    result_df = _load_frame()
+    if result_df is None:
+        raise RuntimeError("These results were cleared to free server memory; run again to download them.")
+    start = time.perf_counter()
+    data = EXPORTERS[kind](result_df)
+    return data, time.perf_counter() - start
+
+def export_data(kind, result_hash, load_frame, metrics, stage):
+    """export_file()'s bytes, recording the time it took to build them as a stage of the run"""
+    data, seconds = export_file(kind, result_hash, dt.date.today() if kind == 'checklist' else None, load_frame)
+    if metrics is not None:
+        metrics.record_stage(stage, seconds)
+    return data
+
+def export_download(container, kind, icon, label, file_name, mime, stage, metrics, rows, lazy=False):
+    """
+    A download button for one of the result's EXPORTERS files. For a large
+    result (or lazy=True) a "Prepare" button comes first, so the file is only
+    built once asked for; after that it's cached for the result like the rest.
+    The result's frame is only rebuilt from the store to build a file.
+    """
+    result_hash = st.session_state['result_hash']
+    prepared = st.session_state.setdefault('prepared_exports', set())
+    if (lazy or rows > LAZY_EXPORT_ROWS) and (kind, result_hash) not in prepared:
+        if not container.button(f"⚙️ Prepare {label}", key=f"prepare_{kind}"):
+            return
+        prepared.add((kind, result_hash))
+    load_frame = functools.partial(result_store.frame, st.session_state['result_key'])
+    try:
+        data = export_data(kind, result_hash, load_frame, metrics, stage)
+    except RuntimeError as e:
+        container.warning(str(e))
+        return
+    container.download_button(f"{icon} Download {label}", data=data, file_name=file_name, mime=mime)
+
+def load_stored_file(key):
+    """Bytes a batch run left in the result store, cached per store key as stored_file()"""
+    data = result_store.data(key)
+    if data is None:
+        raise RuntimeError("These results were cleared to free server memory; run again to download them.")
+    return data
+
+def stored_download(container, key, icon, label, file_name, mime, widget_key):
+    """
+    A download button for bytes kept in the result store, e.g. one file of a
+    batch run. A "Prepare" button comes first, as in export_download(), so
+    reruns don't decompress every file's bytes just to draw the buttons.
+    """
+    prepared = st.session_state.setdefault('prepared_exports', set())
+    if ('stored', key) not in prepared:
+        if not container.button(f"⚙️ Prepare {label}", key=f"prepare_{widget_key}"):
+            return
+        prepared.add(('stored', key))
+    try:
+        data = stored_file(key)
+    except RuntimeError as e:
+        container.warning(str(e))
+        return
+    container.download_button(f"{icon} {label}", data=data, file_name=file_name, mime=mime, key=widget_key)
+
+@st.cache_resource
+def get_result_store(budget_mb):
+    """One result store per server process; every session's results count against its budget"""
+    return ResultStore(budget_mb * 2**20)
+
+@st.cache_resource
+def get_lookup_service(requests_per_second):
+    """One lookup service per server process: every session shares its rate limit and in-flight lookups"""
+    return LookupService(requests_per_second)
+
+@st.cache_resource
+def get_process_budget(processes):
+    """One pool of batch worker processes per server process, shared by every session's batch runs"""
+    return ProcessBudget(processes)
+
+@st.cache_resource
+def open_card_cache(path, ttl_days, max_entries, negative_ttl_days):
+    """Open the persistent lookup cache once per server process"""
+    return CardCache(path, ttl_seconds=ttl_days * 24 * 3600, max_entries=max_entries,
+                     negative_ttl_seconds=negative_ttl_days * 24 * 3600)
+
 st.set_page_config(page_title="TCGplayer Pull List Organizer", page_icon="🧙", layout="wide")
 
 # WOOBUL Collectibles brand color (dark teal/deep blue from logo)
@@ -147,15 +397,50 @@ with st.expander("How it works"):
     )
 
 # Load set code mapping from external JSON file
-DEFAULT_SET_CODE_MAP = load_set_code_map()
+DEFAULT_SET_CODE_MAP = load_default_set_code_map()
 
 # Default settings
-throttle = 0.08
-timeout = 20
+# Scryfall request budget of the whole server process, shared by all sessions
+requests_per_second = DEFAULT_RATE
+workers = DEFAULT_WORKERS
+engine = "thread"  # or "async"
+timeout = DEFAULT_TIMEOUT
 max_rows = 0
+# Worker processes enriching the files of multi-file uploads, shared by all sessions; a batch started while
+# they're all busy enriches its files in its own process
+processes = min(2, DEFAULT_PROCESSES)
+# Offline mode uses the memory-mapped color table if present, else the JSON card index
+COLOR_TABLE_PATH = "color_table.bin"
+BULK_INDEX_PATH = "bulk_index.json"
+CARD_CACHE_PATH = "card_cache.sqlite3"
+CARD_CACHE_TTL_DAYS = 30
+CARD_CACHE_MAX_ENTRIES = 200_000
+# Cards Scryfall couldn't find are skipped for this long before being tried again
+CARD_CACHE_NEGATIVE_TTL_DAYS = 3
+# Rows already resolved in an earlier upload are reused; set PERSIST_RUN_MEMORY to keep them across restarts
+RUN_MEMORY_PATH = "run_memory.json"
+PERSIST_RUN_MEMORY = False
+# Lookups are checkpointed so an interrupted run of the same upload resumes; unfinished checkpoints expire
+CHECKPOINT_DIR = "checkpoints"
+CHECKPOINT_MAX_AGE_HOURS = 24
+# Runs happen in a background job; its progress bar is redrawn this often (seconds)
+PROGRESS_REFRESH_SECONDS = 0.5
+# Results of every session are kept compressed in one store, evicting the least recently used beyond this
+RESULT_STORE_BUDGET_MB = 256
+# Downloads are built once per result and cached, up to this many files per server process
+EXPORT_CACHE_ENTRIES = 16
+# Results with more rows than this build their downloads only when asked to (gzip and Parquet always do)
+LAZY_EXPORT_ROWS = 50_000
+# Session state entries holding the results of the last run
+RESULT_KEYS = ('result_key', 'result_hash', 'filled', 'skipped', 'lookup_stats', 'metrics', 'batch_results', 'batch_summary',
+               'job_error', 'prepared_exports')
 
 st.subheader("1) Upload CSV")
-uploaded = st.file_uploader("Choose your CSV", type=["csv"])
+uploads = st.file_uploader(
+    "Choose your CSV(s)", type=["csv"], accept_multiple_files=True,
+    help="Upload several pull lists (e.g. one per storefront) to process them as one batch.",
+)
+uploaded = uploads[0] if len(uploads) == 1 else None
 
 st.subheader("2) Configure Set Name → Set Code mapping (optional)")
 st.caption("If your 'Set' values look different, edit or add to this mapping.")
@@ -167,229 +452,45 @@ except Exception as e:
     st.error(f"Invalid mapping JSON: {e}")
     user_map = DEFAULT_SET_CODE_MAP
 
-def clean_cn(v):
-    s = str(v).strip()
-    return s[:-2] if s.endswith(".0") else s
-
-def color_from_card(card):
-    ci = card.get("color_identity") or []
-    typ = (card.get("type_line") or "")
-    # Lands have empty color_identity by design
-    if "Land" in typ:
-        return "L"
-    if not ci:
-        # true colorless, artifacts, eldrazi, etc.
-        if "Artifact" in typ or "Eldrazi" in typ:
-            return "C"
-        return "C" if (card.get("colors")==[] or "Colorless" in (card.get("color_indicator") or "")) else ""
-    if len(ci) > 1:
-        return "Gd"
-    return {"W":"W","U":"U","B":"B","R":"R","G":"G"}.get(ci[0], "")
-
-def fetch_card(set_code, cn, name):
-    # 1) direct set+collector endpoint
-    url = f"https://api.scryfall.com/cards/{set_code}/{cn}"
-    r = requests.get(url, timeout=timeout)
-    if r.status_code == 200:
-        return r.json()
-    # 2) search by set+cn
-    r = requests.get("https://api.scryfall.com/cards/search", params={"q": f"e:{set_code} cn:{cn}"}, timeout=timeout)
-    if r.status_code == 200 and (r.json().get("data") or []):
-        return r.json()["data"][0]
-    # 3) search by set+exact name (collector variants sometimes)
-    r = requests.get("https://api.scryfall.com/cards/search", params={"q": f'!"{name}" e:{set_code}'}, timeout=timeout)
-    if r.status_code == 200 and (r.json().get("data") or []):
-        return r.json()["data"][0]
-    return None
-
-def is_foil(condition):
-    """Check if condition indicates foil - returns '*' for foil, '' for non-foil"""
-    if pd.isna(condition):
-        return ""
-    condition_str = str(condition).lower()
-    return "*" if "foil" in condition_str else ""
-
-def get_pokemon_holofoil_type(condition, product_line):
-    """For Pokemon cards, detect if holofoil or reverse holofoil. Returns 'RH' for reverse, 'H' for holofoil, '' for non-foil"""
-    if pd.isna(condition) or pd.isna(product_line):
-        return ""
-    product_line_str = str(product_line).strip()
-    # Handle both "Pokemon" and "Pokemon Japan" product lines
-    if product_line_str not in ["Pokemon", "Pokemon Japan"]:
-        return ""
-    condition_str = str(condition).lower()
-    # Check for reverse holofoil first (more specific)
-    if "reverse holofoil" in condition_str:
-        return "RH"
-    # Check for holofoil (handles "Near Mint Holofoil", "Near Mint Holofoil - Japanese", etc.)
-    if "holofoil" in condition_str:
-        return "H"
-    return ""
-
-def fill_colors(df, set_map):
-    df = df.copy()
-    if "Color" not in df.columns:
-        df["Color"] = ""
-    
-    # Add Foil column for all rows (for CSV export)
-    if "Condition" in df.columns:
-        df["Foil"] = df["Condition"].apply(is_foil)
-        # Also create a Yes/No version for CSV clarity
-        df["Is Foil"] = df["Condition"].apply(lambda x: "Yes" if "foil" in str(x).lower() else "No" if not pd.isna(x) else "No")
-        # Add Pokemon holofoil type column
-        if "Product Line" in df.columns:
-            df["Pokemon Holofoil"] = df.apply(lambda row: get_pokemon_holofoil_type(row.get("Condition", ""), row.get("Product Line", "")), axis=1)
-        else:
-            df["Pokemon Holofoil"] = ""
-    else:
-        df["Foil"] = ""
-        df["Is Foil"] = "No"
-        df["Pokemon Holofoil"] = ""
-
-    magic_mask = df["Product Line"].astype(str).str.strip().eq("Magic")
-    candidates = df[magic_mask].copy()
-
-    total = len(candidates)
-    if max_rows and max_rows > 0:
-        candidates = candidates.head(max_rows)
-        total = len(candidates)
-
-    progress = st.progress(0.0, text="Working…")
-    status = st.empty()
-
-    filled = 0
-    skipped = 0
-
-    for i, (idx, row) in enumerate(candidates.iterrows(), start=1):
-        set_name = str(row.get("Set","")).strip()
-        set_code = set_map.get(set_name)
-        cn = clean_cn(row.get("Number",""))
-        name = str(row.get("Product Name","")).strip()
-
-        if not set_code or not cn:
-            skipped += 1
-            progress.progress(i/total, text=f"Skipping (missing set code or collector #): {name}")
-            continue
-
+bulk_index = None
+offline_path = next((p for p in (COLOR_TABLE_PATH, BULK_INDEX_PATH) if os.path.exists(p)), None)
+if offline_path:
+    if st.checkbox("Offline mode: resolve cards from the local Scryfall bulk index (no API calls)", value=True):
         try:
-            card = fetch_card(set_code, cn, name)
-        except Exception:
-            card = None
-
-        if card:
-            color = color_from_card(card)
-            df.at[idx, "Color"] = color
-            filled += 1
-            progress.progress(i/total, text=f"Filled {filled} / {total} — {name} [{set_code} {cn}] → {color or '∅'}")
-        else:
-            skipped += 1
-            progress.progress(i/total, text=f"No match found: {name} [{set_code} {cn}]")
-
-        time.sleep(throttle)
-
-    status.info(f"Done. Filled: {filled} | Skipped/Unknown: {skipped}")
-    progress.empty()
-    return df, filled, skipped
-
-def make_printable_checklist(df):
-    # Build checklist HTML
-    cols = ["Product Name", "Quantity", "Color", "Number", "Set", "Product Line"]
-    safe_df = df.copy()
-    for c in cols:
-        if c not in safe_df.columns:
-            safe_df[c] = ""
-    # Add Foil asterisk if not present
-    if "Foil" not in safe_df.columns:
-        safe_df["Foil"] = ""
-    # Add Pokemon Holofoil column if not present
-    if "Pokemon Holofoil" not in safe_df.columns:
-        safe_df["Pokemon Holofoil"] = ""
-    out = safe_df[cols + ["Foil", "Pokemon Holofoil"]].copy()
-    
-    # Sort by Set, Foiled, Product Name, Color
-    # Create a sort key for foil type: non-foil first, then foil, then holofoil types
-    def get_foil_sort_key(row):
-        foil_type = str(row.get("Pokemon Holofoil", "")).strip()
-        has_foil = str(row.get("Foil", "")).strip() != ""
-        # Non-foil = 0, regular foil = 1, holofoil = 2, reverse holofoil = 3
-        if foil_type == "RH":
-            return 3
-        elif foil_type == "H":
-            return 2
-        elif has_foil:
-            return 1
-        else:
-            return 0
-    
-    out["_foil_sort"] = out.apply(get_foil_sort_key, axis=1)
-    out = out.sort_values(
-        by=["Set", "_foil_sort", "Product Name", "Color"],
-        ascending=[True, True, True, True],
-        na_position="last"
-    )
-    out = out.drop(columns=["_foil_sort"])
-    
-    # Calculate total cards to pull
-    try:
-        # Try to convert Quantity to numeric, handling any .0 floats
-        qty_series = pd.to_numeric(out["Quantity"], errors='coerce').fillna(0)
-        total_cards = int(qty_series.sum())
-    except Exception:
-        total_cards = 0
-    total_unique_cards = len(out)
-
-    date_str = dt.datetime.now().strftime("%Y-%m-%d")
-    # HTML with print styles
-    rows_html = "\n".join([
-        f"<tr><td class='cb'>☐</td><td>{(r['Quantity'])}</td><td>{r['Foil']}{' (' + r['Pokemon Holofoil'] + ')' if r['Pokemon Holofoil'] else ''}</td><td>{(r['Product Name'])}</td><td>{(r['Color'])}</td><td>{(r['Set'])}</td><td>{(r['Number'])}</td><td>{(r['Product Line'])}</td></tr>"
-        for _, r in out.iterrows()
-    ])
-
-    html = f"""<!doctype html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>TCGplayer Pull List Checklist {date_str}</title>
-<style>
-  @media print {{
-    @page {{ size: A4 portrait; margin: 12mm; }}
-  }}
-  body {{ font-family: -apple-system, BlinkMacSystemFont, Segoe UI, Roboto, Arial, sans-serif; }}
-  h1 {{ font-size: 18pt; margin: 0 0 10px; }}
-  .meta {{ font-size: 10pt; color: #444; margin-bottom: 12px; }}
-  table {{ width: 100%; border-collapse: collapse; }}
-  th, td {{ border: 1px solid #ccc; padding: 6px 8px; font-size: 10.5pt; }}
-  th {{ background: #f5f5f5; text-align: left; }}
-  td.cb {{ width: 22px; text-align: center; font-weight: bold; }}
-  .footer {{ margin-top: 14px; font-size: 9pt; color: #666; }}
-</style>
-</head>
-<body>
-<h1>TCGplayer Pull List Checklist</h1>
-<div class="meta">Generated {date_str}</div>
-<div class="meta" style="margin-bottom: 15px;">
-  <strong>Total Cards to Pull: {total_cards}</strong> | <strong>Unique Items: {total_unique_cards}</strong>
-</div>
-<table>
-  <thead>
-    <tr><th>✓</th><th>Quantity</th><th>Foiled</th><th>Product Name</th><th>Color</th><th>Set</th><th>Number</th><th>Product Line</th></tr>
-  </thead>
-  <tbody>
-{rows_html}
-  </tbody>
-</table>
-<div class="footer">* = Foil card | (H) = Holofoil, (RH) = Reverse Holofoil (Pokemon) | Tip: Use your browser's Print dialog to save as PDF or print directly.</div>
-</body>
-</html>"""
-    return html
+            bulk_index = load_bulk_index(offline_path)
+        except Exception as e:
+            st.warning(f"Could not load {offline_path}: {e}. Falling back to the Scryfall API.")
+
+try:
+    card_cache = open_card_cache(CARD_CACHE_PATH, CARD_CACHE_TTL_DAYS, CARD_CACHE_MAX_ENTRIES, CARD_CACHE_NEGATIVE_TTL_DAYS)
+except Exception as e:
+    st.warning(f"Could not open {CARD_CACHE_PATH}: {e}. Running without the lookup cache.")
+    card_cache = None
+
+if card_cache is not None:
+    with st.expander("Cards not found on Scryfall"):
+        st.caption(f"Cards no lookup found are skipped for {CARD_CACHE_NEGATIVE_TTL_DAYS} days. "
+                   "After fixing a set's mapping, clear them here to look them up again.")
+        clear_set = st.text_input("Set code or set name", key="clear_unresolved_set")
+        if st.button("Clear not-found cards for this set", disabled=not clear_set.strip()):
+            clear_code = user_map.get(clear_set.strip(), clear_set.strip())
+            removed = card_cache.clear_unresolved(clear_code)
+            st.success(f"Cleared {removed} not-found card(s) for set {clear_code}.")
 
 # ---------- Main flow ----------
+result_store = get_result_store(RESULT_STORE_BUDGET_MB)
+finish_job()
+job_running = 'job' in st.session_state
+# Only drawn while a job runs, so idle pages don't rerun the fragment every PROGRESS_REFRESH_SECONDS
+show_job_progress = st.fragment(job_progress, run_every=PROGRESS_REFRESH_SECONDS)
+export_file = st.cache_data(build_export, max_entries=EXPORT_CACHE_ENTRIES, show_spinner=False)
+stored_file = st.cache_data(load_stored_file, max_entries=EXPORT_CACHE_ENTRIES, show_spinner=False)
+
 if uploaded is not None:
+    metrics = RunMetrics()
     try:
-        df = pd.read_csv(uploaded)
-        # Remove the last row
-        if len(df) > 0:
-            df = df.iloc[:-1]
+        with metrics.stage("parse_csv"):
+            df = read_pull_list(uploaded)
     except Exception as e:
         st.error(f"Failed to read CSV: {e}")
         st.stop()
@@ -397,56 +498,74 @@ if uploaded is not None:
     st.write("### Preview")
     st.dataframe(df.head(20), use_container_width=True)
 
-    required_cols = ["Product Line","Product Name","Set","Number"]
-    missing = [c for c in required_cols if c not in df.columns]
+    missing = missing_columns(df)
     if missing:
         st.error(f"Missing required column(s): {', '.join(missing)}")
         st.stop()
 
-    if st.button("▶️ Fill Colors with Scryfall"):
-        result_df, filled, skipped = fill_colors(df, user_map)
-        # Store results in session state
-        st.session_state['result_df'] = result_df
-        st.session_state['filled'] = filled
-        st.session_state['skipped'] = skipped
-
-    # Show results and download buttons if they exist in session state
-    if 'result_df' in st.session_state:
-        result_df = st.session_state['result_df']
+    run_memory = get_run_memory()
+    reuse_previous = reuse_controls(run_memory, disabled=job_running)
+
+    if not job_running and bulk_index is None:
+        resume_caption([uploaded])
+    if st.button("▶️ Fill Colors with Scryfall", disabled=job_running):
+        start_job(
+            fill_colors_job, df, user_map, metrics, open_checkpoint([uploaded]) if bulk_index is None else None, result_store,
+            bulk_index=bulk_index, cache=card_cache, service=get_lookup_service(requests_per_second),
+            workers=workers, timeout=timeout, max_rows=max_rows,
+            engine=engine, reuse=run_memory if reuse_previous else None,
+        )
+    if job_running:
+        show_job_progress()
+    if 'job_error' in st.session_state:
+        st.error(f"Run failed: {st.session_state['job_error']}")
+
+    # Show results and download buttons if they exist in session state; only downloads rebuild the whole frame
+    preview = result_store.preview(st.session_state['result_key']) if 'result_key' in st.session_state else None
+    if preview is None and 'result_key' in st.session_state:
+        results_evicted(result_store)
+    if preview is not None:
+        preview_df, result_rows = preview
         filled = st.session_state.get('filled', 0)
         skipped = st.session_state.get('skipped', 0)
+        lookup_stats = st.session_state.get('lookup_stats', {})
+        rate_limited = lookup_stats.get("rate_limited", 0)
+        lookup_errors = lookup_stats.get("lookup_errors", 0)
+        cancelled = lookup_stats.get("cancelled", 0)
+        known_missing = lookup_stats.get("cache", {}).get("negative_hits", 0)
+        st.info(("Cancelled." if cancelled else "Done.")
+                + f" Filled: {filled} | Skipped/Unknown: {skipped} | Unique lookups: {lookup_stats.get('unique_lookups', 0)} for {lookup_stats.get('lookup_rows', 0)} rows"
+                + f" | Reused from previous runs: {lookup_stats.get('reused_rows', 0)} | Looked up: {lookup_stats.get('looked_up_rows', 0)}"
+                + (f" | Resumed from checkpoint: {lookup_stats['resumed_lookups']}" if lookup_stats.get('resumed_lookups') else "")
+                + (f" | Previously not found: {known_missing}" if known_missing else "")
+                + (f" | Rate limited (try again later): {rate_limited}" if rate_limited else "")
+                + (f" | Lookup errors (run again to retry): {lookup_errors}" if lookup_errors else "")
+                + (f" | Not looked up (run again to finish): {cancelled}" if cancelled else ""))
 
         # Show result preview
         st.write("### Result Preview")
-        st.dataframe(result_df.head(20), use_container_width=True)
+        st.dataframe(preview_df, use_container_width=True)
 
-        # CSV download
-        csv_buf = io.StringIO()
-        result_df.to_csv(csv_buf, index=False)
-        st.download_button(
-            "📥 Download CSV with Colors",
-            data=csv_buf.getvalue(),
-            file_name="tcg_with_colors.csv",
-            mime="text/csv",
-        )
+        run_metrics = st.session_state.get('metrics')
+
+        # CSV download, and compressed / columnar versions of it for inventory tooling
+        csv_col, gzip_col, parquet_col = st.columns(3)
+        export_download(csv_col, 'csv', "📥", "CSV with Colors", "tcg_with_colors.csv", "text/csv", "csv_export", run_metrics,
+                        result_rows)
+        export_download(gzip_col, 'csv.gz', "🗜️", "CSV (gzip)", "tcg_with_colors.csv.gz", "application/gzip",
+                        "csv_gz_export", run_metrics, result_rows, lazy=True)
+        if pa is not None:
+            export_download(parquet_col, 'parquet', "🧱", "Parquet", "tcg_with_colors.parquet", "application/vnd.apache.parquet",
+                            "parquet_export", run_metrics, result_rows, lazy=True)
 
         # Printable checklist (HTML)
         st.write("### Printable Checklist")
-        checklist_html = make_printable_checklist(result_df)
-        st.download_button(
-            "🖨️ Download Printable Checklist (HTML)",
-            data=checklist_html.encode("utf-8"),
-            file_name="mtg_checklist.html",
-            mime="text/html",
-        )
+        export_download(st, 'checklist', "🖨️", "Printable Checklist (HTML)", "mtg_checklist.html", "text/html", "checklist",
+                        run_metrics, result_rows)
         st.caption("Open the HTML and use your browser's **Print** → **Save as PDF** for a clean PDF.")
 
         # JSON report
-        report = {
-            "filled": int(filled),
-            "skipped_or_unknown": int(skipped),
-            "rows": int(len(result_df)),
-        }
+        report = build_report(result_rows, filled, skipped, st.session_state.get('lookup_stats'), metrics=run_metrics)
         st.download_button(
             "📄 Download run report (JSON)",
             data=json.dumps(report, indent=2),
@@ -454,5 +573,88 @@ if uploaded is not None:
             mime="application/json",
         )
 
+        if 'diagnostics' in report:
+            with st.expander("Diagnostics"):
+                diagnostics = report['diagnostics']
+                st.write("**Time per stage (seconds)**")
+                st.dataframe(pd.Series(diagnostics['stages_seconds'], name="seconds").to_frame(), use_container_width=True)
+                if diagnostics['http']:
+                    st.write(f"**Scryfall requests**: {diagnostics['http_calls']} calls | Retries: {diagnostics['retries']}"
+                             f" | Waiting on the rate limit: {diagnostics['throttle_wait_seconds']} s"
+                             f" | Cards shared with other sessions' lookups: {diagnostics['shared_lookups']}")
+                    tiers = pd.DataFrame({
+                        tier: {
+                            "calls": t['calls'],
+                            "retries": t['retries'],
+                            "lookups": t['lookups'],
+                            "found": t['found'],
+                            "success rate": t['success_rate'],
+                            "mean ms": t['latency_ms']['mean'],
+                            "max ms": t['latency_ms']['max'],
+                        }
+                        for tier, t in diagnostics['http'].items()
+                    }).T
+                    st.dataframe(tiers, use_container_width=True)
+                    st.write("**Latency histogram (calls per bucket)**")
+                    st.bar_chart(pd.DataFrame({tier: t['latency_ms']['histogram'] for tier, t in diagnostics['http'].items()}))
+                memory_gauge(result_store)
+
+elif uploads:
+    st.write(f"### Batch of {len(uploads)} files")
+    st.caption("Cards that appear in several files are looked up once, then the files are enriched in parallel.")
+    st.dataframe(pd.DataFrame({"file": [f.name for f in uploads], "size (KB)": [round(f.size / 1024, 1) for f in uploads]}),
+                 use_container_width=True, hide_index=True)
+
+    run_memory = get_run_memory()
+    reuse_previous = reuse_controls(run_memory, disabled=job_running)
+
+    if not job_running and bulk_index is None:
+        resume_caption(uploads)
+    if st.button(f"▶️ Fill Colors for {len(uploads)} files", disabled=job_running):
+        start_job(
+            batch_job, [BatchSource(f.name, data=f.getvalue()) for f in uploads], user_map,
+            open_checkpoint(uploads) if bulk_index is None else None, result_store, get_process_budget(processes),
+            reuse=run_memory if reuse_previous else None, bulk_index=bulk_index, cache=card_cache,
+            service=get_lookup_service(requests_per_second), workers=workers, timeout=timeout, engine=engine,
+        )
+    if job_running:
+        show_job_progress()
+    if 'job_error' in st.session_state:
+        st.error(f"Run failed: {st.session_state['job_error']}")
+
+    if 'batch_results' in st.session_state and not results_evicted(result_store):
+        batch_results = st.session_state['batch_results']
+        batch_summary = st.session_state['batch_summary']
+        rate_limited = batch_summary['rate_limited_lookups']
+        failed = batch_summary['failed_lookups']
+        cancelled = batch_summary['cancelled_lookups']
+        st.info(("Cancelled." if cancelled else "Done.")
+                + f" Files: {len(batch_results)} | Filled: {batch_summary['filled']} | Skipped/Unknown: {batch_summary['skipped_or_unknown']}"
+                + f" | Unique lookups: {batch_summary['unique_lookups']} for {batch_summary['file_keys']} per-file cards"
+                + f" | {batch_summary['seconds']:.1f} s"
+                + (f" | Resumed from checkpoint: {batch_summary['resumed_lookups']}" if batch_summary.get('resumed_lookups') else "")
+                + (f" | Rate limited (try again later): {rate_limited}" if rate_limited else "")
+                + (f" | Lookup errors (run again to retry): {failed}" if failed else "")
+                + (f" | Cards not looked up (run again to finish): {cancelled}" if cancelled else ""))
+        st.dataframe(pd.DataFrame(batch_summary['files']), use_container_width=True, hide_index=True)
+        st.download_button(
+            "📄 Download batch summary (JSON)",
+            data=json.dumps(batch_summary, indent=2),
+            file_name="batch_summary.json",
+            mime="application/json",
+        )
+        for n, result in enumerate(batch_results):
+            with st.expander(f"{result['name']} — filled {result['filled']} of {result['rows']} rows"):
+                csv_col, checklist_col, report_col = st.columns(3)
+                stored_download(csv_col, result['csv_key'], "📥", "CSV with Colors",
+                                f"{result['stem']}_with_colors.csv", "text/csv", f"batch_csv_{n}")
+                stored_download(checklist_col, result['checklist_key'], "🖨️", "Checklist (HTML)",
+                                f"{result['stem']}_checklist.html", "text/html", f"batch_checklist_{n}")
+                report_col.download_button("📄 Report (JSON)", data=json.dumps(result['report'], indent=2),
+                                           file_name=f"{result['stem']}_report.json", mime="application/json",
+                                           key=f"batch_report_{n}")
+        with st.expander("Diagnostics"):
+            memory_gauge(result_store)
+
 else:
     st.info("Upload a CSV to begin.")
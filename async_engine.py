@@ -0,0 +1,109 @@
+"""
+Asyncio lookup engine, an alternative to the thread pool in lookup_engine.
+
+Every task runs as a coroutine on one event loop thread, so thousands of
+keys can be in progress at once while a semaphore bounds the HTTP requests
+actually in flight. Requests are sent natively with an aiohttp
+ClientSession (scryfall_client.async_request), with the same retry logic and the same
+TokenBucket as the threaded engine, so both engines produce the same
+results without holding an OS thread per request. Stopping a run is
+noticed within CANCEL_POLL_SECONDS and cancels every task that hasn't
+finished, including requests in flight, whose results are dropped.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from lookup_engine import DEFAULT_WORKERS, LookupCancelled
+from scryfall_client import make_async_client
+
+# How often the cancel event is polled while waiting on tasks
+CANCEL_POLL_SECONDS = 0.1
+
+
+class RequestSlots:
+    """Runs request coroutines on the run's aiohttp ClientSession, at most `limit` at a time"""
+
+    def __init__(self, limit: int):
+        self._semaphore = asyncio.Semaphore(limit)
+        self.client = make_async_client(limit)
+
+    async def __call__(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        async with self._semaphore:
+            return await fn(*args, client=self.client, **kwargs)
+
+    async def aclose(self):
+        await self.client.close()
+
+
+async def _run(tasks, fn, concurrency, on_done, errors, cancel):
+    results: Dict[Hashable, Any] = {}
+    total = len(tasks)
+    call = RequestSlots(max(1, concurrency))
+    finished: asyncio.Queue = asyncio.Queue()
+
+    async def run_one(task_id, args):
+        try:
+            result, error = await fn(call, *args), None
+        except Exception as e:
+            result, error = None, e
+        finished.put_nowait((task_id, result, error))
+
+    async def watch_cancel():
+        while not cancel.is_set():
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+        finished.put_nowait(None)
+
+    running = [asyncio.ensure_future(run_one(task_id, args)) for task_id, args in tasks.items()]
+    if cancel is not None:
+        running.append(asyncio.ensure_future(watch_cancel()))
+    try:
+        while len(results) < total:
+            item = await finished.get()
+            if item is None:
+                break
+            task_id, result, error = item
+            if error is not None and errors is not None:
+                errors[task_id] = error
+            results[task_id] = result
+            if on_done:
+                on_done(task_id, result, len(results), total)
+    finally:
+        # Reached on cancel, or when on_done raises (e.g. Streamlit stopping the script)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        await call.aclose()
+    for task_id in tasks:
+        if task_id not in results:
+            results[task_id] = None
+            if errors is not None:
+                errors[task_id] = LookupCancelled()
+    return results
+
+
+def run_async(tasks: Dict[Hashable, Tuple], fn: Callable[..., Awaitable[Any]], concurrency: int = DEFAULT_WORKERS,
+              on_done: Optional[Callable[[Hashable, Any, int, int], None]] = None,
+              errors: Optional[Dict[Hashable, Exception]] = None,
+              cancel: Optional[threading.Event] = None) -> Dict[Hashable, Any]:
+    """
+    Await fn(call, *args) for every (task id, args) pair; same contract as run_concurrent().
+
+    `call(request_fn, *args, **kwargs)` awaits request_fn (e.g.
+    scryfall_client.async_request) with the run's ClientSession as `client`,
+    in one of `concurrency` slots. on_done is called on
+    the calling thread as each task finishes. Once `cancel` is set, the
+    tasks still pending are cancelled and recorded with LookupCancelled.
+    """
+    if not tasks:
+        return {}
+    coro = _run(tasks, fn, concurrency, on_done, errors, cancel)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Already inside an event loop (e.g. a notebook): run ours on a separate thread
+    with ThreadPoolExecutor(max_workers=1) as runner:
+        return runner.submit(asyncio.run, coro).result()
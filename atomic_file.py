@@ -0,0 +1,32 @@
+"""
+Atomic file replacement for the caches and tables written next to the app.
+
+A file is written to a temporary file in the same directory and renamed
+over the target once it is complete, so readers never see a half-written
+file and an interrupted write never leaves a truncated one. Every write
+gets its own temporary file, so concurrent writers (app sessions in one
+process, or several processes) can't corrupt each other's output; the last
+rename wins.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w", **open_kwargs) -> Iterator[IO]:
+    """Open a temporary file to write; it replaces path when the block exits without an error"""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f"{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
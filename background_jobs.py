@@ -0,0 +1,71 @@
+"""
+Background jobs for long runs started from the Streamlit app.
+
+A run started from a button used to block the script thread: the user
+couldn't stop it, every row's progress update was sent to the browser as
+it happened, and a rerun threw the work away. A BackgroundJob runs the
+work on a daemon thread instead and only records the latest progress.
+The app keeps the job in st.session_state, so it survives reruns, and
+polls it at a fixed rate to draw the progress bar.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+
+class BackgroundJob:
+    """
+    Runs fn(*args, progress=..., cancel=..., **kwargs) on a daemon thread.
+
+    fn gets a `progress(fraction, text)` callback that records the latest
+    update and a threading.Event set by cancel(); it is expected to stop
+    early and return what it has when the event is set. Once done(), the
+    return value is in `result`, or the exception it raised in `error`.
+    """
+
+    def __init__(self, fn: Callable[..., Any], *args, **kwargs):
+        self.cancel_event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        # Replaced as a whole, so readers never see a fraction paired with another update's text
+        self._progress: Tuple[float, str] = (0.0, "Starting…")
+        self._thread = threading.Thread(target=self._run, args=(fn, args, kwargs), name="background-job", daemon=True)
+        self._thread.start()
+
+    def _run(self, fn, args, kwargs):
+        try:
+            self.result = fn(*args, progress=self.report, cancel=self.cancel_event, **kwargs)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = time.monotonic()
+
+    def report(self, fraction: float, text: str):
+        self._progress = (fraction, text)
+
+    @property
+    def progress(self) -> Tuple[float, str]:
+        """The latest (fraction, text) reported by the job"""
+        return self._progress
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes or `timeout` seconds pass; returns done()"""
+        self._thread.join(timeout)
+        return self.done()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
@@ -0,0 +1,319 @@
+"""
+Batch mode: enrich several pull lists in one run.
+
+Shops export a pull list per storefront, and the same cards show up in
+many of them. run_batch() reads only the lookup columns of every file,
+resolves the union of their unique (set code, collector number, name)
+keys once in this process (cache, /cards/collection batching and per-card
+lookups, as in fill_colors()), then enriches and renders the files in a
+pool of worker processes. Each worker receives just its own file's
+resolved keys, so no Scryfall calls are made from the workers. Every file
+gets its own CSV, checklist and report, and run_batch() also returns a
+combined summary with timings.
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from instrumentation import RunMetrics
+from lookup_engine import LookupCancelled
+from pipeline import (EXPORT_FORMATS, FINGERPRINT_COLUMNS, REQUIRED_COLUMNS, LookupFailed, ProgressCallback, ResolvedKeys,
+                      as_str, build_report, checklist_bytes, export_bytes, fill_colors, lookup_keys, missing_columns,
+                      read_pull_list, resolve_keys, row_fingerprints, write_checklist, write_checklists_by_set,
+                      write_export)
+from run_memory import RunMemory
+from scryfall_client import RateLimited
+
+DEFAULT_PROCESSES = os.cpu_count() or 1
+# Columns parsed up front to collect lookup keys; the workers parse whole files
+KEY_READ_COLUMNS = set(REQUIRED_COLUMNS + FINGERPRINT_COLUMNS)
+
+
+class BatchSource:
+    """One pull list in a batch: a path, or the bytes of an uploaded file"""
+
+    def __init__(self, name: str, path: Optional[str] = None, data: Optional[bytes] = None):
+        self.name = name
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def from_path(cls, path: str) -> "BatchSource":
+        return cls(os.path.basename(path), path=path)
+
+    def open(self):
+        """Something pd.read_csv() can read"""
+        return self.path if self.data is None else io.BytesIO(self.data)
+
+
+def output_paths(stem: str, output_dir: str, export_format: str = "csv") -> Tuple[str, str, str]:
+    """Enriched export (CSV, gzip CSV or Parquet), checklist and report paths for one input file"""
+    return (
+        os.path.join(output_dir, f"{stem}_with_colors{EXPORT_FORMATS[export_format]}"),
+        os.path.join(output_dir, f"{stem}_checklist.html"),
+        os.path.join(output_dir, f"{stem}_report.json"),
+    )
+
+
+def unique_stems(sources: List[BatchSource]) -> List[str]:
+    """Output file stems; inputs with the same file name get _2, _3, ... so their outputs don't collide"""
+    stems = []
+    seen: Dict[str, int] = {}
+    for source in sources:
+        stem = os.path.splitext(os.path.basename(source.name))[0] or "pull_list"
+        seen[stem] = seen.get(stem, 0) + 1
+        stems.append(stem if seen[stem] == 1 else f"{stem}_{seen[stem]}")
+    return stems
+
+
+def enrich_file(source: BatchSource, stem: str, set_map: Dict[str, str], resolved: ResolvedKeys,
+                reuse: Optional[RunMemory] = None, output_dir: Optional[str] = None,
+                page_per_set: bool = False, split_by_set: bool = False, export_format: str = "csv") -> Dict[str, Any]:
+    """
+    Enrich and render one file from already resolved keys; runs in a worker process.
+
+    Returns the per-file result described in run_batch().
+    """
+    start = time.perf_counter()
+    metrics = RunMetrics()
+    with metrics.stage("parse_csv"):
+        df = read_pull_list(source.open())
+    stats = {}
+    result_df, filled, skipped = fill_colors(df, set_map, stats=stats, metrics=metrics, reuse=reuse,
+                                             resolved=resolved)
+    result = {"name": source.name, "stem": stem, "rows": len(result_df), "filled": filled, "skipped": skipped}
+    if output_dir:
+        csv_path, html_path, report_path = output_paths(stem, output_dir, export_format)
+        with metrics.stage("write_csv"):
+            write_export(result_df, csv_path, export_format)
+        with metrics.stage("checklist"), open(html_path, "w", encoding="utf-8") as f:
+            write_checklist(result_df, f, page_per_set=page_per_set)
+        if split_by_set:
+            with metrics.stage("checklist"):
+                result["set_checklists"] = write_checklists_by_set(
+                    result_df, os.path.join(output_dir, f"{stem}_checklist"), prefix=f"{stem}_checklist")
+        result["report"] = build_report(len(result_df), filled, skipped, stats, metrics=metrics)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(result["report"], f, indent=2)
+        result.update(csv=csv_path, checklist=html_path, report_path=report_path)
+    else:
+        with metrics.stage("write_csv"):
+            result["csv"] = export_bytes(result_df, export_format)
+        with metrics.stage("checklist"):
+            result["checklist"] = checklist_bytes(result_df, page_per_set=page_per_set)
+        result["report"] = build_report(len(result_df), filled, skipped, stats, metrics=metrics)
+    # The worker's copy of the memory now holds this file's resolved rows; the parent merges them
+    result["remembered"] = reuse.colors if reuse is not None else None
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def _worker_ready():
+    return None
+
+
+# sys.modules is shared by every thread, and each Streamlit session starts its batch pools from its own script
+# thread. Without this lock, two sessions hiding __main__ at once interleave: the second saves the first's
+# placeholder as the module to restore, and puts it back after the first has restored the real script.
+_main_script_lock = threading.Lock()
+
+
+@contextmanager
+def _main_script_hidden():
+    """
+    Spawned workers re-run the parent's __main__ script before importing
+    anything. Streamlit installs the app script as __main__, so hide it
+    while the workers start; they only need this module. Held under
+    _main_script_lock, so one pool starts at a time.
+    """
+    with _main_script_lock:
+        main = sys.modules.get("__main__")
+        placeholder = sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            # A Streamlit rerun in the meantime installs a new script module; leave that one in place
+            if sys.modules.get("__main__") is placeholder:
+                sys.modules["__main__"] = main
+
+
+def start_pool(processes: int) -> ProcessPoolExecutor:
+    """Start `processes` workers right away, so they boot while the parent is looking cards up"""
+    # spawn rather than fork: the parent may be a threaded server (Streamlit)
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+    # Each submit to an idle pool starts one more worker, up to max_workers
+    with _main_script_hidden():
+        for _ in range(processes):
+            pool.submit(_worker_ready)
+    return pool
+
+
+class ProcessBudget:
+    """
+    Worker processes shared by concurrent batch runs, such as the app's sessions.
+
+    reserve(n) takes up to n of the free workers without waiting and
+    yields how many processes the run may use; a run that can't get at
+    least two enriches its files in its own process instead of a pool.
+    """
+
+    def __init__(self, processes: int):
+        self.free = processes
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def reserve(self, processes: int):
+        with self._lock:
+            taken = min(processes, self.free)
+            if taken < 2:
+                taken = 0
+            self.free -= taken
+        try:
+            yield max(1, taken)
+        finally:
+            with self._lock:
+                self.free += taken
+
+
+def _file_keys(source: BatchSource, set_map: Dict[str, str], reuse: Optional[RunMemory]):
+    """Unique lookup keys of one file's Magic rows, and its share of `reuse` (None without reuse)"""
+    df = read_pull_list(source.open(), usecols=KEY_READ_COLUMNS)
+    missing = missing_columns(df)
+    if missing:
+        raise ValueError(f"{source.name}: Missing required column(s): {', '.join(missing)}")
+    candidates = df[as_str(df["Product Line"]).str.strip().eq("Magic")]
+    shared = None
+    if reuse is not None:
+        fingerprints = row_fingerprints(candidates[candidates.columns.intersection(FINGERPRINT_COLUMNS)], set_map)
+        shared = RunMemory(max_entries=None)
+        shared.colors = reuse.colors[reuse.colors.index.isin(fingerprints.to_numpy())]
+        # Rows the worker will reuse need no lookup
+        candidates = candidates.drop(shared.lookup(fingerprints).dropna().index)
+    keys, resolvable = lookup_keys(candidates, set_map)
+    return set(keys[resolvable].drop_duplicates().itertuples(index=False, name=None)), shared
+
+
+def run_batch(sources: List[BatchSource], set_map: Dict[str, str], output_dir: Optional[str] = None,
+              processes: int = DEFAULT_PROCESSES, progress: Optional[ProgressCallback] = None,
+              metrics: Optional[RunMetrics] = None, reuse: Optional[RunMemory] = None,
+              page_per_set: bool = False, split_by_set: bool = False, export_format: str = "csv",
+              **lookup_kwargs) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Enrich every source, looking each unique card up once across all of them.
+
+    lookup_kwargs (bulk_index, cache, batch, workers, requests_per_second,
+    timeout, engine, cancel, checkpoint) are passed to resolve_keys(). With `reuse` (a
+    RunMemory), remembered rows skip the lookups as in fill_colors() and
+    the memory is updated with every file's resolved rows. processes=1
+    enriches the files in this process instead of a pool.
+
+    Returns (results, summary). results has one dict per source, in order:
+    name, rows, filled, skipped, report, seconds and the outputs. With
+    output_dir these are written there (see output_paths()) and "csv",
+    "checklist" and "report_path" are paths; otherwise "csv" and
+    "checklist" are bytes. "csv" is the enriched pull list in
+    `export_format` (see write_export()). summary is JSON-serializable: per-file counts and
+    timings, totals, the unique key count and the lookup diagnostics.
+    Raises ValueError if a file lacks a required column, before any lookup.
+    """
+    start = time.perf_counter()
+    if metrics is None:
+        metrics = RunMetrics()
+    if progress is None:
+        progress = lambda fraction, text: None
+    stems = unique_stems(sources)
+    processes = max(1, min(processes, len(sources)))
+
+    with start_pool(processes) if processes > 1 else nullcontext() as pool:
+        with metrics.stage("collect_keys"):
+            file_keys = []
+            shares = []
+            for source in sources:
+                keys, share = _file_keys(source, set_map, reuse)
+                file_keys.append(keys)
+                shares.append(share)
+            lookups = dict(enumerate(set().union(*file_keys)))
+
+        cache = lookup_kwargs.get("cache")
+        if cache is not None:
+            # Counted for this batch alone; concurrent runs share the cache
+            cache = lookup_kwargs["cache"] = cache.for_run()
+        checkpoint = lookup_kwargs.get("checkpoint")
+        resumed = sum(key in checkpoint.restored for key in lookups.values()) if checkpoint is not None else None
+        errors = {}
+        colors = resolve_keys(lookups, progress=progress, metrics=metrics, errors=errors, **lookup_kwargs)
+        colors_by_key = {key: colors.get(i) for i, key in lookups.items()}
+        # Fresh instances: a RateLimited carries its HTTP response, which needn't travel to the workers
+        errors_by_key = {lookups[i]: type(e)() for i, e in errors.items()}
+
+        jobs = []
+        for source, stem, keys, share in zip(sources, stems, file_keys, shares):
+            resolved = ResolvedKeys({key: colors_by_key[key] for key in keys},
+                                    {key: errors_by_key[key] for key in keys if key in errors_by_key})
+            jobs.append((source, stem, set_map, resolved, share, output_dir, page_per_set, split_by_set, export_format))
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        results: List[Dict[str, Any]] = [{}] * len(jobs)
+        progress(0.0, f"Enriching {len(jobs)} files…")
+        with metrics.stage("enrich_files"):
+            if pool is None:
+                for n, job in enumerate(jobs):
+                    results[n] = enrich_file(*job)
+                    progress((n + 1) / len(jobs), f"Enriched {n + 1} / {len(jobs)} files — {job[0].name}")
+            else:
+                futures = {pool.submit(enrich_file, *job): n for n, job in enumerate(jobs)}
+                for done, future in enumerate(as_completed(futures), 1):
+                    n = futures[future]
+                    results[n] = future.result()
+                    progress(done / len(jobs), f"Enriched {done} / {len(jobs)} files — {jobs[n][0].name}")
+
+    for result in results:
+        remembered = result.pop("remembered")
+        if reuse is not None:
+            with metrics.stage("reuse"):
+                reuse.remember(pd.Series(remembered.index.to_numpy()), remembered)
+
+    summary = {
+        "files": [
+            {
+                "name": result["name"],
+                "rows": result["rows"],
+                "filled": result["filled"],
+                "skipped_or_unknown": result["skipped"],
+                "rate_limited": result["report"].get("rate_limited", 0),
+                "lookup_errors": result["report"].get("lookup_errors", 0),
+                "seconds": result["seconds"],
+            }
+            for result in results
+        ],
+        "rows": sum(result["rows"] for result in results),
+        "filled": sum(result["filled"] for result in results),
+        "skipped_or_unknown": sum(result["skipped"] for result in results),
+        # Keys counted once per file they appear in, against the lookups actually needed
+        "file_keys": sum(len(keys) for keys in file_keys),
+        "unique_lookups": len(lookups),
+        "rate_limited_lookups": sum(isinstance(e, RateLimited) for e in errors_by_key.values()),
+        "failed_lookups": sum(isinstance(e, LookupFailed) for e in errors_by_key.values()),
+        "cancelled_lookups": sum(isinstance(e, LookupCancelled) for e in errors_by_key.values()),
+        "processes": processes,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    if resumed is not None:
+        summary["resumed_lookups"] = resumed
+    if cache is not None:
+        summary["cache"] = cache.stats()
+    summary["diagnostics"] = metrics.to_dict()
+    progress(1.0, "Done.")
+    return results, summary
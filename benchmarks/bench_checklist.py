@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark the printable checklist renderer on large synthetic pull lists.
+
+Reports wall time and peak Python heap (tracemalloc) for rendering the
+checklist to a string, to UTF-8 bytes, and streamed straight to a file.
+
+Usage:
+    python benchmarks/bench_checklist.py [--rows N] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import checklist_bytes, make_printable_checklist, write_checklist  # noqa: E402
+
+
+def synthetic_result(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Enriched pull list shaped like fill_colors() output"""
+    rng = np.random.default_rng(seed)
+    sets = [f"Set {i}" for i in range(150)]
+    return pd.DataFrame({
+        "Product Line": rng.choice(["Magic", "Pokemon", "Yu-Gi-Oh"], rows, p=[0.7, 0.2, 0.1]),
+        "Product Name": [f"Card <{i % 5000}> & Co" for i in range(rows)],
+        "Set": rng.choice(sets, rows),
+        "Number": rng.integers(1, 400, rows).astype(str),
+        "Quantity": rng.integers(1, 5, rows),
+        "Color": rng.choice(["W", "U", "B", "R", "G", "Gd", "C", "L", ""], rows),
+        "Foil": rng.choice(["", "*"], rows, p=[0.8, 0.2]),
+        "Pokemon Holofoil": rng.choice(["", "H", "RH"], rows, p=[0.9, 0.05, 0.05]),
+    })
+
+
+def measure(fn, repeat: int):
+    """Best wall time over `repeat` runs, then peak heap from one extra traced run"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    # tracemalloc slows allocation-heavy code down a lot, so it gets its own run
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checklist rendering")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows in the synthetic pull list (default: 100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; best time is reported (default: 3)")
+    args = parser.parse_args()
+
+    df = synthetic_result(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checklist.html")
+
+        def to_file(**kwargs):
+            with open(path, "w", encoding="utf-8") as f:
+                write_checklist(df, f, **kwargs)
+
+        cases = [
+            ("string", lambda: make_printable_checklist(df)),
+            ("bytes", lambda: checklist_bytes(df)),
+            ("stream to file", to_file),
+            ("stream to file, page per set", lambda: to_file(page_per_set=True)),
+        ]
+        print(f"Checklist rendering, {args.rows:,} rows (best of {args.repeat})")
+        for label, fn in cases:
+            seconds, peak = measure(fn, args.repeat)
+            print(f"  {label:<30} {seconds:8.3f} s   peak heap {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compare the per-card lookup engines against the serial loop.
+
+Runs fill_colors() with batching disabled, so every unique card goes
+through the three-tier fallback chain, against the local mock Scryfall
+server. Engines: "serial" (one lookup at a time), "thread" (thread pool)
+and "async" (asyncio). Reports lookups/sec and HTTP calls for each, and
+checks that every engine fills exactly the same Color column.
+
+Usage:
+    python benchmarks/bench_engines.py [--rows 5000] [--workers 16] [--latency 0.02]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from mock_scryfall import MockScryfall
+from synthetic import generate, set_code_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the serial, thread and async lookup engines")
+    parser.add_argument("--rows", type=int, default=5000, help="Synthetic pull list rows (default: 5000)")
+    parser.add_argument("--workers", type=int, default=16, help="Requests in flight for thread/async (default: 16)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock response latency in seconds (default: 0.02)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock responses that are 500s")
+    parser.add_argument("--requests-per-second", type=float, default=2000, help="Request budget (default: 2000)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed (default: 0)")
+    args = parser.parse_args()
+
+    mock = MockScryfall(latency=args.latency, error_rate=args.error_rate, seed=args.seed).start()
+    # scryfall_client reads the base URL at import time
+    os.environ["SCRYFALL_API_URL"] = mock.url
+    from pipeline import fill_colors
+
+    df = generate(args.rows, seed=args.seed).iloc[:-1]
+    set_map = set_code_map()
+    runs = [("serial", "thread", 1), ("thread", "thread", args.workers), ("async", "async", args.workers)]
+    colors = {}
+    try:
+        for label, engine, workers in runs:
+            stats = {}
+            mock.reset_counts()
+            start = time.perf_counter()
+            result_df, filled, skipped = fill_colors(df, set_map, batch=False, stats=stats, engine=engine,
+                                                     workers=workers, requests_per_second=args.requests_per_second)
+            seconds = time.perf_counter() - start
+            calls = sum(mock.reset_counts().values())
+            colors[label] = result_df["Color"]
+            print(f"{label:>7}: {seconds:7.2f} s | {stats['unique_lookups'] / seconds:8.1f} lookups/sec"
+                  f" | {calls} HTTP calls | filled {filled} | skipped {skipped}")
+    finally:
+        mock.stop()
+
+    if args.error_rate:
+        print("Color columns not compared: injected errors differ from run to run")
+    elif all(colors[label].equals(colors["serial"]) for label in colors):
+        print("All engines filled identical Color columns")
+    else:
+        print("Color columns differ between engines!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
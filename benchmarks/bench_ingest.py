@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark reading a large synthetic pull list export.
+
+Compares a plain pd.read_csv() (pandas' default inference, as uploads used
+to be read) with read_pull_list() on pandas' C parser and on pyarrow's
+reader, and the key-columns-only read used by batch mode. Each case runs
+in a fresh subprocess and reports its best wall time, the memory held by
+the resulting frame and the peak RSS growth of the read (pyarrow
+allocates outside the Python heap, so tracemalloc wouldn't see it).
+
+Usage:
+    python benchmarks/bench_ingest.py [--rows N] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+CASES = {
+    "before": "pd.read_csv (before)",
+    "c": "read_pull_list, C parser",
+    "pyarrow": "read_pull_list, pyarrow",
+    "keys": "key columns only",
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss carries over from the parent across exec on Linux; VmHWM starts afresh
+    try:
+        with open("/proc/self/status", "r") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 2**10
+    except (OSError, StopIteration):
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def run_worker(args):
+    """Read the CSV one way in this process and print the measurements as JSON"""
+    import pandas as pd
+    from pipeline import FINGERPRINT_COLUMNS, REQUIRED_COLUMNS, read_pull_list
+
+    readers = {
+        "before": lambda: pd.read_csv(args.csv).iloc[:-1],
+        "c": lambda: read_pull_list(args.csv, engine="c"),
+        "pyarrow": lambda: read_pull_list(args.csv, engine="pyarrow"),
+        "keys": lambda: read_pull_list(args.csv, usecols=set(REQUIRED_COLUMNS + FINGERPRINT_COLUMNS)),
+    }
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    df = readers[args.worker]()
+    best = time.perf_counter() - start
+    # Peak of the first read only; later reads overlap with the frame of the one before
+    growth = peak_rss_mb() - baseline
+    frame_mb = df.memory_usage(deep=True).sum() / 2**20
+    for _ in range(args.repeat - 1):
+        del df
+        start = time.perf_counter()
+        df = readers[args.worker]()
+        best = min(best, time.perf_counter() - start)
+    print(json.dumps({
+        "seconds": round(best, 4),
+        "frame_mb": round(frame_mb, 1),
+        "peak_rss_growth_mb": round(growth, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pull list CSV ingestion")
+    parser.add_argument("--rows", type=int, default=500_000, help="Rows in the synthetic export (default: 500000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Reads per case; best time is reported (default: 3)")
+    parser.add_argument("--worker", choices=sorted(CASES), help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    from pipeline import pa_csv
+    from synthetic import generate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pull_list.csv")
+        generate(args.rows).to_csv(path, index=False)
+        print(f"Ingesting a {os.path.getsize(path) / 2**20:.1f} MiB export, {args.rows:,} rows (best of {args.repeat})")
+        for case, label in CASES.items():
+            if case == "pyarrow" and pa_csv is None:
+                print(f"  {label:<28} skipped: pyarrow is not installed")
+                continue
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", case, "--csv", path,
+                   "--repeat", str(args.repeat)]
+            out = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"  {label:<28} {result['seconds']:8.3f} s   frame {result['frame_mb']:7.1f} MiB"
+                  f"   peak RSS +{result['peak_rss_growth_mb']:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
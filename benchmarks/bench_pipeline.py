@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for fill_colors() and the checklist.
+
+Starts the mock Scryfall server (mock_scryfall.py), generates synthetic
+pull lists (synthetic.py) and runs the pipeline on each one in a fresh
+subprocess pointed at the mock via SCRYFALL_API_URL. For every size it
+records rows/sec, HTTP calls per row (by endpoint), peak RSS and checklist
+render time, and writes everything to a JSON file that can be compared
+across releases with --baseline.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def run_worker(args):
+    """Run one case in this process and print its measurements as JSON"""
+    from pipeline import fill_colors, load_set_code_map, read_pull_list, write_checklist
+
+    set_map = load_set_code_map(args.set_map)
+    start = time.perf_counter()
+    df = read_pull_list(args.csv)
+    parse_seconds = time.perf_counter() - start
+
+    stats = {}
+    start = time.perf_counter()
+    result_df, filled, skipped = fill_colors(
+        df, set_map, stats=stats, batch=not args.no_batch, workers=args.workers,
+        requests_per_second=args.requests_per_second, engine=args.engine,
+    )
+    fill_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as f:
+        write_checklist(result_df, f)
+    checklist_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "rows": len(df),
+        "filled": filled,
+        "skipped": skipped,
+        "parse_seconds": round(parse_seconds, 4),
+        "fill_seconds": round(fill_seconds, 4),
+        "checklist_seconds": round(checklist_seconds, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stats": stats,
+    }))
+
+
+def run_case(mock, rows: int, tmp: str, args) -> dict:
+    from synthetic import generate, set_code_map
+
+    csv_path = os.path.join(tmp, f"pull_{rows}.csv")
+    map_path = os.path.join(tmp, "set_map.json")
+    generate(rows, seed=args.seed).to_csv(csv_path, index=False)
+    with open(map_path, "w", encoding="utf-8") as f:
+        json.dump(set_code_map(), f)
+
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--csv", csv_path, "--set-map", map_path,
+           "--workers", str(args.workers), "--requests-per-second", str(args.requests_per_second),
+           "--engine", args.engine]
+    if args.no_batch:
+        cmd.append("--no-batch")
+    env = dict(os.environ, SCRYFALL_API_URL=mock.url)
+    mock.reset_counts()
+    out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    calls = mock.reset_counts()
+
+    total_calls = sum(calls.values())
+    result["http_calls"] = dict(calls, total=total_calls)
+    result["http_calls_per_row"] = round(total_calls / max(1, result["rows"]), 4)
+    result["rows_per_sec"] = round(result["rows"] / max(result["fill_seconds"], 1e-9), 1)
+    return result
+
+
+def print_comparison(results: dict, baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {c["rows"]: c for c in json.load(f)["cases"]}
+    print(f"\nCompared with {baseline_path}:")
+    for case in results["cases"]:
+        old = baseline.get(case["rows"])
+        if not old:
+            continue
+        print(f"  {case['rows']:>7} rows: rows/sec {old['rows_per_sec']:>10} -> {case['rows_per_sec']:>10}"
+              f" | calls/row {old['http_calls_per_row']} -> {case['http_calls_per_row']}"
+              f" | peak RSS {old['peak_rss_mb']} -> {case['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local mock Scryfall server")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated row counts (default: 1000,10000,100000)")
+    parser.add_argument("--output", default="bench_results.json", help="Results JSON path (default: bench_results.json)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock response latency in seconds (default: 0.02)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock responses that are 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of mock responses that are 429s")
+    parser.add_argument("--workers", type=int, default=8, help="Lookup threads (default: 8)")
+    parser.add_argument("--requests-per-second", type=float, default=500, help="Request budget (default: 500)")
+    parser.add_argument("--no-batch", action="store_true", help="Disable /cards/collection batching")
+    parser.add_argument("--engine", choices=("thread", "async"), default="thread", help="Per-card lookup engine (default: thread)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed (default: 0)")
+    # Internal: run a single case in a child process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    parser.add_argument("--set-map", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    from mock_scryfall import MockScryfall
+
+    mock = MockScryfall(latency=args.latency, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, seed=args.seed).start()
+    results = {
+        "meta": {
+            "created": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {k: getattr(args, k) for k in ("latency", "error_rate", "rate_limit_rate", "workers",
+                                                         "requests_per_second", "no_batch", "engine", "seed")},
+        },
+        "cases": [],
+    }
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for rows in (int(s) for s in args.sizes.split(",")):
+                print(f"Running {rows:,} rows...", flush=True)
+                case = run_case(mock, rows, tmp, args)
+                results["cases"].append(case)
+                print(f"  {case['rows_per_sec']:>10} rows/sec | {case['http_calls_per_row']} HTTP calls/row"
+                      f" ({case['http_calls']['total']} total) | peak RSS {case['peak_rss_mb']} MB"
+                      f" | checklist {case['checklist_seconds']} s")
+    finally:
+        mock.stop()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.output}")
+    if args.baseline:
+        print_comparison(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Scryfall endpoints used by the app.
+
+Serves /cards/{set}/{cn}, /cards/search and /cards/collection over a
+deterministic card universe matching the pull lists made by synthetic.py:
+every set code "sNNN" has cards 1..CARDS_PER_SET, and promo numbers like
+"12p" are only found by the exact-name search. Latency, 5xx error rate and
+429 rate are configurable, and every request is counted per endpoint.
+
+Usage:
+    python benchmarks/mock_scryfall.py [--port PORT] [--latency SECONDS] [--error-rate P] [--rate-limit-rate P]
+
+Then point the app at it with SCRYFALL_API_URL=http://127.0.0.1:PORT
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+CARDS_PER_SET = 350
+COLOR_PROFILES = [
+    {"color_identity": ["W"], "type_line": "Creature — Angel", "colors": ["W"]},
+    {"color_identity": ["U"], "type_line": "Instant", "colors": ["U"]},
+    {"color_identity": ["B"], "type_line": "Sorcery", "colors": ["B"]},
+    {"color_identity": ["R"], "type_line": "Creature — Goblin", "colors": ["R"]},
+    {"color_identity": ["G"], "type_line": "Creature — Elf", "colors": ["G"]},
+    {"color_identity": ["W", "U"], "type_line": "Creature — Human Wizard", "colors": ["W", "U"]},
+    {"color_identity": [], "type_line": "Artifact", "colors": []},
+    {"color_identity": [], "type_line": "Land", "colors": []},
+]
+NAME_QUERY = re.compile(r'^!"(?P<name>.*)" e:(?P<set>\S+)$')
+NUMBER_QUERY = re.compile(r"^e:(?P<set>\S+) cn:(?P<cn>\S+)$")
+SYNTHETIC_NAME = re.compile(r"^Synthetic Card (?P<set>s\d+)-(?P<n>\d+)$")
+
+
+def make_card(set_code: str, cn: str) -> Optional[Dict[str, Any]]:
+    """The card at (set_code, cn) in the synthetic universe, or None"""
+    set_code = set_code.lower()
+    if not re.fullmatch(r"s\d+", set_code):
+        return None
+    n = cn[:-1] if cn.endswith("p") else cn
+    if not n.isdigit() or not 1 <= int(n) <= CARDS_PER_SET:
+        return None
+    digest = hashlib.blake2b(f"{set_code}/{n}".encode(), digest_size=2).digest()
+    profile = COLOR_PROFILES[int.from_bytes(digest, "big") % len(COLOR_PROFILES)]
+    return {"object": "card", "set": set_code, "collector_number": cn,
+            "name": f"Synthetic Card {set_code}-{n}", **profile}
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections when a client opens dozens at once, as the async engine does
+    request_queue_size = 128
+
+
+class MockScryfall:
+    """Threaded mock server; counts are kept per endpoint in `calls`"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockScryfall":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self.calls)
+            self.calls.clear()
+        return counts
+
+    def _fault(self) -> Optional[int]:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def _count(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, Nagle + delayed ACK add ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _begin(self, endpoint: str) -> bool:
+                mock._count(endpoint)
+                if mock.latency:
+                    time.sleep(mock.latency)
+                fault = mock._fault()
+                if fault == 429:
+                    self._send(429, {"object": "error", "code": "rate_limited"}, {"Retry-After": "0"})
+                    return False
+                if fault:
+                    self._send(fault, {"object": "error", "code": "internal_error"})
+                    return False
+                return True
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts == ["cards", "search"]:
+                    if not self._begin("search"):
+                        return
+                    query = urllib.parse.parse_qs(url.query).get("q", [""])[0]
+                    card = None
+                    m = NUMBER_QUERY.match(query)
+                    if m and not m["cn"].endswith("p"):
+                        card = make_card(m["set"], m["cn"])
+                    m = NAME_QUERY.match(query)
+                    if m:
+                        named = SYNTHETIC_NAME.match(m["name"])
+                        if named and named["set"] == m["set"].lower():
+                            card = make_card(m["set"], named["n"])
+                    if card:
+                        self._send(200, {"object": "list", "total_cards": 1, "data": [card]})
+                    else:
+                        self._send(404, {"object": "error", "code": "not_found"})
+                elif len(parts) == 3 and parts[0] == "cards":
+                    if not self._begin("direct"):
+                        return
+                    card = make_card(parts[1], parts[2]) if not parts[2].endswith("p") else None
+                    if card:
+                        self._send(200, card)
+                    else:
+                        self._send(404, {"object": "error", "code": "not_found"})
+                else:
+                    self._send(404, {"object": "error", "code": "not_found"})
+
+            def do_POST(self):
+                if urllib.parse.urlparse(self.path).path.rstrip("/") != "/cards/collection":
+                    self._send(404, {"object": "error", "code": "not_found"})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self._begin("collection"):
+                    return
+                identifiers = body.get("identifiers") or []
+                if len(identifiers) > 75:
+                    self._send(422, {"object": "error", "code": "too_many_identifiers"})
+                    return
+                data, not_found = [], []
+                for ident in identifiers:
+                    cn = str(ident.get("collector_number", ""))
+                    card = make_card(str(ident.get("set", "")), cn) if not cn.endswith("p") else None
+                    (data if card else not_found).append(card or ident)
+                self._send(200, {"object": "list", "not_found": not_found, "data": data})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Scryfall card endpoints")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500 (default: 0)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429 (default: 0)")
+    args = parser.parse_args()
+
+    mock = MockScryfall(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate)
+    print(f"Mock Scryfall listening on {mock.url} (Ctrl+C to stop)")
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Requests served: {dict(mock.calls)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Synthetic TCGplayer pull list generator for benchmarks.
+
+Rows look like a real export: set popularity follows a Zipf-like curve,
+popular cards repeat across conditions, foil/non-foil and languages, a
+few percent are promos only found by name, some use set names missing
+from the set map, and Pokemon / Yu-Gi-Oh rows are mixed in. The trailing
+"total" row the app drops is included too.
+
+Usage:
+    python benchmarks/synthetic.py ROWS OUTPUT_CSV [--set-map OUTPUT_JSON] [--seed N]
+"""
+
+import argparse
+import json
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+SET_COUNT = 120
+CONDITIONS = ["Near Mint", "Lightly Played", "Moderately Played", "Near Mint Foil", "Lightly Played Foil",
+              "Near Mint - Japanese", "Near Mint Foil - Japanese"]
+POKEMON_CONDITIONS = ["Near Mint", "Near Mint Holofoil", "Near Mint Reverse Holofoil", "Lightly Played Holofoil"]
+
+
+def set_code_map() -> Dict[str, str]:
+    """Set name -> code mapping for the synthetic sets the mock server knows about"""
+    return {f"Synthetic Set {i:03d}": f"s{i:03d}" for i in range(1, SET_COUNT + 1)}
+
+
+def generate(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    names = list(set_code_map())
+
+    # Pool of distinct cards, about one per three rows; popular cards are drawn far more often
+    pool_size = max(10, rows // 3)
+    set_weights = 1.0 / np.arange(1, SET_COUNT + 1)
+    pool_sets = rng.choice(SET_COUNT, pool_size, p=set_weights / set_weights.sum())
+    pool_numbers = rng.integers(1, 351, pool_size)
+    card_weights = 1.0 / np.arange(1, pool_size + 1) ** 0.8
+    picks = rng.choice(pool_size, rows, p=card_weights / card_weights.sum())
+
+    set_idx = pool_sets[picks]
+    numbers = pool_numbers[picks].astype(str).astype(object)
+    set_names = np.array(names, dtype=object)[set_idx]
+    product_names = np.char.add(
+        np.char.add("Synthetic Card ", np.array([f"s{i + 1:03d}" for i in set_idx])),
+        np.char.add("-", pool_numbers[picks].astype(str)),
+    ).astype(object)
+
+    promo = rng.random(rows) < 0.03
+    numbers[promo] = np.char.add(numbers[promo].astype(str), "p")
+    unmapped = rng.random(rows) < 0.02
+    set_names[unmapped] = np.char.add(set_names[unmapped].astype(str), " Promos")
+
+    line = rng.choice(["Magic", "Pokemon", "YuGiOh"], rows, p=[0.8, 0.15, 0.05]).astype(object)
+    conditions = rng.choice(CONDITIONS, rows).astype(object)
+    pokemon = line == "Pokemon"
+    conditions[pokemon] = rng.choice(POKEMON_CONDITIONS, int(pokemon.sum()))
+
+    df = pd.DataFrame({
+        "TCGplayer Id": rng.integers(100000, 999999, rows),
+        "Product Line": line,
+        "Set": set_names,
+        "Product Name": product_names,
+        "Number": numbers,
+        "Rarity": rng.choice(["C", "U", "R", "M"], rows),
+        "Condition": conditions,
+        "Quantity": rng.integers(1, 5, rows),
+        "Main Photo URL": "",
+        "Set Release Date": "2024-01-01",
+    })
+    trailer = pd.DataFrame([{"TCGplayer Id": "", "Product Line": "Total"}])
+    return pd.concat([df, trailer], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic TCGplayer pull list CSV")
+    parser.add_argument("rows", type=int, help="Number of card rows")
+    parser.add_argument("output", help="Output CSV path")
+    parser.add_argument("--set-map", help="Also write the matching set code map JSON here")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    generate(args.rows, args.seed).to_csv(args.output, index=False)
+    if args.set_map:
+        with open(args.set_map, "w", encoding="utf-8") as f:
+            json.dump(set_code_map(), f, indent=2)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
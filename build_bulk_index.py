@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Script to build the compact offline card index (bulk_index.json) or the
+memory-mapped color table (color_table.bin) from a Scryfall bulk-data dump.
+
+With the index in place, the app can fill colors without any Scryfall API
+calls. Download the "Default Cards" file from https://scryfall.com/docs/api/bulk-data
+or let this script fetch it with --download.
+
+Usage:
+    python build_bulk_index.py [--bulk-file FILE | --download | --index-file FILE] [--format json|table] [--output OUTPUT_FILE]
+
+Options:
+    --bulk-file: Local default-cards JSON dump (.json or .json.gz)
+    --download: Download the current default-cards dump from Scryfall
+    --index-file: Convert an existing bulk_index.json into a color table
+    --format: json (card fields, bulk_index.json) or table (color codes only, color_table.bin)
+    --output: Output file path (default: bulk_index.json or color_table.bin)
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import requests
+
+from color_table import color_table_from_index
+from pipeline import color_from_card
+from scryfall_bulk import BulkCardIndex
+
+SCRYFALL_BULK_DATA_URL = "https://api.scryfall.com/bulk-data/default-cards"
+
+
+def download_default_cards(dest_dir: str) -> str:
+    """Download the default-cards dump into dest_dir and return its path"""
+    print("Looking up default-cards bulk file on Scryfall...")
+    try:
+        meta = requests.get(SCRYFALL_BULK_DATA_URL, timeout=30)
+        meta.raise_for_status()
+        download_uri = meta.json()["download_uri"]
+        path = os.path.join(dest_dir, "default-cards.json")
+        print(f"Downloading {download_uri}...")
+        with requests.get(download_uri, stream=True, timeout=300) as r:
+            r.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+        return path
+    except (requests.RequestException, KeyError, ValueError) as e:
+        print(f"Error downloading bulk data from Scryfall: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the offline card index from a Scryfall bulk-data dump"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--bulk-file",
+        help="Path to a local Scryfall default-cards dump (.json or .json.gz)"
+    )
+    source.add_argument(
+        "--download",
+        action="store_true",
+        help="Download the current default-cards dump from Scryfall"
+    )
+    source.add_argument(
+        "--index-file",
+        help="Build from an existing bulk_index.json instead of a dump (use with --format table)"
+    )
+    parser.add_argument(
+        "--format",
+        choices=("json", "table"),
+        default="json",
+        help="json: card fields for every card; table: memory-mapped color codes only (default: json)"
+    )
+    parser.add_argument(
+        "--output",
+        help="Output file path (default: bulk_index.json, or color_table.bin with --format table)"
+    )
+
+    args = parser.parse_args()
+    output = args.output or ("color_table.bin" if args.format == "table" else "bulk_index.json")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            if args.index_file:
+                print(f"Reading {args.index_file}...")
+                index = BulkCardIndex.load(args.index_file)
+            else:
+                bulk_file = args.bulk_file or download_default_cards(tmp)
+                print(f"Reading {bulk_file}...")
+                index = BulkCardIndex.from_bulk_file(bulk_file)
+        except (OSError, ValueError) as e:
+            print(f"Error reading bulk file: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    try:
+        if args.format == "table":
+            color_table_from_index(output, index, color_from_card)
+        else:
+            index.save(output)
+    except OSError as e:
+        print(f"Error saving to {output}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"\nDone! Indexed {len(index)} cards ({len(index.by_name)} set/name keys) into {output}")
+
+
+if __name__ == "__main__":
+    main()
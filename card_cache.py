@@ -0,0 +1,272 @@
+"""
+Persistent on-disk cache of Scryfall lookups.
+
+Entries are keyed by (set code, collector number) and by (set code, name)
+so either lookup path can hit; both rows of a card share its card id, and
+the size limits, the LRU order and the counters all go by card. Only the
+derived color code is stored, so a hit needs no JSON decoding at all.
+Entries expire after a TTL and the least recently used cards are evicted
+once the cache grows past its card-count or on-disk size limit. Writes,
+including the last-used time a hit refreshes, are committed, and the limits
+checked, every CHECK_EVERY writes and on flush().
+
+Cards Scryfall could not resolve are remembered separately, keyed by
+(set code, collector number, name), with a shorter TTL so later runs can
+skip them without spending the whole fallback chain again. Negative
+entries for a set can be cleared once its set code mapping is fixed.
+
+One cache is shared by every run in a process; a run reads and writes it
+through `for_run()`, which counts that run's hits and misses on their own.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from scryfall_bulk import normalize_name
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 200_000
+DEFAULT_NEGATIVE_TTL_SECONDS = 3 * 24 * 3600
+# Writes between commits and size-limit checks
+CHECK_EVERY = 100
+# Cards the on-disk size limit never evicts, however small it is: an empty cache file is already a few KB
+MIN_CARDS_KEPT = 1_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    key TEXT PRIMARY KEY,
+    card TEXT NOT NULL,
+    color TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cards_last_used ON cards (last_used);
+CREATE INDEX IF NOT EXISTS cards_card ON cards (card);
+CREATE TABLE IF NOT EXISTS unresolved (
+    key TEXT PRIMARY KEY,
+    set_code TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS unresolved_set_code ON unresolved (set_code);
+"""
+
+
+def number_key(set_code: str, cn: str) -> str:
+    return f"cn|{str(set_code).lower()}|{cn}"
+
+
+def name_key(set_code: str, name: str) -> str:
+    return f"name|{str(set_code).lower()}|{normalize_name(name)}"
+
+
+def unresolved_key(set_code: str, cn: str, name: str) -> str:
+    return f"{str(set_code).lower()}|{cn}|{normalize_name(name)}"
+
+
+class CardCache:
+    """SQLite-backed color cache with TTL and LRU eviction, plus a negative cache of unresolved cards"""
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+                 max_bytes: Optional[int] = None,
+                 negative_ttl_seconds: float = DEFAULT_NEGATIVE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.negative_hits = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(cards)")]
+        if columns and "card" not in columns:
+            # Written before rows were grouped by card; it only holds lookups that can be redone
+            self._conn.execute("DROP TABLE cards")
+        self._conn.executescript(_SCHEMA)
+        # Writes since the last commit
+        self._writes = 0
+
+    def close(self):
+        with self._lock:
+            self._enforce_limits()
+            self._conn.commit()
+            self._conn.close()
+
+    def flush(self, counts: Optional["CacheRun"] = None):
+        """Commit pending writes and evict down to the size limits"""
+        with self._lock:
+            self._enforce_limits(counts)
+            self._conn.commit()
+            self._writes = 0
+
+    def _written(self, counts: Optional["CacheRun"] = None):
+        # Called with the lock held after each write
+        self._writes += 1
+        if self._writes >= CHECK_EVERY:
+            self._enforce_limits(counts)
+            self._conn.commit()
+            self._writes = 0
+
+    def for_run(self) -> "CacheRun":
+        """This cache as seen by one run, counting that run's hits, misses and evictions separately"""
+        return CacheRun(self)
+
+    def _count(self, counts: Optional["CacheRun"], counter: str, n: int = 1):
+        # Called with the lock held, which also guards the run's counters
+        setattr(self, counter, getattr(self, counter) + n)
+        if counts is not None:
+            setattr(counts, counter, getattr(counts, counter) + n)
+
+    def get(self, set_code: str, cn: str, name: str, counts: Optional["CacheRun"] = None) -> Optional[str]:
+        """Return the cached color code, or None on a miss"""
+        now = time.time()
+        keys = [number_key(set_code, cn)]
+        if name:
+            keys.append(name_key(set_code, name))
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT card, color, created_at FROM cards WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    continue
+                card, color, created_at = row
+                if now - created_at > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM cards WHERE card = ?", (card,))
+                    self._count(counts, "evictions")
+                    self._written(counts)
+                    continue
+                self._conn.execute("UPDATE cards SET last_used = ? WHERE card = ?", (now, card))
+                self._count(counts, "hits")
+                self._written(counts)
+                return color
+            self._count(counts, "misses")
+            return None
+
+    def put(self, set_code: str, cn: str, name: str, color: str, counts: Optional["CacheRun"] = None):
+        """Store the color code under both the collector-number and name keys"""
+        now = time.time()
+        card = number_key(set_code, cn)
+        rows = [(card, card, color, now, now)]
+        if name:
+            rows.append((name_key(set_code, name), card, color, now, now))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("DELETE FROM unresolved WHERE key = ?", (unresolved_key(set_code, cn, name),))
+            self._written(counts)
+
+    def is_unresolved(self, set_code: str, cn: str, name: str, counts: Optional["CacheRun"] = None) -> bool:
+        """True if this card was recently recorded as not found on Scryfall"""
+        key = unresolved_key(set_code, cn, name)
+        with self._lock:
+            row = self._conn.execute("SELECT created_at FROM unresolved WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False
+            if time.time() - row[0] > self.negative_ttl_seconds:
+                self._conn.execute("DELETE FROM unresolved WHERE key = ?", (key,))
+                self._conn.commit()
+                return False
+            self._count(counts, "negative_hits")
+            return True
+
+    def put_unresolved(self, set_code: str, cn: str, name: str):
+        """Record that no lookup tier found this card"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO unresolved VALUES (?, ?, ?)",
+                (unresolved_key(set_code, cn, name), str(set_code).lower(), time.time()),
+            )
+            self._written()
+
+    def clear_unresolved(self, set_code: Optional[str] = None) -> int:
+        """Forget unresolved cards for one set code (all sets if None); returns the number removed"""
+        with self._lock:
+            if set_code is None:
+                cur = self._conn.execute("DELETE FROM unresolved")
+            else:
+                cur = self._conn.execute("DELETE FROM unresolved WHERE set_code = ?", (str(set_code).lower(),))
+            self._conn.commit()
+            return cur.rowcount
+
+    def _card_count(self) -> int:
+        (count,) = self._conn.execute("SELECT COUNT(DISTINCT card) FROM cards").fetchone()
+        return count
+
+    def _enforce_limits(self, counts: Optional["CacheRun"] = None):
+        if self.max_entries:
+            count = self._card_count()
+            if count > self.max_entries:
+                self._delete_oldest(count - self.max_entries, counts)
+            # Negative entries share the size limit; drop the oldest first
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM unresolved").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM unresolved WHERE key IN (SELECT key FROM unresolved ORDER BY created_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+        if self.max_bytes:
+            count = self._card_count()
+            while count > MIN_CARDS_KEPT and self._used_bytes() > self.max_bytes:
+                # Trim 10% at a time; freed pages are reused by later inserts
+                trim = min(max(1, count // 10), count - MIN_CARDS_KEPT)
+                self._delete_oldest(trim, counts)
+                count -= trim
+
+    def _delete_oldest(self, n: int, counts: Optional["CacheRun"] = None):
+        """Evict the n least recently used cards, both rows of each"""
+        cards = [card for (card,) in self._conn.execute(
+            "SELECT card FROM cards GROUP BY card ORDER BY MAX(last_used) LIMIT ?", (n,)
+        )]
+        self._conn.executemany("DELETE FROM cards WHERE card = ?", [(card,) for card in cards])
+        self._count(counts, "evictions", len(cards))
+
+    def _used_bytes(self) -> int:
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - freelist) * page_size
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters since this cache was opened; entries counts cards, not rows"""
+        with self._lock:
+            entries = self._card_count()
+            (unresolved,) = self._conn.execute("SELECT COUNT(*) FROM unresolved").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": entries,
+                "negative_hits": self.negative_hits, "unresolved_entries": unresolved}
+
+
+class CacheRun:
+    """One run's view of a shared CardCache: the same entries, with hit/miss/eviction counters of its own"""
+
+    def __init__(self, cache: CardCache):
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.negative_hits = 0
+
+    def get(self, set_code: str, cn: str, name: str) -> Optional[str]:
+        return self.cache.get(set_code, cn, name, counts=self)
+
+    def put(self, set_code: str, cn: str, name: str, color: str):
+        self.cache.put(set_code, cn, name, color, counts=self)
+
+    def is_unresolved(self, set_code: str, cn: str, name: str) -> bool:
+        return self.cache.is_unresolved(set_code, cn, name, counts=self)
+
+    def put_unresolved(self, set_code: str, cn: str, name: str):
+        self.cache.put_unresolved(set_code, cn, name)
+
+    def flush(self):
+        self.cache.flush(counts=self)
+
+    def stats(self) -> Dict[str, int]:
+        """This run's hits, misses, evictions and negative hits"""
+        with self.cache._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "negative_hits": self.negative_hits}
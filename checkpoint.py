@@ -0,0 +1,152 @@
+"""
+On-disk checkpoints of in-progress enrichment runs.
+
+A long run resolves its lookup keys over minutes; if the session drops or
+the server restarts, the colors found so far would be lost with it. A
+RunCheckpoint records every resolved (set code, collector number, name)
+key as it comes in and appends them to a JSON-lines file every few
+seconds. Running the same upload again opens the same checkpoint (see
+run_id()) and skips the keys already in it (see fill_colors(checkpoint=...)).
+A run that finishes removes its checkpoint, and remove_stale() deletes the
+ones left behind by runs nobody came back to.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_SAVE_INTERVAL = 5.0
+DEFAULT_MAX_AGE_SECONDS = 24 * 3600
+SUFFIX = ".checkpoint.jsonl"
+
+CardKey = Tuple[str, str, str]
+
+
+def _combined_id(digests: Iterable[bytes]) -> str:
+    combined = hashlib.sha256()
+    for digest in digests:
+        combined.update(digest)
+    return combined.hexdigest()[:32]
+
+
+def run_id(contents: Iterable[bytes]) -> str:
+    """Identifier of a run over these uploaded files, the same for the same contents"""
+    return _combined_id(hashlib.sha256(data).digest() for data in contents)
+
+
+def _file_digest(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def file_run_id(paths: Iterable[str]) -> str:
+    """run_id() of these files' contents, read in blocks rather than whole"""
+    return _combined_id(_file_digest(path) for path in paths)
+
+
+def checkpoint_path(directory: str, run: str) -> str:
+    return os.path.join(directory, f"{run}{SUFFIX}")
+
+
+def remove_stale(directory: str, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS) -> int:
+    """Delete checkpoints in `directory` not written to for max_age_seconds; returns how many"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in names:
+        if not name.endswith(SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            # Removed by another session in the meantime
+            pass
+    return removed
+
+
+class RunCheckpoint:
+    """
+    Colors of the lookup keys a run has resolved so far, kept in a file.
+
+    colors maps each key to its color code, or None for a card no lookup
+    found; restored holds the keys read back from the file, i.e. those an
+    earlier run resolved. Keys that failed (rate limited, cancelled) are never recorded,
+    so a resumed run retries them. New keys are appended to the file at
+    most every save_interval seconds, and by flush().
+    """
+
+    def __init__(self, path: str, save_interval: float = DEFAULT_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self.colors: Dict[CardKey, Optional[str]] = {}
+        self._unsaved: List[Tuple[CardKey, Optional[str]]] = []
+        self._saved_at = time.monotonic()
+        # Set if the file ends mid-line, so the next append starts on a line of its own
+        self._torn = False
+        self._load()
+        self.restored = set(self.colors)
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    def _load(self):
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                self._torn = not line.endswith("\n")
+                try:
+                    set_code, cn, name, color = json.loads(line)
+                except (ValueError, TypeError):
+                    # A line cut short by a crash mid-write; its key is simply looked up again
+                    continue
+                self.colors[(set_code, cn, name)] = color
+
+    def record(self, key: CardKey, color: Optional[str]):
+        self.colors[key] = color
+        self._unsaved.append((key, color))
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self.flush()
+
+    def record_many(self, colors: Dict[CardKey, Optional[str]]):
+        for key, color in colors.items():
+            self.colors[key] = color
+            self._unsaved.append((key, color))
+        self.flush()
+
+    def flush(self):
+        """Append the keys recorded since the last save to the file"""
+        self._saved_at = time.monotonic()
+        if not self._unsaved:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lines = "".join(json.dumps([*key, color], ensure_ascii=False) + "\n" for key, color in self._unsaved)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n" + lines if self._torn else lines)
+        self._torn = False
+        self._unsaved = []
+
+    def discard(self):
+        """Forget the checkpoint once its run has finished"""
+        self.colors = {}
+        self.restored = set()
+        self._unsaved = []
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
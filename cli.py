@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Headless batch mode for the pull list organizer.
+
+Runs the same pipeline as the Streamlit app without starting (or importing)
+Streamlit, so it can be used from cron, a worker or a test.
+
+Usage:
+    python cli.py INPUT_CSV [INPUT_CSV ...] [--set-map FILE] [--output-dir DIR] [options]
+    python cli.py --clear-unresolved SET [--clear-unresolved SET ...]
+
+Writes <name>_with_colors.csv, <name>_checklist.html and <name>_report.json
+to the output directory. With --chunksize N the CSV is enriched and written
+N rows at a time, and the checklist rows are spilled to a temporary
+directory in the output directory and merged from there, so memory use
+depends on the chunk size rather than the file size. --export-format csv.gz or parquet writes the enriched pull list
+gzip-compressed or as Parquet instead (<name>_with_colors.csv.gz / .parquet).
+
+Given several input files, the cards of all of them are looked up once and
+the files are enriched in parallel worker processes (--processes); a
+combined batch_summary.json with per-file timings is written as well.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Optional
+
+from batch_runner import DEFAULT_PROCESSES, BatchSource, output_paths, run_batch
+from card_cache import DEFAULT_MAX_ENTRIES, DEFAULT_NEGATIVE_TTL_SECONDS, CardCache
+from checkpoint import DEFAULT_MAX_AGE_SECONDS, RunCheckpoint, checkpoint_path, file_run_id, remove_stale
+from color_table import load_offline_index
+from instrumentation import RunMetrics
+from lookup_engine import DEFAULT_RATE, DEFAULT_WORKERS
+from pipeline import (DEFAULT_TIMEOUT, ENGINES, EXPORT_FORMATS, ChecklistSpill, build_report, enrich_csv_stream,
+                      fill_colors, load_set_code_map, missing_columns, pa, read_pull_list, throttle_progress,
+                      write_checklist, write_checklists_by_set, write_export)
+from run_memory import RunMemory
+
+
+def print_progress(fraction: float, text: str):
+    """Progress callback writing a single updating line to stderr"""
+    print(f"\r[{fraction:4.0%}] {text[:100]:<100}", end="", file=sys.stderr, flush=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Add Color/Foil columns to a TCGplayer pull list and build a printable checklist"
+    )
+    parser.add_argument("input_csv", nargs="*", help="TCGplayer CSV export(s); several files are run as one batch")
+    parser.add_argument(
+        "--set-map",
+        default="set_code_map.json",
+        help="Set name -> Scryfall set code mapping (default: set_code_map.json)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=".",
+        help="Directory for the CSV, checklist and report (default: current directory)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Concurrent lookup requests (default: {DEFAULT_WORKERS})"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=DEFAULT_PROCESSES,
+        help=f"Worker processes enriching files in batch mode (default: {DEFAULT_PROCESSES})"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="thread",
+        help="Run per-card lookups on a thread pool or as asyncio coroutines (default: thread)"
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=DEFAULT_RATE,
+        help=f"Scryfall request budget shared by all workers (default: {DEFAULT_RATE:g})"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"HTTP timeout in seconds (default: {DEFAULT_TIMEOUT})"
+    )
+    parser.add_argument(
+        "--max-rows",
+        type=int,
+        default=0,
+        help="Only look up the first N Magic rows (default: all)"
+    )
+    parser.add_argument(
+        "--no-batch",
+        action="store_true",
+        help="Skip /cards/collection batching and look up every card individually"
+    )
+    parser.add_argument(
+        "--bulk-index",
+        help="Resolve cards offline from a color table or card index built by build_bulk_index.py"
+    )
+    parser.add_argument(
+        "--cache",
+        default="card_cache.sqlite3",
+        help="Persistent lookup cache file (default: card_cache.sqlite3)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write the lookup cache"
+    )
+    parser.add_argument(
+        "--cache-ttl-days",
+        type=float,
+        default=30,
+        help="Lookup cache entry lifetime in days (default: 30)"
+    )
+    parser.add_argument(
+        "--negative-ttl-days",
+        type=float,
+        default=DEFAULT_NEGATIVE_TTL_SECONDS / (24 * 3600),
+        help="How long cards Scryfall couldn't find are skipped before being retried (default: %(default)g)"
+    )
+    parser.add_argument(
+        "--clear-unresolved",
+        action="append",
+        default=[],
+        metavar="SET",
+        help="Forget cards recorded as not found for this set code or set name (repeatable); "
+             "runs the pull list(s) afterwards if INPUT_CSV is given"
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help=f"Lookup cache size limit in cards (default: {DEFAULT_MAX_ENTRIES})"
+    )
+    parser.add_argument(
+        "--reuse",
+        metavar="FILE",
+        help="Reuse colors of rows resolved in earlier runs saved in FILE, and save this run's results to it"
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        metavar="DIR",
+        help="Save lookups to a checkpoint in DIR as they finish; rerunning the same input(s) after an "
+             "interruption resumes from it (default: off)"
+    )
+    parser.add_argument(
+        "--checkpoint-max-age-hours",
+        type=float,
+        default=DEFAULT_MAX_AGE_SECONDS / 3600,
+        help="Delete checkpoints in --checkpoint-dir left unfinished for longer than this (default: %(default)g)"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=0,
+        help="Stream the CSV in chunks of N rows to bound memory use on very large exports (default: off)"
+    )
+    parser.add_argument(
+        "--page-per-set",
+        action="store_true",
+        help="Start each set on a new printed page in the checklist"
+    )
+    parser.add_argument(
+        "--split-by-set",
+        action="store_true",
+        help="Also write a separate checklist file per set"
+    )
+    parser.add_argument(
+        "--export-format",
+        choices=list(EXPORT_FORMATS),
+        default="csv",
+        help="Format of the enriched pull list: csv, gzip-compressed csv.gz, or parquet (needs pyarrow) (default: csv)"
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Don't print progress"
+    )
+    return parser
+
+
+def open_cache(args) -> CardCache:
+    return CardCache(args.cache, ttl_seconds=args.cache_ttl_days * 24 * 3600, max_entries=args.cache_max_entries,
+                     negative_ttl_seconds=args.negative_ttl_days * 24 * 3600)
+
+
+def clear_unresolved(args):
+    """Drop negative cache entries for each --clear-unresolved set (a set name is mapped to its code)"""
+    set_map = load_set_code_map(args.set_map)
+    cache = open_cache(args)
+    try:
+        for value in args.clear_unresolved:
+            set_code = set_map.get(value, value)
+            removed = cache.clear_unresolved(set_code)
+            print(f"Cleared {removed} unresolved card(s) for set {set_code}")
+    finally:
+        cache.close()
+
+
+def load_run_memory(args) -> Optional[RunMemory]:
+    try:
+        return RunMemory.load(args.reuse) if args.reuse else None
+    except (OSError, ValueError) as e:
+        print(f"Error reading {args.reuse}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def open_checkpoint(args, bulk_index) -> Optional[RunCheckpoint]:
+    """The --checkpoint-dir checkpoint for these input files, after deleting stale ones; None if not checkpointing"""
+    if not args.checkpoint_dir or bulk_index is not None:
+        return None
+    try:
+        remove_stale(args.checkpoint_dir, args.checkpoint_max_age_hours * 3600)
+        checkpoint = RunCheckpoint(checkpoint_path(args.checkpoint_dir, file_run_id(args.input_csv)))
+    except OSError as e:
+        print(f"Error opening checkpoint in {args.checkpoint_dir}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if len(checkpoint) and not args.quiet:
+        print(f"Resuming from {checkpoint.path}: {len(checkpoint)} cards already looked up", file=sys.stderr)
+    return checkpoint
+
+
+def print_diagnostics(diagnostics):
+    if diagnostics["http_calls"]:
+        print(f"HTTP calls: {diagnostics['http_calls']} | Retries: {diagnostics['retries']}"
+              f" | Throttle wait: {diagnostics['throttle_wait_seconds']} s")
+
+
+def main_batch(args):
+    """Several input files: look their cards up once, then enrich the files in worker processes"""
+    metrics = RunMetrics()
+    set_map = load_set_code_map(args.set_map)
+    bulk_index = load_offline_index(args.bulk_index) if args.bulk_index else None
+    cache = None
+    if not args.no_cache and bulk_index is None:
+        cache = open_cache(args)
+    run_memory = load_run_memory(args)
+    checkpoint = open_checkpoint(args, bulk_index)
+
+    sources = [BatchSource.from_path(path) for path in args.input_csv]
+    try:
+        results, summary = run_batch(
+            sources, set_map, output_dir=args.output_dir, processes=args.processes,
+            progress=None if args.quiet else throttle_progress(print_progress), metrics=metrics, reuse=run_memory,
+            page_per_set=args.page_per_set, split_by_set=args.split_by_set, export_format=args.export_format,
+            bulk_index=bulk_index, cache=cache, batch=not args.no_batch, workers=args.workers, engine=args.engine,
+            requests_per_second=args.requests_per_second, timeout=args.timeout, checkpoint=checkpoint,
+        )
+    except (OSError, ValueError) as e:
+        print(f"\nError: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
+    if not args.quiet:
+        print(file=sys.stderr)
+    if run_memory is not None:
+        run_memory.save(args.reuse)
+    if checkpoint is not None and not (summary["rate_limited_lookups"] or summary["failed_lookups"]):
+        checkpoint.discard()
+
+    summary_path = os.path.join(args.output_dir, "batch_summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    for result in summary["files"]:
+        print(f"{result['name']}: Filled: {result['filled']} | Skipped/Unknown: {result['skipped_or_unknown']}"
+              f" | Rows: {result['rows']} | {result['seconds']:.2f} s")
+    print(f"Total: Filled: {summary['filled']} | Skipped/Unknown: {summary['skipped_or_unknown']} | Rows: {summary['rows']}")
+    print(f"Unique lookups: {summary['unique_lookups']} for {summary['file_keys']} per-file card keys"
+          + (f" | Resumed from checkpoint: {summary['resumed_lookups']}" if checkpoint is not None else ""))
+    print_diagnostics(summary["diagnostics"])
+    print(f"Wrote outputs for {len(results)} files to {args.output_dir} and {summary_path} in {summary['seconds']:.2f} s")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.clear_unresolved:
+        clear_unresolved(args)
+        if not args.input_csv:
+            return
+    elif not args.input_csv:
+        parser.error("the following arguments are required: input_csv")
+    if args.export_format == "parquet" and pa is None:
+        print("--export-format parquet needs pyarrow (pip install pyarrow)", file=sys.stderr)
+        sys.exit(1)
+
+    if len(args.input_csv) > 1:
+        if args.chunksize or args.max_rows:
+            print("--chunksize and --max-rows can't be used with several input files", file=sys.stderr)
+            sys.exit(1)
+        main_batch(args)
+        return
+    input_csv = args.input_csv[0]
+
+    if args.chunksize and args.max_rows:
+        print("--max-rows can't be combined with --chunksize", file=sys.stderr)
+        sys.exit(1)
+    if args.chunksize and args.export_format == "parquet":
+        print("--chunksize streams CSV; use --export-format csv or csv.gz with it", file=sys.stderr)
+        sys.exit(1)
+
+    metrics = RunMetrics()
+    try:
+        set_map = load_set_code_map(args.set_map)
+        with metrics.stage("parse_csv"):
+            df = None if args.chunksize else read_pull_list(input_csv)
+    except Exception as e:
+        print(f"Error reading input: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if df is not None:
+        missing = missing_columns(df)
+        if missing:
+            print(f"Missing required column(s): {', '.join(missing)}", file=sys.stderr)
+            sys.exit(1)
+
+    bulk_index = load_offline_index(args.bulk_index) if args.bulk_index else None
+    cache = None
+    if not args.no_cache and bulk_index is None:
+        cache = open_cache(args)
+
+    run_memory = load_run_memory(args)
+    checkpoint = open_checkpoint(args, bulk_index)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    csv_path, html_path, report_path = output_paths(os.path.splitext(os.path.basename(input_csv))[0], args.output_dir,
+                                                    args.export_format)
+    fill_kwargs = dict(
+        bulk_index=bulk_index, cache=cache, batch=not args.no_batch,
+        progress=None if args.quiet else throttle_progress(print_progress), workers=args.workers, engine=args.engine,
+        requests_per_second=args.requests_per_second, timeout=args.timeout, metrics=metrics, reuse=run_memory,
+        checkpoint=checkpoint,
+    )
+    stats = {}
+    # With --chunksize, each chunk's checklist rows, spilled to a temporary directory as it's written
+    spill = ChecklistSpill(dir=args.output_dir) if args.chunksize else None
+    try:
+        if args.chunksize:
+            rows, filled, skipped = enrich_csv_stream(input_csv, csv_path, set_map, chunksize=args.chunksize,
+                                                      stats=stats, checklist=spill, **fill_kwargs)
+        else:
+            result_df, filled, skipped = fill_colors(df, set_map, stats=stats, max_rows=args.max_rows, **fill_kwargs)
+            rows = len(result_df)
+            with metrics.stage("write_csv"):
+                write_export(result_df, csv_path, args.export_format)
+    except ValueError as e:
+        if spill is not None:
+            spill.close()
+        print(f"\n{e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
+    if not args.quiet:
+        print(file=sys.stderr)
+    if run_memory is not None:
+        run_memory.save(args.reuse)
+    if checkpoint is not None and not (stats.get("rate_limited") or stats.get("lookup_errors")):
+        checkpoint.discard()
+
+    with metrics.stage("checklist"), open(html_path, "w", encoding="utf-8") as f:
+        if spill is not None:
+            spill.write(f, page_per_set=args.page_per_set)
+        else:
+            write_checklist(result_df, f, page_per_set=args.page_per_set)
+    if args.split_by_set:
+        stem = os.path.splitext(os.path.basename(html_path))[0]
+        with metrics.stage("checklist"):
+            if spill is not None:
+                set_paths = spill.write_by_set(os.path.join(args.output_dir, stem), prefix=stem)
+            else:
+                set_paths = write_checklists_by_set(result_df, os.path.join(args.output_dir, stem), prefix=stem)
+        print(f"Wrote {len(set_paths)} per-set checklists to {os.path.join(args.output_dir, stem)}")
+    if spill is not None:
+        spill.close()
+    report = build_report(rows, filled, skipped, stats, metrics=metrics)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Filled: {filled} | Skipped/Unknown: {skipped} | Rows: {rows}")
+    if run_memory is not None:
+        print(f"Reused from previous runs: {stats.get('reused_rows', 0)} | Looked up: {stats.get('looked_up_rows', 0)}")
+    if checkpoint is not None:
+        print(f"Resumed from checkpoint: {stats.get('resumed_lookups', 0)}")
+    print_diagnostics(report["diagnostics"])
+    print(f"Wrote {csv_path}, {html_path} and {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Memory-mapped (set, collector number) -> color code table for offline mode.
+
+The offline path only needs the one color code color_from_card() derives
+per card, not the card fields kept by BulkCardIndex. A color table stores
+each key as a 64-bit hash in a sorted array next to a parallel array of
+one-byte codes, for both (set, collector number) and (set, normalized
+name) keys. The file is memory-mapped and the arrays are used in place,
+so opening it takes microseconds, pages are shared between processes,
+and a lookup is a binary search. The hashes are 64-bit BLAKE2b, so a
+false match between two of the ~10^5 keys is vanishingly unlikely.
+
+File layout (little-endian):
+    header   8s magic, u32 version, u32 number count, u32 name count, u32 reserved
+    uint64[number count]  sorted (set, collector number) hashes
+    uint64[name count]    sorted (set, name) hashes
+    uint8[number count]   color codes for the number keys
+    uint8[name count]     color codes for the name keys
+
+Build it with `build_bulk_index.py --format table`.
+"""
+
+import hashlib
+import mmap
+import struct
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+
+from atomic_file import atomic_write
+from scryfall_bulk import BulkCardIndex, normalize_name
+
+MAGIC = b"TCGCOLOR"
+TABLE_VERSION = 1
+HEADER = struct.Struct("<8sIIII")
+# Byte value -> color code returned by color_from_card()
+CODES = ("", "W", "U", "B", "R", "G", "Gd", "C", "L")
+CODE_BYTES = {code: i for i, code in enumerate(CODES)}
+
+
+def key_hash(*parts: str) -> int:
+    return int.from_bytes(hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def number_hash(set_code: str, cn: str) -> int:
+    return key_hash(str(set_code).lower(), str(cn))
+
+
+def name_hash(set_code: str, name: str) -> int:
+    return key_hash(str(set_code).lower(), normalize_name(name))
+
+
+def _sorted_arrays(colors: Dict[int, str]) -> Tuple[np.ndarray, np.ndarray]:
+    hashes = np.fromiter(colors.keys(), dtype="<u8", count=len(colors))
+    codes = np.fromiter((CODE_BYTES[c] for c in colors.values()), dtype=np.uint8, count=len(colors))
+    order = np.argsort(hashes, kind="stable")
+    return hashes[order], codes[order]
+
+
+def write_color_table(path: str, number_colors: Iterable[Tuple[str, str, str]],
+                      name_colors: Iterable[Tuple[str, str, str]]):
+    """Write a table from (set code, collector number, color) and (set code, name, color) triples"""
+    numbers: Dict[int, str] = {}
+    for set_code, cn, color in number_colors:
+        numbers.setdefault(number_hash(set_code, cn), color)
+    names: Dict[int, str] = {}
+    for set_code, name, color in name_colors:
+        names.setdefault(name_hash(set_code, name), color)
+    number_keys, number_codes = _sorted_arrays(numbers)
+    name_keys, name_codes = _sorted_arrays(names)
+    # Replaced atomically, so a running app never maps a half-written file
+    with atomic_write(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, TABLE_VERSION, len(number_keys), len(name_keys), 0))
+        for array in (number_keys, name_keys, number_codes, name_codes):
+            f.write(array.tobytes())
+
+
+def color_table_from_index(path: str, index: BulkCardIndex, to_color):
+    """Precompute every card's color with to_color (color_from_card) and write the table"""
+    write_color_table(
+        path,
+        ((s, cn, to_color(card)) for (s, cn), card in index.by_number.items()),
+        # by_name keys are already normalized; normalize_name() leaves them unchanged
+        ((s, n, to_color(card)) for (s, n), card in index.by_name.items()),
+    )
+
+
+class ColorTable:
+    """Read-only view of a color table file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_numbers, n_names, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a color table")
+        if version != TABLE_VERSION:
+            raise ValueError(f"Unsupported color table version in {path}: {version}")
+        offset = HEADER.size
+        self.number_keys = np.frombuffer(self._mmap, dtype="<u8", count=n_numbers, offset=offset)
+        offset += 8 * n_numbers
+        self.name_keys = np.frombuffer(self._mmap, dtype="<u8", count=n_names, offset=offset)
+        offset += 8 * n_names
+        self.number_codes = np.frombuffer(self._mmap, dtype=np.uint8, count=n_numbers, offset=offset)
+        offset += n_numbers
+        self.name_codes = np.frombuffer(self._mmap, dtype=np.uint8, count=n_names, offset=offset)
+
+    def __len__(self) -> int:
+        return len(self.number_keys)
+
+    @staticmethod
+    def _find(keys: np.ndarray, codes: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+        """Code byte for each hash, or -1 where the key is absent"""
+        if not len(keys):
+            return np.full(len(hashes), -1, dtype=np.int16)
+        pos = np.minimum(np.searchsorted(keys, hashes), len(keys) - 1)
+        return np.where(keys[pos] == hashes, codes[pos].astype(np.int16), -1)
+
+    def color(self, set_code: str, cn: str, name: str) -> Optional[str]:
+        """Same order as fetch_card(): set + collector number, then set + exact name; None if unknown"""
+        code = self._find(self.number_keys, self.number_codes, np.array([number_hash(set_code, cn)], dtype="<u8"))[0]
+        if code < 0 and name:
+            code = self._find(self.name_keys, self.name_codes, np.array([name_hash(set_code, name)], dtype="<u8"))[0]
+        return CODES[code] if code >= 0 else None
+
+    def colors(self, lookups: Dict[Hashable, Tuple[str, str, str]]) -> Dict[Hashable, Optional[str]]:
+        """color() for many (set code, cn, name) keys at once, with one binary search per array"""
+        ids = list(lookups)
+        keys = list(lookups.values())
+        numbers = np.fromiter((number_hash(s, cn) for s, cn, _ in keys), dtype="<u8", count=len(keys))
+        codes = self._find(self.number_keys, self.number_codes, numbers)
+        # Only the number misses fall back to the name key
+        retry = [i for i in np.flatnonzero(codes < 0).tolist() if keys[i][2]]
+        if retry:
+            names = np.fromiter((name_hash(keys[i][0], keys[i][2]) for i in retry), dtype="<u8", count=len(retry))
+            codes[retry] = self._find(self.name_keys, self.name_codes, names)
+        return {i: CODES[c] if c >= 0 else None for i, c in zip(ids, codes.tolist())}
+
+    def close(self):
+        # The arrays are views of the map; drop them before closing it
+        self.number_keys = self.name_keys = self.number_codes = self.name_codes = None
+        self._mmap.close()
+
+
+def is_color_table(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_offline_index(path: str):
+    """Open a color table or a BulkCardIndex JSON file, whichever `path` is"""
+    return ColorTable(path) if is_color_table(path) else BulkCardIndex.load(path)
@@ -0,0 +1,129 @@
+"""
+Run diagnostics: wall time per pipeline stage and per-tier HTTP statistics.
+
+A `RunMetrics` object is threaded through a run (fill_colors, the Scryfall
+client, the app and CLI) and serialized into the run report with
+`to_dict()`. Lookup tiers are "collection" (batched /cards/collection),
+"direct" (/cards/{set}/{cn}), "search_cn" (set + collector number search)
+and "search_name" (set + exact name search). All methods are thread-safe.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000]
+
+
+def _bucket_label(i: int) -> str:
+    if i == len(LATENCY_BUCKETS_MS):
+        return f">={LATENCY_BUCKETS_MS[-1]}ms"
+    return f"<{LATENCY_BUCKETS_MS[i]}ms"
+
+
+class TierStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.found = 0
+        self.lookups = 0
+        self.statuses: Dict[str, int] = {}
+        self.histogram: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "lookups": self.lookups,
+            "found": self.found,
+            "success_rate": round(self.found / self.lookups, 4) if self.lookups else None,
+            "statuses": dict(sorted(self.statuses.items())),
+            "latency_ms": {
+                "mean": round(1000 * self.total_seconds / self.calls, 1) if self.calls else None,
+                "max": round(1000 * self.max_seconds, 1),
+                "histogram": {_bucket_label(i): n for i, n in enumerate(self.histogram)},
+            },
+        }
+
+
+class RunMetrics:
+    """Collects stage timings, HTTP latency per tier, retries and throttle waits for one run"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.tiers: Dict[str, TierStats] = {}
+        self.throttle_wait_seconds = 0.0
+        self.shared_lookups = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block; repeated stages with the same name accumulate"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def record_stage(self, name: str, seconds: float):
+        """Set a stage's time outright (for steps that are redone, e.g. on every Streamlit rerun)"""
+        with self._lock:
+            self.stages[name] = seconds
+
+    def _tier(self, tier: str) -> TierStats:
+        if tier not in self.tiers:
+            self.tiers[tier] = TierStats()
+        return self.tiers[tier]
+
+    def record_http(self, tier: str, seconds: float, status: int):
+        """One HTTP attempt (retries included) and its latency"""
+        ms = seconds * 1000
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms < bound), len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            stats = self._tier(tier)
+            stats.calls += 1
+            stats.histogram[bucket] += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+
+    def record_retry(self, tier: str):
+        with self._lock:
+            self._tier(tier).retries += 1
+
+    def record_outcome(self, tier: str, found: bool, count: int = 1):
+        """Whether `count` lookups at this tier produced a card"""
+        with self._lock:
+            stats = self._tier(tier)
+            stats.lookups += count
+            if found:
+                stats.found += count
+
+    def record_wait(self, seconds: float):
+        """Time spent blocked on the rate limiter"""
+        if seconds:
+            with self._lock:
+                self.throttle_wait_seconds += seconds
+
+    def record_shared(self):
+        """A lookup answered by another run's request for the same card (see lookup_service)"""
+        with self._lock:
+            self.shared_lookups += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            tiers = {name: stats.to_dict() for name, stats in self.tiers.items()}
+            return {
+                "stages_seconds": {name: round(s, 4) for name, s in self.stages.items()},
+                "http": tiers,
+                "http_calls": sum(t["calls"] for t in tiers.values()),
+                "retries": sum(t["retries"] for t in tiers.values()),
+                "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+                "shared_lookups": self.shared_lookups,
+            }
@@ -0,0 +1,117 @@
+"""
+Concurrent lookup engine for Scryfall requests.
+
+Worker threads share a single token bucket, so the request-per-second
+budget is enforced across all of them instead of sleeping after every row;
+the asyncio engine (async_engine) awaits the same bucket.
+Completion callbacks run on the calling thread, which keeps Streamlit
+widget updates (progress bars) off the worker threads.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+DEFAULT_RATE = 10.0
+DEFAULT_WORKERS = 4
+
+
+class LookupCancelled(Exception):
+    """The run was stopped before this task ran"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available, acquire_async() awaits one"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _take(self, tokens: float, waited: float) -> float:
+        """Take tokens if the bucket has them and return 0; otherwise the seconds until it will"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Allow for rounding in the refill: sleeping exactly the returned delay can come up a hair short
+            if self._tokens >= tokens - 1e-9:
+                self._tokens -= tokens
+                self.waited += waited
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens from the bucket, sleeping as needed; returns seconds waited"""
+        waited = 0.0
+        while True:
+            delay = self._take(tokens, waited)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """acquire() for coroutines: waits without blocking the event loop"""
+        waited = 0.0
+        while True:
+            delay = self._take(tokens, waited)
+            if not delay:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+def run_concurrent(tasks: Dict[Hashable, Tuple], fn: Callable[..., Any], workers: int = DEFAULT_WORKERS,
+                   on_done: Optional[Callable[[Hashable, Any, int, int], None]] = None,
+                   errors: Optional[Dict[Hashable, Exception]] = None,
+                   cancel: Optional[threading.Event] = None) -> Dict[Hashable, Any]:
+    """
+    Call fn(*args) for every (task id, args) pair on a thread pool.
+
+    Returns results by task id, in the order of `tasks`. on_done(task_id,
+    result, done, total) is called on the calling thread as each task
+    finishes. A task that raises gets a result of None, and its exception is
+    stored in `errors` if given.
+    Once `cancel` is set, tasks that haven't started are dropped with a
+    LookupCancelled error; tasks already running are allowed to finish.
+    """
+    results: Dict[Hashable, Any] = {}
+    total = len(tasks)
+    if not total:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(fn, *args): task_id for task_id, args in tasks.items()}
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                task_id = futures[future]
+                if future.cancelled():
+                    result = None
+                    if errors is not None:
+                        errors[task_id] = LookupCancelled()
+                else:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = None
+                        if errors is not None:
+                            errors[task_id] = e
+                results[task_id] = result
+                if cancel is not None and cancel.is_set():
+                    for f in futures:
+                        f.cancel()
+                if on_done and not future.cancelled():
+                    on_done(task_id, result, done, total)
+        except BaseException:
+            # Interrupted (e.g. Ctrl+C): don't let the pool work through the queue before exiting
+            for f in futures:
+                f.cancel()
+            raise
+    return {task_id: results[task_id] for task_id in tasks}
@@ -0,0 +1,148 @@
+"""
+Process-wide Scryfall lookups shared by every session of the app.
+
+Staff often upload overlapping pull lists at the same moment. With one
+lookup service per server process (the app keeps it in st.cache_resource),
+every run draws from the same token bucket, so the server as a whole stays
+within the request budget however many sessions are active. Lookups are
+also single-flight: a run that needs a (set code, collector number, name)
+key another run is already looking up waits for that result instead of
+sending the same requests again. Batched runs claim all their keys before
+sending them to /cards/collection, so overlapping pull lists don't batch
+the same cards either. See fill_colors(service=...).
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Tuple
+
+from lookup_engine import DEFAULT_RATE, TokenBucket
+
+
+class _Abandoned(Exception):
+    """The caller resolving a key was stopped before it had a result; a waiter tries the key itself"""
+
+
+class LookupService:
+    """One rate limiter and single-flight lookups for all the runs in a process"""
+
+    def __init__(self, requests_per_second: float = DEFAULT_RATE):
+        self.limiter = TokenBucket(requests_per_second)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        # Lookups run here, and lookups answered by one already in flight
+        self.lookups = 0
+        self.shared = 0
+
+    def _claim(self, key: Hashable) -> Tuple[Future, bool]:
+        """The future for key's result, and whether the caller owns it (has to run the lookup)"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._in_flight[key] = Future()
+            # A running future can't be cancelled, e.g. by an async waiter giving up on it
+            future.set_running_or_notify_cancel()
+            self.lookups += 1
+            return future, True
+
+    def claim_many(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Future], Dict[Hashable, Future]]:
+        """
+        Claim several keys at once, e.g. before batching them.
+
+        Returns (owned, shared): the futures of the keys the caller now owns
+        and has to finish with run_claimed() or settle(), and those of keys
+        another caller already has in flight, to wait() on. Owned keys the
+        caller gives up on have to be release()d.
+        """
+        owned, shared = {}, {}
+        for key in keys:
+            future, owner = self._claim(key)
+            (owned if owner else shared)[key] = future
+        return owned, shared
+
+    def settle(self, key: Hashable, future: Future, result: Any = None, error: BaseException = None):
+        """Publish the result (or exception) of an owned key to every caller waiting on it"""
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def release(self, owned: Dict[Hashable, Future]):
+        """Give up the owned keys that weren't settled; callers waiting on them look them up themselves"""
+        for key, future in owned.items():
+            if not future.done():
+                self.settle(key, future, error=_Abandoned())
+
+    def run_claimed(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> Any:
+        """Run fn() for an owned key and settle it with the outcome"""
+        try:
+            result = fn()
+        except Exception as e:
+            self.settle(key, future, error=e)
+            raise
+        except BaseException:
+            self.settle(key, future, error=_Abandoned())
+            raise
+        self.settle(key, future, result)
+        return result
+
+    async def run_claimed_async(self, key: Hashable, future: Future, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """run_claimed() for coroutines"""
+        try:
+            result = await fn()
+        except Exception as e:
+            self.settle(key, future, error=e)
+            raise
+        except BaseException:
+            # Cancelled: the run was stopped; a waiting run looks the key up itself
+            self.settle(key, future, error=_Abandoned())
+            raise
+        self.settle(key, future, result)
+        return result
+
+    def wait(self, key: Hashable, future: Future, fn: Callable[[], Any], metrics=None) -> Any:
+        """The result of a key another caller has in flight; if that caller gives up, resolve() it with fn"""
+        if metrics is not None:
+            metrics.record_shared()
+        try:
+            return future.result()
+        except _Abandoned:
+            return self.resolve(key, fn, metrics=metrics)
+
+    async def wait_async(self, key: Hashable, future: Future, fn: Callable[[], Awaitable[Any]], metrics=None) -> Any:
+        """wait() for coroutines"""
+        if metrics is not None:
+            metrics.record_shared()
+        try:
+            return await asyncio.wrap_future(future)
+        except _Abandoned:
+            return await self.resolve_async(key, fn, metrics=metrics)
+
+    def resolve(self, key: Hashable, fn: Callable[[], Any], metrics=None) -> Any:
+        """
+        fn() for this key, or the result of the call already in flight for it.
+
+        An exception raised by fn() is raised to every caller waiting on it.
+        metrics (a RunMetrics) counts the calls answered by another caller.
+        """
+        future, owner = self._claim(key)
+        if owner:
+            return self.run_claimed(key, future, fn)
+        return self.wait(key, future, fn, metrics=metrics)
+
+    async def resolve_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]], metrics=None) -> Any:
+        """resolve() for coroutines: awaits fn(), or the lookup already in flight for the key"""
+        future, owner = self._claim(key)
+        if owner:
+            return await self.run_claimed_async(key, future, fn)
+        return await self.wait_async(key, future, fn, metrics=metrics)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"lookups": self.lookups, "shared": self.shared, "in_flight": len(self._in_flight)}
@@ -5,51 +5,40 @@ and generate a consolidated set_code_map.json
 
 This script:
 1. Fetches sets from Scryfall API (primary source)
-2. Optionally loads TCGplayer set mappings from a JSON file
-3. Merges them intelligently, preferring TCGplayer names when available
+2. Loads TCGplayer set mappings from JSON files (by default
+   tcgplayer_code_to_scryfall_code.json and tcgplayer_to_scryfall.json)
+3. Merges them, adding TCGplayer names that Scryfall doesn't use
 4. Outputs the consolidated mapping
 
 Usage:
-    python merge_set_sources.py [--tcgplayer-file FILE] [--output OUTPUT_FILE]
+    python merge_set_sources.py [--tcgplayer-file FILE ...] [--output OUTPUT_FILE] [--sets-file FILE | --refresh]
 """
 
 import json
-import requests
+import os
 import argparse
 import sys
 from typing import Dict, List, Any, Optional
 from datetime import datetime
-from update_set_codes import fetch_scryfall_sets, filter_magic_sets
+from set_map_builder import (DEFAULT_TCGPLAYER_FILES, combine_mappings, fold_in, read_tcgplayer_mapping,
+                             scryfall_name_map)
+from update_set_codes import add_sets_arguments, filter_magic_sets, load_scryfall_sets
 
 def load_tcgplayer_mapping(file_path: str) -> Optional[Dict[str, str]]:
-    """Load TCGplayer set name to code mapping from JSON file"""
+    """Load TCGplayer set name to Scryfall code mapping from JSON file"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Handle different JSON formats
-        if isinstance(data, dict):
-            # Check if it's already in name->code format
-            if all(isinstance(v, str) for v in data.values()):
-                print(f"Loaded {len(data)} TCGplayer mappings (simple format)")
-                return data
-            # Check if it's in detailed format with tcgplayer_code
-            elif all(isinstance(v, dict) and "tcgplayer_code" in v for v in data.values()):
-                mapping = {}
-                for name, info in data.items():
-                    if "tcgplayer_code" in info:
-                        mapping[name] = info["tcgplayer_code"]
-                print(f"Loaded {len(mapping)} TCGplayer mappings (detailed format)")
-                return mapping
-        
-        print(f"Warning: Unrecognized TCGplayer file format in {file_path}", file=sys.stderr)
-        return None
+        mapping = read_tcgplayer_mapping(file_path)
+        print(f"Loaded {len(mapping)} TCGplayer mappings from {file_path}")
+        return mapping
     except FileNotFoundError:
         print(f"TCGplayer file not found: {file_path} (skipping)", file=sys.stderr)
         return None
     except json.JSONDecodeError as e:
         print(f"Error parsing TCGplayer JSON: {e}", file=sys.stderr)
         return None
+    except ValueError as e:
+        print(f"Warning: {e}", file=sys.stderr)
+        return None
     except Exception as e:
         print(f"Error loading TCGplayer file: {e}", file=sys.stderr)
         return None
@@ -64,52 +53,19 @@ def create_merged_mapping(
     Strategy:
     1. Use Scryfall as base (set name -> scryfall code)
     2. If TCGplayer mapping exists, add those entries
-    3. For conflicts, prefer TCGplayer names (since that's what appears in CSVs)
-    4. Handle name variations and duplicates
+    3. For conflicts, keep the Scryfall code (since that's what we use for API lookups)
+    4. Duplicate Scryfall names prefer the set with a release date, then the newer set
     """
-    mapping = {}
-    
     # First pass: Add all Scryfall sets
-    scryfall_name_to_code = {}
-    for s in scryfall_sets:
-        name = s.get("name", "").strip()
-        code = s.get("code", "").strip()
-        
-        if name and code:
-            # Handle duplicates - keep the first one (or prefer with release date)
-            if name not in scryfall_name_to_code:
-                scryfall_name_to_code[name] = code
-            else:
-                existing_code = scryfall_name_to_code[name]
-                existing_set = next((x for x in scryfall_sets if x.get("code") == existing_code), None)
-                current_set = s
-                
-                if existing_set and current_set.get("released_at") and existing_set.get("released_at"):
-                    if current_set.get("released_at") > existing_set.get("released_at"):
-                        scryfall_name_to_code[name] = code
+    mapping = scryfall_name_map(scryfall_sets)
+    print(f"Added {len(mapping)} sets from Scryfall")
     
-    # Add Scryfall mappings
-    mapping.update(scryfall_name_to_code)
-    print(f"Added {len(scryfall_name_to_code)} sets from Scryfall")
-    
-    # Second pass: Add/override with TCGplayer mappings if available
+    # Second pass: Add TCGplayer names Scryfall doesn't use
     if tcgplayer_mapping:
-        tcgplayer_added = 0
-        tcgplayer_overrides = 0
-        
-        for tcg_name, tcg_code in tcgplayer_mapping.items():
-            if tcg_name not in mapping:
-                # New entry from TCGplayer
-                mapping[tcg_name] = tcg_code
-                tcgplayer_added += 1
-            else:
-                # Check if codes differ
-                existing_code = mapping[tcg_name]
-                if existing_code.lower() != tcg_code.lower():
-                    # TCGplayer might use different code format, but we'll keep Scryfall code
-                    # since that's what we use for API lookups
-                    print(f"  Note: '{tcg_name}' has different codes: Scryfall={existing_code}, TCGplayer={tcg_code} (keeping Scryfall)")
-                tcgplayer_overrides += 1
+        tcgplayer_added, conflicts = fold_in(mapping, tcgplayer_mapping)
+        tcgplayer_overrides = len(tcgplayer_mapping) - tcgplayer_added
+        for tcg_name, existing_code, tcg_code in conflicts:
+            print(f"  Note: '{tcg_name}' has different codes: Scryfall={existing_code}, TCGplayer={tcg_code} (keeping Scryfall)")
         
         print(f"Added {tcgplayer_added} new sets from TCGplayer")
         if tcgplayer_overrides > 0:
@@ -123,7 +79,14 @@ def main():
     )
     parser.add_argument(
         "--tcgplayer-file",
-        help="Path to TCGplayer set mapping JSON file (optional)"
+        action="append",
+        help="TCGplayer set mapping JSON file; repeat for several, earlier files win "
+             f"(default: {', '.join(DEFAULT_TCGPLAYER_FILES)} where present)"
+    )
+    parser.add_argument(
+        "--no-tcgplayer",
+        action="store_true",
+        help="Build from Scryfall only"
     )
     parser.add_argument(
         "--output",
@@ -135,13 +98,13 @@ def main():
         action="store_true",
         help="Create a backup of existing output file before overwriting"
     )
+    add_sets_arguments(parser)
     
     args = parser.parse_args()
     
     # Backup existing file if requested
     if args.backup:
         import shutil
-        import os
         if os.path.exists(args.output):
             backup_name = f"{args.output}.backup.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             shutil.copy2(args.output, backup_name)
@@ -151,16 +114,20 @@ def main():
     print("=" * 60)
     print("Fetching sets from Scryfall...")
     print("=" * 60)
-    all_sets = fetch_scryfall_sets()
+    all_sets = load_scryfall_sets(args)
     magic_sets = filter_magic_sets(all_sets)
     
-    # Load TCGplayer mapping if provided
+    # Load TCGplayer mappings, the default files unless told otherwise
     tcgplayer_mapping = None
-    if args.tcgplayer_file:
+    tcgplayer_files = [] if args.no_tcgplayer else args.tcgplayer_file or [
+        path for path in DEFAULT_TCGPLAYER_FILES if os.path.exists(path)
+    ]
+    if tcgplayer_files:
         print("\n" + "=" * 60)
-        print(f"Loading TCGplayer mappings from {args.tcgplayer_file}...")
+        print(f"Loading TCGplayer mappings from {', '.join(tcgplayer_files)}...")
         print("=" * 60)
-        tcgplayer_mapping = load_tcgplayer_mapping(args.tcgplayer_file)
+        mappings = [m for m in map(load_tcgplayer_mapping, tcgplayer_files) if m]
+        tcgplayer_mapping = combine_mappings(mappings) or None
     
     # Merge mappings
     print("\n" + "=" * 60)
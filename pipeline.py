@@ -0,0 +1,1150 @@
+"""
+Pull list enrichment pipeline: color lookups, foil columns and the printable checklist.
+
+Everything here is UI-agnostic and safe to import without Streamlit, so it
+can be driven from app.py, from cli.py, from a scheduled job or a test.
+Long-running steps report progress through an optional
+`progress(fraction, text)` callback.
+"""
+
+import datetime as dt
+import gzip
+import hashlib
+import heapq
+import html
+import io
+import itertools
+import json
+import os
+import pickle
+import re
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+from async_engine import run_async
+from color_table import ColorTable
+from lookup_engine import DEFAULT_RATE, DEFAULT_WORKERS, LookupCancelled, TokenBucket, run_concurrent
+import scryfall_client
+from scryfall_batch import resolve_batch
+from scryfall_client import SCRYFALL_API, RateLimited, async_request as scryfall_request_async, get_session
+from scryfall_client import request as scryfall_request
+
+DEFAULT_TIMEOUT = 20
+DEFAULT_CHUNKSIZE = 50_000
+# Per-row lookup backends: a thread pool (lookup_engine) or coroutines (async_engine)
+ENGINES = ("thread", "async")
+REQUIRED_COLUMNS = ["Product Line", "Product Name", "Set", "Number"]
+CHECKLIST_COLUMNS = ["Product Name", "Quantity", "Color", "Number", "Set", "Product Line"]
+FINGERPRINT_COLUMNS = ["Set", "Number", "Product Name", "Condition"]
+# Columns that repeat heavily in an export, read as categoricals. Every other column is read as text, so ids,
+# quantities and collector numbers are written back as they were read (never 131202 as 131202.0), whichever
+# reader and chunk size read them
+CATEGORY_COLUMNS = ["Product Line", "Set", "Condition", "Rarity"]
+PULL_LIST_DTYPES = {col: "category" for col in CATEGORY_COLUMNS}
+# Columns fill_colors() adds, returned as categoricals: each holds a handful of distinct values
+ENRICHED_COLUMNS = ["Color", "Foil", "Is Foil", "Pokemon Holofoil"]
+# Cells pandas' CSV parser reads as missing by default (its na_values), given to pyarrow's reader to match
+NA_VALUES = ("", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A",
+             "NA", "NULL", "NaN", "None", "n/a", "nan", "null")
+# Export formats of the enriched pull list and the suffix of their files
+EXPORT_FORMATS = {"csv": ".csv", "csv.gz": ".csv.gz", "parquet": ".parquet"}
+# Seconds between progress updates passed on by throttle_progress()
+PROGRESS_INTERVAL = 0.25
+
+ProgressCallback = Callable[[float, str], None]
+
+
+def load_set_code_map(path="set_code_map.json"):
+    """Load set code mapping from JSON file; a missing file gives an empty mapping"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _pull_list_dtypes():
+    """read_csv() dtypes for a pull list: PULL_LIST_DTYPES, and text for every other column"""
+    return defaultdict(lambda: str, PULL_LIST_DTYPES)
+
+def _csv_column_names(source):
+    """Header of a CSV file (path or seekable binary file-like), leaving a file-like where it was"""
+    start = source.tell() if hasattr(source, "seek") else None
+    try:
+        return pa_csv.open_csv(source).schema.names
+    finally:
+        if start is not None:
+            source.seek(start)
+
+def _read_csv_arrow(source, usecols=None):
+    """
+    pyarrow's multithreaded CSV reader with _pull_list_dtypes(); columns not in usecols are never converted.
+
+    Returns None for files pyarrow would read differently from pandas'
+    parser (repeated headers, which pandas renames to "Name.1"); ragged
+    rows raise pyarrow.ArrowInvalid.
+    """
+    names = _csv_column_names(source)
+    if len(set(names)) < len(names):
+        return None
+    if usecols is not None:
+        names = [col for col in names if col in usecols]
+    column_types = {col: pa.string() for col in names}
+    column_types.update({col: pa.dictionary(pa.int32(), pa.string()) for col in CATEGORY_COLUMNS if col in names})
+    # Missing values spelled as pandas' parser spells them
+    df = pa_csv.read_csv(source, convert_options=pa_csv.ConvertOptions(
+        column_types=column_types, include_columns=names, strings_can_be_null=True,
+        null_values=list(NA_VALUES))).to_pandas()
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            # Categories in sorted order, as pandas' parser makes them, so sorting by them sorts alphabetically
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+        else:
+            # Missing text as NaN rather than None, as pandas' parser reads it
+            df[col] = df[col].where(df[col].notna())
+    return df
+
+def read_pull_list(source, usecols=None, engine=None):
+    """
+    Read a TCGplayer CSV export (path or file-like), dropping the trailing row.
+
+    Repeating columns (CATEGORY_COLUMNS) are read as categoricals and every
+    other column as text. With `usecols` only those columns are kept;
+    ones the file lacks are ignored. `engine` is "pyarrow" (the default
+    when pyarrow is installed) or "c" for pandas' own parser; files the
+    pyarrow reader can't read exactly as pandas would (ragged rows,
+    repeated headers) are read again with the C parser, as
+    are text-mode file-likes (open(path), io.StringIO), which pyarrow
+    can't read at all.
+    """
+    if engine is None:
+        engine = "pyarrow" if pa_csv is not None else "c"
+    if isinstance(source, io.TextIOBase):
+        engine = "c"
+    df = None
+    if engine == "pyarrow":
+        if hasattr(source, "read") and not (hasattr(source, "seekable") and source.seekable()):
+            data = source.read()
+            source = io.BytesIO(data) if isinstance(data, bytes) else io.StringIO(data)
+        start = source.tell() if hasattr(source, "seek") else None
+        try:
+            df = _read_csv_arrow(source, usecols)
+        except (pa.ArrowInvalid, TypeError):
+            # TypeError: a file-like giving str rather than bytes
+            pass
+        if df is None and start is not None:
+            source.seek(start)
+    if df is None:
+        df = pd.read_csv(source, dtype=_pull_list_dtypes(),
+                         usecols=(lambda col: col in usecols) if usecols is not None else None)
+    # Remove the last row
+    if len(df) > 0:
+        df = df.iloc[:-1]
+    return df
+
+def missing_columns(df):
+    return [c for c in REQUIRED_COLUMNS if c not in df.columns]
+
+def _no_progress(fraction, text):
+    pass
+
+def throttle_progress(progress: ProgressCallback, interval=PROGRESS_INTERVAL) -> ProgressCallback:
+    """Wrap a progress callback so it runs at most once per `interval` seconds; completions always pass"""
+    last = [float("-inf")]
+
+    def throttled(fraction, text):
+        now = time.monotonic()
+        if fraction >= 1.0 or now - last[0] >= interval:
+            last[0] = now
+            progress(fraction, text)
+    return throttled
+
+def clean_cn(v):
+    s = str(v).strip()
+    return s[:-2] if s.endswith(".0") else s
+
+def color_from_card(card):
+    ci = card.get("color_identity") or []
+    typ = (card.get("type_line") or "")
+    # Lands have empty color_identity by design
+    if "Land" in typ:
+        return "L"
+    if not ci:
+        # true colorless, artifacts, eldrazi, etc.
+        if "Artifact" in typ or "Eldrazi" in typ:
+            return "C"
+        return "C" if (card.get("colors")==[] or "Colorless" in (card.get("color_indicator") or "")) else ""
+    if len(ci) > 1:
+        return "Gd"
+    return {"W":"W","U":"U","B":"B","R":"R","G":"G"}.get(ci[0], "")
+
+def _checked(r):
+    # 404 (and 400 for unparseable searches) mean "no match"; anything else is a real error
+    if r.status_code not in (200, 400, 404):
+        r.raise_for_status()
+    return r
+
+def scryfall_get(url, params=None, limiter=None, timeout=DEFAULT_TIMEOUT, metrics=None, tier="http"):
+    return _checked(scryfall_request("GET", url, params=params, limiter=limiter, timeout=timeout, metrics=metrics,
+                                     tier=tier))
+
+def _record_outcome(metrics, tier, found):
+    if metrics is not None:
+        metrics.record_outcome(tier, found)
+    return found
+
+def lookup_tiers(set_code, cn, name, direct=True):
+    """
+    The fallback chain tried for one card: (tier name, url, query params).
+
+    direct=False leaves out the direct set+collector lookup, e.g. for a
+    card /cards/collection already reported as not found.
+    """
+    tiers = [
+        # 1) direct set+collector endpoint
+        ("direct", f"{SCRYFALL_API}/cards/{set_code}/{cn}", None),
+        # 2) search by set+cn
+        ("search_cn", f"{SCRYFALL_API}/cards/search", {"q": f"e:{set_code} cn:{cn}"}),
+        # 3) search by set+exact name (collector variants sometimes)
+        ("search_name", f"{SCRYFALL_API}/cards/search", {"q": f'!"{name}" e:{set_code}'}),
+    ]
+    return tiers if direct else tiers[1:]
+
+def card_from_response(tier, r):
+    """The card a tier's response resolved to, or None"""
+    if r.status_code != 200:
+        return None
+    if tier == "direct":
+        return r.json()
+    data = r.json().get("data") or []
+    return data[0] if data else None
+
+def fetch_card(set_code, cn, name, limiter=None, timeout=DEFAULT_TIMEOUT, metrics=None, direct=True):
+    for tier, url, params in lookup_tiers(set_code, cn, name, direct=direct):
+        r = scryfall_get(url, params=params, limiter=limiter, timeout=timeout, metrics=metrics, tier=tier)
+        card = card_from_response(tier, r)
+        if _record_outcome(metrics, tier, card is not None):
+            return card
+    return None
+
+async def fetch_card_async(call, set_code, cn, name, limiter=None, timeout=DEFAULT_TIMEOUT, metrics=None,
+                           direct=True):
+    """fetch_card() as a coroutine; each tier's request is sent through `call` (see async_engine.run_async)"""
+    for tier, url, params in lookup_tiers(set_code, cn, name, direct=direct):
+        r = _checked(await call(scryfall_request_async, "GET", url, params=params, limiter=limiter, timeout=timeout,
+                                metrics=metrics, tier=tier))
+        card = card_from_response(tier, r)
+        if _record_outcome(metrics, tier, card is not None):
+            return card
+    return None
+
+def as_str(series):
+    """Vectorized str(x) for every element, with NaN rendered as 'nan' on every pandas version"""
+    return series.astype(str).fillna("nan")
+
+def foil_flags(condition):
+    """Boolean Series: the Condition mentions foil (NaN never does)"""
+    return condition.notna() & as_str(condition).str.lower().str.contains("foil", regex=False)
+
+def pokemon_holofoil_types(condition, product_line):
+    """For Pokemon cards, detect if holofoil or reverse holofoil. Returns 'RH' for reverse, 'H' for holofoil, '' for non-foil"""
+    condition_str = as_str(condition).str.lower()
+    # Handle both "Pokemon" and "Pokemon Japan" product lines
+    is_pokemon = condition.notna() & product_line.notna() & as_str(product_line).str.strip().isin(["Pokemon", "Pokemon Japan"])
+    # Check for reverse holofoil first (more specific), then holofoil
+    # (handles "Near Mint Holofoil", "Near Mint Holofoil - Japanese", etc.)
+    return pd.Series(np.select(
+        [is_pokemon & condition_str.str.contains("reverse holofoil", regex=False),
+         is_pokemon & condition_str.str.contains("holofoil", regex=False)],
+        ["RH", "H"],
+        "",
+    ), index=condition.index)
+
+def row_fingerprints(df, set_map=None):
+    """
+    Stable 64-bit hash of each row's (Set, Number, Product Name, Condition); missing columns count as blank.
+
+    With `set_map`, a set is hashed by the code it maps to, so after a set's
+    mapping is fixed its rows no longer match colors remembered under the
+    old code; names the map lacks are hashed as they are.
+    """
+    parts = pd.DataFrame({
+        col: as_str(df[col]).str.strip().astype(object) if col in df.columns else ""
+        for col in FINGERPRINT_COLUMNS
+    }, index=df.index)
+    if set_map is not None:
+        parts["Set"] = parts["Set"].map(set_map).fillna(parts["Set"]).astype(str).astype(object)
+    # 12.0 and "12" are the same collector number
+    parts["Number"] = parts["Number"].where(~parts["Number"].str.endswith(".0"), parts["Number"].str[:-2])
+    return pd.util.hash_pandas_object(parts, index=False)
+
+def frame_digest(df):
+    """Content hash of a whole frame (column names, index and values), e.g. to key cached exports of it"""
+    digest = hashlib.sha256("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()[:32]
+
+class LookupFailed(Exception):
+    """A lookup failed on something other than rate limiting (a timeout, a dropped connection, a 5xx)"""
+
+def resolve_color(set_code, cn, name, bulk_index=None, cache=None, check_cache=True, limiter=None,
+                  timeout=DEFAULT_TIMEOUT, metrics=None, direct=True):
+    """
+    Return the color code, or None if no lookup tier found the card.
+
+    direct=False starts the API fallback chain at the set+cn search (see lookup_tiers()).
+
+    Raises RateLimited if throttled and LookupFailed on any other error, so
+    callers can tell a failed lookup from a card Scryfall doesn't have.
+    With a cache, a card no lookup tier found is recorded as unresolved and
+    skipped (check_cache=True) until the cache's negative TTL runs out;
+    failed lookups are not recorded, so those cards are tried again.
+    """
+    if isinstance(bulk_index, ColorTable):
+        return bulk_index.color(set_code, cn, name)
+    if bulk_index is not None:
+        card = bulk_index.lookup(set_code, cn, name)
+        return color_from_card(card) if card else None
+    if cache is not None and check_cache:
+        settled, color = _cached_result(cache, set_code, cn, name)
+        if settled:
+            return color
+    try:
+        card = fetch_card(set_code, cn, name, limiter=limiter, timeout=timeout, metrics=metrics, direct=direct)
+    except RateLimited:
+        raise
+    except Exception as e:
+        raise LookupFailed(str(e)) from e
+    return _store_result(cache, set_code, cn, name, card)
+
+async def resolve_color_async(call, set_code, cn, name, cache=None, check_cache=True, limiter=None,
+                              timeout=DEFAULT_TIMEOUT, metrics=None, direct=True):
+    """resolve_color() for the async engine; HTTP requests are run through `call`"""
+    if cache is not None and check_cache:
+        settled, color = _cached_result(cache, set_code, cn, name)
+        if settled:
+            return color
+    try:
+        card = await fetch_card_async(call, set_code, cn, name, limiter=limiter, timeout=timeout, metrics=metrics,
+                                      direct=direct)
+    except RateLimited:
+        raise
+    except Exception as e:
+        raise LookupFailed(str(e)) from e
+    return _store_result(cache, set_code, cn, name, card)
+
+def _cached_result(cache, set_code, cn, name):
+    """(True, color) if the cache settles this card (color None: recorded as unresolved), else (False, None)"""
+    color = cache.get(set_code, cn, name)
+    if color is not None:
+        return True, color
+    return cache.is_unresolved(set_code, cn, name), None
+
+def _store_result(cache, set_code, cn, name, card):
+    if not card:
+        if cache is not None:
+            cache.put_unresolved(set_code, cn, name)
+        return None
+    color = color_from_card(card)
+    if cache is not None:
+        cache.put(set_code, cn, name, color)
+    return color
+
+def prefetch_colors(lookups, cache=None, progress=None, limiter=None, timeout=DEFAULT_TIMEOUT, metrics=None,
+                    cancel=None):
+    """
+    Resolve rows from the cache, then batch the rest through /cards/collection.
+
+    lookups maps DataFrame index -> (set_code, cn, name). Returns (colors,
+    not found): colors by index for the rows resolved here, and None for
+    rows the cache has recorded as unresolved; the remaining rows are left
+    for the per-row fallback chain in resolve_color(). `not found` holds the
+    indexes /cards/collection reported as not found, which have already had
+    the direct set+collector lookup.
+    """
+    colors = {}
+    pending = {}
+    for idx, (set_code, cn, name) in lookups.items():
+        color = cache.get(set_code, cn, name) if cache is not None else None
+        if color is not None:
+            colors[idx] = color
+        elif cache is not None and cache.is_unresolved(set_code, cn, name):
+            colors[idx] = None
+        else:
+            pending[idx] = (set_code, cn)
+
+    def on_chunk(done, total):
+        if progress is not None:
+            progress(done/total, f"Batch lookup {done} / {total} on Scryfall…")
+
+    cards, not_found, _ = resolve_batch(pending, session=get_session(), timeout=timeout, on_chunk=on_chunk,
+                                        limiter=limiter, metrics=metrics, cancel=cancel)
+    for idx, card in cards.items():
+        color = color_from_card(card)
+        colors[idx] = color
+        if cache is not None:
+            set_code, cn, name = lookups[idx]
+            cache.put(set_code, cn, name, color)
+    return colors, set(not_found)
+
+def lookup_keys(candidates, set_map):
+    """
+    (set_code, cn, name) lookup key of each row, and a mask of the rows that can be looked up.
+
+    Set names are mapped through set_map and collector numbers lose a
+    trailing ".0"; rows without a set code or collector number aren't resolvable.
+    """
+    keys = pd.DataFrame({
+        "set_code": as_str(candidates["Set"]).str.strip().map(set_map),
+        "cn": as_str(candidates["Number"]).str.strip(),
+        "name": as_str(candidates["Product Name"]).str.strip(),
+    }, index=candidates.index)
+    keys["cn"] = keys["cn"].where(~keys["cn"].str.endswith(".0"), keys["cn"].str[:-2])
+    resolvable = keys["set_code"].notna() & keys["set_code"].astype(str).ne("") & keys["cn"].ne("")
+    return keys, resolvable
+
+def resolve_keys(lookups, bulk_index=None, cache=None, batch=True, progress: Optional[ProgressCallback] = None,
+                 workers=DEFAULT_WORKERS, requests_per_second=DEFAULT_RATE, timeout=DEFAULT_TIMEOUT, metrics=None,
+                 engine="thread", cancel=None, errors=None, checkpoint=None, service=None):
+    """
+    Resolve lookup keys to color codes; see fill_colors() for the options.
+
+    lookups maps an id -> (set_code, cn, name). Returns colors by id, None
+    for keys no lookup resolved. Keys that were rate limited, failed
+    (LookupFailed) or cancelled are recorded in `errors` (id -> exception)
+    if given. Keys already in `checkpoint` (a checkpoint.RunCheckpoint) are
+    taken from it, and keys Scryfall resolved or had no match for are
+    recorded in it as they come in; errored keys aren't, so a resumed run
+    looks them up again. The cache's pending writes are committed on the
+    way out.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown lookup engine {engine!r}; expected one of {', '.join(ENGINES)}")
+    if engine == "async" and bulk_index is None and scryfall_client.aiohttp is None:
+        raise ValueError("The async lookup engine needs aiohttp; install it with pip install aiohttp")
+    stage = metrics.stage if metrics is not None else nullcontext
+    if progress is None:
+        progress = _no_progress
+    if errors is None:
+        errors = {}
+    batched = batch and bulk_index is None
+    limiter = service.limiter if service is not None else TokenBucket(requests_per_second)
+    if bulk_index is None:
+        # A pooled connection for each of the `workers` requests in flight
+        get_session(pool_size=workers)
+    colors = {}
+    if checkpoint is not None:
+        colors = {idx: checkpoint.colors[key] for idx, key in lookups.items() if key in checkpoint.colors}
+    # With a service, the keys this run looks up itself and those another run already has in flight
+    owned, shared = {}, {}
+    try:
+        # Keys /cards/collection reported as not found; the direct lookup would only repeat that answer
+        batch_missing = set()
+        if batched:
+            with stage("batch_lookup"):
+                todo = {idx: key for idx, key in lookups.items() if idx not in colors}
+                if service is not None:
+                    # Claimed before batching, so concurrent runs don't send the same cards to /cards/collection
+                    owned, shared = service.claim_many(set(todo.values()))
+                    todo = {idx: key for idx, key in todo.items() if key in owned}
+                batch_colors, not_found = prefetch_colors(todo, cache=cache, progress=progress, limiter=limiter,
+                                                          timeout=timeout, metrics=metrics, cancel=cancel)
+                batch_missing = {lookups[idx] for idx in not_found}
+                colors.update(batch_colors)
+                for idx, color in batch_colors.items():
+                    service_key = lookups[idx]
+                    if service_key in owned:
+                        service.settle(service_key, owned.pop(service_key), color)
+                if checkpoint is not None:
+                    checkpoint.record_many({lookups[idx]: color for idx, color in batch_colors.items()})
+
+        pending = {idx: key for idx, key in lookups.items() if idx not in colors}
+
+        def on_done(idx, color, done, count):
+            set_code, cn, name = lookups[idx]
+            if checkpoint is not None and idx not in errors:
+                checkpoint.record(lookups[idx], color)
+            if isinstance(errors.get(idx), RateLimited):
+                text = f"Rate limited: {name} [{set_code} {cn}]"
+            elif idx in errors:
+                text = f"Lookup failed: {name} [{set_code} {cn}]"
+            elif color is not None:
+                text = f"{name} [{set_code} {cn}] → {color or '∅'}"
+            else:
+                text = f"No match found: {name} [{set_code} {cn}]"
+            progress(done/count, f"Looked up {done} / {count} — {text}")
+
+        if engine == "async":
+            async def lookup(call, set_code, cn, name):
+                key = (set_code, cn, name)
+                resolve = lambda: resolve_color_async(call, set_code, cn, name, cache=cache, check_cache=not batched,
+                                                      limiter=limiter, timeout=timeout, metrics=metrics,
+                                                      direct=key not in batch_missing)
+                if service is None:
+                    return await resolve()
+                if key in owned:
+                    return await service.run_claimed_async(key, owned[key], resolve)
+                if key in shared:
+                    return await service.wait_async(key, shared[key], resolve, metrics=metrics)
+                return await service.resolve_async(key, resolve, metrics=metrics)
+        else:
+            def lookup(set_code, cn, name):
+                key = (set_code, cn, name)
+                resolve = lambda: resolve_color(set_code, cn, name, cache=cache, check_cache=not batched,
+                                                limiter=limiter, timeout=timeout, metrics=metrics,
+                                                direct=key not in batch_missing)
+                if service is None:
+                    return resolve()
+                if key in owned:
+                    return service.run_claimed(key, owned[key], resolve)
+                if key in shared:
+                    return service.wait(key, shared[key], resolve, metrics=metrics)
+                return service.resolve(key, resolve, metrics=metrics)
+
+        def run_lookups(tasks, offset):
+            report = lambda idx, color, done, count: on_done(idx, color, offset + done, len(pending))
+            if cancel is not None and cancel.is_set():
+                errors.update({idx: LookupCancelled() for idx in tasks})
+                return dict.fromkeys(tasks)
+            if engine == "async":
+                return run_async(tasks, lookup, concurrency=workers, on_done=report, errors=errors, cancel=cancel)
+            return run_concurrent(tasks, lookup, workers=workers, on_done=report, errors=errors, cancel=cancel)
+
+        with stage("row_lookups"), checkpoint_flushed(checkpoint):
+            if isinstance(bulk_index, ColorTable):
+                colors.update(bulk_index.colors(pending))
+            elif bulk_index is not None:
+                colors.update({idx: resolve_color(*key, bulk_index=bulk_index) for idx, key in pending.items()})
+            else:
+                waiting = {idx: key for idx, key in pending.items() if key in shared}
+                own = {idx: key for idx, key in pending.items() if idx not in waiting}
+                colors.update(run_lookups(own, 0))
+                # Other runs' keys are only waited on once this run's claimed keys are settled, so two runs
+                # can never be waiting on each other
+                colors.update(run_lookups(waiting, len(own)))
+    finally:
+        if owned:
+            service.release(owned)
+        if cache is not None:
+            # The cache commits writes in batches; commit this run's last ones
+            cache.flush()
+    return colors
+
+@contextmanager
+def checkpoint_flushed(checkpoint):
+    """Save what the checkpoint holds on the way out, even if the run is interrupted"""
+    try:
+        yield
+    finally:
+        if checkpoint is not None:
+            checkpoint.flush()
+
+class ResolvedKeys:
+    """
+    Colors already resolved for a set of (set_code, cn, name) keys, for fill_colors(resolved=...).
+
+    Batch mode resolves the keys of many files at once and hands each file's
+    share to the process enriching it. errors maps a key to the exception
+    its lookup failed with (RateLimited, LookupFailed, LookupCancelled), so
+    those rows are still reported as such.
+    """
+
+    def __init__(self, colors, errors=None):
+        self.colors = colors
+        self.errors = errors or {}
+
+def fill_colors(df, set_map, bulk_index=None, cache=None, batch=True, stats=None,
+                progress: Optional[ProgressCallback] = None, workers=DEFAULT_WORKERS,
+                requests_per_second=DEFAULT_RATE, timeout=DEFAULT_TIMEOUT, max_rows=0, metrics=None,
+                engine="thread", cancel=None, reuse=None, resolved=None, checkpoint=None, service=None,
+                known=None):
+    """
+    Fill the Color column for Magic rows.
+
+    Uses bulk_index (a BulkCardIndex or ColorTable) instead of the API when
+    given; otherwise rows are batched
+    through /cards/collection first (batch=True) and the misses are looked up
+    with `workers` requests in flight sharing a `requests_per_second` token
+    bucket, on a thread pool (engine="thread") or as coroutines
+    (engine="async"). Setting the `cancel` event stops the batch and per-row
+    lookups; keys not looked up by then are counted in stats["cancelled"].
+    Keys whose lookup failed (timeouts, dropped connections, server errors)
+    are counted in stats["lookup_errors"] rather than as skipped.
+    Each unique (set code, collector number, name) is looked up once, and
+    keys the cache recorded as unresolved are skipped. If given, `stats` is
+    updated with lookup counts and, with a cache, the cache hits/misses/
+    evictions and negative hits for this run. If given, `metrics` (a
+    RunMetrics) records the time spent in each stage and the HTTP calls.
+
+    With `reuse` (a run_memory.RunMemory), rows whose row_fingerprints()
+    were resolved in an earlier run take that color without a lookup, and
+    the memory is updated with this run's resolved rows. Reused rows count
+    as filled; stats["reused_rows"] and stats["looked_up_rows"] split them.
+
+    With `resolved` (a ResolvedKeys), colors are taken from it and no
+    lookups are made; keys missing from it count as not found.
+
+    With `known` (a dict of (set_code, cn, name) -> color or None, shared
+    by several calls such as the chunks of one stream), keys in it are
+    taken from it instead of being looked up again, and the keys this call
+    resolves or finds missing are added to it.
+
+    With `checkpoint` (a checkpoint.RunCheckpoint), keys resolved by an
+    earlier, interrupted run of the same upload are taken from it and this
+    run's lookups are saved to it as they finish;
+    stats["resumed_lookups"] counts the keys taken from it. The caller
+    discards the checkpoint once the run is complete.
+
+    With `service` (a lookup_service.LookupService shared by concurrent
+    runs), requests draw from the service's rate limiter instead of a
+    per-run `requests_per_second` budget, and cards another run already
+    has in flight wait for its result. A batched run claims its keys before
+    sending them to /cards/collection, so concurrent runs batch each card
+    once between them.
+    """
+    stage = metrics.stage if metrics is not None else nullcontext
+
+    df = df.copy()
+    if "Color" not in df.columns:
+        df["Color"] = ""
+    elif isinstance(df["Color"].dtype, pd.CategoricalDtype):
+        # E.g. the output of an earlier run; new colors aren't among its categories
+        df["Color"] = df["Color"].astype(object)
+    
+    with stage("foil_columns"):
+        # Add Foil column for all rows (for CSV export)
+        if "Condition" in df.columns:
+            foil = foil_flags(df["Condition"]).to_numpy()
+            df["Foil"] = np.where(foil, "*", "").astype(object)
+            # Also create a Yes/No version for CSV clarity
+            df["Is Foil"] = np.where(foil, "Yes", "No").astype(object)
+            # Add Pokemon holofoil type column
+            if "Product Line" in df.columns:
+                df["Pokemon Holofoil"] = pokemon_holofoil_types(df["Condition"], df["Product Line"])
+            else:
+                df["Pokemon Holofoil"] = ""
+        else:
+            df["Foil"] = ""
+            df["Is Foil"] = "No"
+            df["Pokemon Holofoil"] = ""
+
+    if progress is None:
+        progress = _no_progress
+    progress(0.0, "Working…")
+    # Counted for this run alone; concurrent runs share the cache
+    cache = cache.for_run() if cache is not None else None
+
+    with stage("lookup_keys"):
+        magic_mask = as_str(df["Product Line"]).str.strip().eq("Magic")
+        # Only the key columns are needed for lookups; don't copy the whole frame again
+        candidates = df.loc[magic_mask, ["Set", "Number", "Product Name"]]
+
+    reused = pd.Series([], dtype=object)
+    if reuse is not None:
+        with stage("reuse"):
+            fingerprints = row_fingerprints(df.loc[magic_mask, df.columns.intersection(FINGERPRINT_COLUMNS)], set_map)
+            reused = reuse.lookup(fingerprints).dropna()
+            df.loc[reused.index, "Color"] = reused
+            candidates = candidates.drop(reused.index)
+
+    with stage("lookup_keys"):
+        if max_rows and max_rows > 0:
+            candidates = candidates.head(max_rows)
+        total = len(reused) + len(candidates)
+
+        # One lookup per unique (set_code, cn, name) key; colors are broadcast back to every matching row
+        keys, resolvable = lookup_keys(candidates, set_map)
+        unique_keys = keys[resolvable].drop_duplicates()
+        lookups = dict(zip(unique_keys.index, unique_keys.itertuples(index=False, name=None)))
+
+    errors = {}
+    resumed = sum(key in checkpoint.restored for key in lookups.values()) if checkpoint is not None else 0
+    if resolved is not None:
+        colors = {idx: resolved.colors.get(key) for idx, key in lookups.items()}
+        errors = {idx: resolved.errors[key] for idx, key in lookups.items() if key in resolved.errors}
+    else:
+        pending = lookups if known is None else {idx: key for idx, key in lookups.items() if key not in known}
+        colors = resolve_keys(pending, bulk_index=bulk_index, cache=cache, batch=batch, progress=progress,
+                              workers=workers, requests_per_second=requests_per_second, timeout=timeout,
+                              metrics=metrics, engine=engine, cancel=cancel, errors=errors,
+                              checkpoint=checkpoint, service=service)
+        if known is not None:
+            # Failed keys aren't remembered, so a later call looks them up again
+            known.update({key: colors.get(idx) for idx, key in pending.items() if idx not in errors})
+            colors.update({idx: known[key] for idx, key in lookups.items() if idx not in pending})
+
+    with stage("broadcast"):
+        key_cols = ["set_code", "cn", "name"]
+        color_by_key = pd.Series(colors, index=unique_keys.index, dtype=object)
+        color_by_key.index = pd.MultiIndex.from_frame(unique_keys[key_cols])
+        row_keys = pd.MultiIndex.from_frame(keys.loc[resolvable, key_cols])
+        row_colors = pd.Series(color_by_key.reindex(row_keys).to_numpy(), index=keys.index[resolvable]).dropna()
+        df.loc[row_colors.index, "Color"] = row_colors
+    filled = len(reused) + len(row_colors)
+    if reuse is not None:
+        remembered = pd.concat([reused, row_colors]) if len(reused) else row_colors
+        reuse.remember(fingerprints.loc[remembered.index], remembered)
+
+    def rows_failed_with(error_type):
+        failed_ids = [idx for idx, e in errors.items() if isinstance(e, error_type)]
+        return int(row_keys.isin(color_by_key.index[unique_keys.index.isin(failed_ids)]).sum())
+
+    # Throttled, failed and cancelled keys are reported separately so they aren't mistaken for cards Scryfall doesn't have
+    rate_limited = rows_failed_with(RateLimited)
+    failed = rows_failed_with(LookupFailed)
+    cancelled = rows_failed_with(LookupCancelled)
+    skipped = total - filled - rate_limited - failed - cancelled
+
+    if stats is not None:
+        stats["lookup_rows"] = int(resolvable.sum())
+        stats["unique_lookups"] = len(unique_keys)
+        stats["rate_limited"] = rate_limited
+        stats["lookup_errors"] = failed
+        stats["cancelled"] = cancelled
+        stats["reused_rows"] = len(reused)
+        stats["looked_up_rows"] = len(candidates)
+        if checkpoint is not None:
+            stats["resumed_lookups"] = resumed
+        if cache is not None:
+            stats["cache"] = cache.stats()
+
+    for col in ENRICHED_COLUMNS:
+        df[col] = df[col].astype("category")
+    progress(1.0, "Done.")
+    return df, filled, skipped
+
+CHECKLIST_HEAD = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>TCGplayer Pull List Checklist {date_str}</title>
+<style>
+  @media print {{
+    @page {{ size: A4 portrait; margin: 12mm; }}
+  }}
+  body {{ font-family: -apple-system, BlinkMacSystemFont, Segoe UI, Roboto, Arial, sans-serif; }}
+  h1 {{ font-size: 18pt; margin: 0 0 10px; }}
+  h2 {{ font-size: 14pt; margin: 0 0 8px; }}
+  .meta {{ font-size: 10pt; color: #444; margin-bottom: 12px; }}
+  .set-page {{ page-break-before: always; margin-top: 20px; }}
+  table {{ width: 100%; border-collapse: collapse; }}
+  th, td {{ border: 1px solid #ccc; padding: 6px 8px; font-size: 10.5pt; }}
+  th {{ background: #f5f5f5; text-align: left; }}
+  td.cb {{ width: 22px; text-align: center; font-weight: bold; }}
+  .footer {{ margin-top: 14px; font-size: 9pt; color: #666; }}
+</style>
+</head>
+<body>
+<h1>{heading}</h1>
+<div class="meta">Generated {date_str}</div>
+<div class="meta" style="margin-bottom: 15px;">
+  <strong>Total Cards to Pull: {total_cards}</strong> | <strong>Unique Items: {total_unique_cards}</strong>
+</div>
+"""
+
+CHECKLIST_TABLE_OPEN = """<table>
+  <thead>
+    <tr><th>✓</th><th>Quantity</th><th>Foiled</th><th>Product Name</th><th>Color</th><th>Set</th><th>Number</th><th>Product Line</th></tr>
+  </thead>
+  <tbody>
+"""
+
+CHECKLIST_TABLE_CLOSE = """
+  </tbody>
+</table>
+"""
+
+CHECKLIST_FOOT = """<div class="footer">* = Foil card | (H) = Holofoil, (RH) = Reverse Holofoil (Pokemon) | Tip: Use your browser's Print dialog to save as PDF or print directly.</div>
+</body>
+</html>"""
+
+CHECKLIST_CHUNK_ROWS = 5_000
+
+# Columns of a sorted checklist frame, with the foil sort key last
+SORTED_CHECKLIST_COLUMNS = CHECKLIST_COLUMNS + ["Foil", "Pokemon Holofoil", "_foil_sort"]
+
+def _sorted_checklist(df):
+    """Checklist columns and their _foil_sort key, sorted by Set, Foiled, Product Name, Color"""
+    # Copy only the checklist columns; missing ones (including Foil / Pokemon Holofoil) are blank
+    out = df.reindex(columns=SORTED_CHECKLIST_COLUMNS[:-1], fill_value="")
+
+    # Create a sort key for foil type: non-foil first, then foil, then holofoil types
+    # Non-foil = 0, regular foil = 1, holofoil = 2, reverse holofoil = 3
+    foil_type = as_str(out["Pokemon Holofoil"]).str.strip()
+    has_foil = as_str(out["Foil"]).str.strip().ne("")
+    out["_foil_sort"] = np.select([foil_type.eq("RH"), foil_type.eq("H"), has_foil], [3, 2, 1], 0)
+    return out.sort_values(
+        by=["Set", "_foil_sort", "Product Name", "Color"],
+        ascending=[True, True, True, True],
+        na_position="last"
+    )
+
+def sort_checklist(df):
+    """Checklist columns sorted by Set, Foiled, Product Name, Color"""
+    return _sorted_checklist(df).drop(columns=["_foil_sort"])
+
+def escape_html(series):
+    """Vectorized html.escape(str(x)) for a Series"""
+    s = as_str(series)
+    for char, entity in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#x27;")):
+        s = s.str.replace(char, entity, regex=False)
+    return s
+
+def checklist_rows(out):
+    """One escaped <tr> per row, built from whole columns rather than row by row"""
+    holo = escape_html(out["Pokemon Holofoil"])
+    foiled = escape_html(out["Foil"]) + holo.where(holo.eq(""), " (" + holo + ")")
+    return ("<tr><td class='cb'>☐</td><td>" + escape_html(out["Quantity"])
+            + "</td><td>" + foiled
+            + "</td><td>" + escape_html(out["Product Name"])
+            + "</td><td>" + escape_html(out["Color"])
+            + "</td><td>" + escape_html(out["Set"])
+            + "</td><td>" + escape_html(out["Number"])
+            + "</td><td>" + escape_html(out["Product Line"])
+            + "</td></tr>")
+
+def _total_cards(out):
+    try:
+        # Try to convert Quantity to numeric, handling any .0 floats
+        qty_series = pd.to_numeric(out["Quantity"], errors='coerce').fillna(0)
+        return int(qty_series.sum())
+    except Exception:
+        return 0
+
+def _frame_blocks(out, chunk_rows):
+    for start in range(0, len(out), chunk_rows):
+        yield out.iloc[start:start + chunk_rows]
+
+def _write_table(blocks, stream):
+    stream.write(CHECKLIST_TABLE_OPEN)
+    for n, block in enumerate(blocks):
+        if n:
+            stream.write("\n")
+        stream.write("\n".join(checklist_rows(block)))
+    stream.write(CHECKLIST_TABLE_CLOSE)
+
+def _write_page(stream, heading, total_cards, total_items, blocks=(), sets=None):
+    """
+    Write a checklist page from sorted blocks of rows, with totals counted beforehand.
+
+    Without `sets`, every row goes in one table; otherwise `sets` gives
+    (set name, cards, items, blocks) per set and each set gets a page.
+    """
+    stream.write(CHECKLIST_HEAD.format(
+        date_str=dt.datetime.now().strftime("%Y-%m-%d"),
+        heading=html.escape(heading),
+        total_cards=total_cards,
+        total_unique_cards=total_items,
+    ))
+    if sets is None:
+        _write_table(blocks, stream)
+    else:
+        for n, (set_name, cards, items, set_blocks) in enumerate(sets):
+            title = escape_html(pd.Series([set_name])).iloc[0]
+            stream.write('<div class="set-page">\n' if n else "<div>\n")
+            stream.write(f"<h2>{title}</h2>\n")
+            stream.write(f'<div class="meta">Cards: {cards} | Items: {items}</div>\n')
+            _write_table(set_blocks, stream)
+            stream.write("</div>\n")
+    stream.write(CHECKLIST_FOOT)
+
+def _frame_sets(out, chunk_rows):
+    """(set name, cards, items, blocks) for each set of a sorted checklist frame"""
+    for set_name, group in out.groupby("Set", sort=False, dropna=False, observed=True):
+        yield set_name, _total_cards(group), len(group), _frame_blocks(group, chunk_rows)
+
+def write_checklist(df, stream, chunk_rows=CHECKLIST_CHUNK_ROWS, page_per_set=False, heading="TCGplayer Pull List Checklist"):
+    """
+    Write the printable checklist HTML to a text stream.
+
+    Rows are rendered and written `chunk_rows` at a time, so the full page is
+    never held in memory as one string. With page_per_set=True every set gets
+    its own table starting on a new printed page. `heading` is plain text; it
+    is escaped like the cells. See ChecklistSpill for the same page built
+    from a stream of chunks.
+    """
+    out = sort_checklist(df)
+    if page_per_set:
+        _write_page(stream, heading, _total_cards(out), len(out), sets=_frame_sets(out, chunk_rows))
+    else:
+        _write_page(stream, heading, _total_cards(out), len(out), blocks=_frame_blocks(out, chunk_rows))
+
+def make_printable_checklist(df, **kwargs):
+    """Checklist HTML as a string; see write_checklist() for options"""
+    buf = io.StringIO()
+    write_checklist(df, buf, **kwargs)
+    return buf.getvalue()
+
+def checklist_bytes(df, **kwargs):
+    """Checklist HTML encoded as UTF-8, written straight into a bytes buffer"""
+    buf = io.BytesIO()
+    with io.TextIOWrapper(buf, encoding="utf-8", newline="") as text:
+        write_checklist(df, text, **kwargs)
+        text.flush()
+        return buf.getvalue()
+
+def write_export(df, dest, export_format="csv"):
+    """
+    Write the enriched pull list to `dest`, a path or a binary file, in one of EXPORT_FORMATS.
+
+    CSV (UTF-8, optionally gzip-compressed) is encoded as it is written,
+    never held as one str. Parquet keeps the dtypes, e.g. the categorical
+    Color and Foil columns, and needs pyarrow. Gzip output has no
+    timestamp, so the same frame always gives the same bytes.
+    """
+    if export_format == "csv":
+        df.to_csv(dest, index=False, encoding="utf-8")
+    elif export_format == "csv.gz":
+        df.to_csv(dest, index=False, encoding="utf-8", compression={"method": "gzip", "mtime": 0})
+    elif export_format == "parquet":
+        df.to_parquet(dest, index=False)
+    else:
+        raise ValueError(f"Unknown export format {export_format!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+
+def export_bytes(df, export_format="csv"):
+    """write_export() into a bytes buffer"""
+    buf = io.BytesIO()
+    write_export(df, buf, export_format)
+    return buf.getvalue()
+
+def _write_set_files(sets, output_dir, prefix, page_per_set=False):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    used = set()
+    for set_name, cards, items, blocks in sets:
+        base = slug = re.sub(r"[^A-Za-z0-9]+", "_", str(set_name)).strip("_") or "unknown"
+        # Compared case-insensitively, as file names are on Windows and macOS
+        for n in itertools.count(2):
+            if slug.lower() not in used:
+                break
+            slug = f"{base}_{n}"
+        used.add(slug.lower())
+        path = os.path.join(output_dir, f"{prefix}_{slug}.html")
+        heading = f"TCGplayer Pull List Checklist — {set_name}"
+        with open(path, "w", encoding="utf-8") as f:
+            if page_per_set:
+                _write_page(f, heading, cards, items, sets=[(set_name, cards, items, blocks)])
+            else:
+                _write_page(f, heading, cards, items, blocks=blocks)
+        paths.append(path)
+    return paths
+
+def write_checklists_by_set(df, output_dir, prefix="checklist", chunk_rows=CHECKLIST_CHUNK_ROWS, page_per_set=False):
+    """
+    Write one checklist file per set into output_dir; returns the paths written.
+
+    Files are named after the set with punctuation folded to "_"; set
+    names that fold to the same name (e.g. "Foo: Bar" and "Foo - Bar") get
+    a numeric suffix rather than overwriting each other.
+    """
+    out = sort_checklist(df)
+    sets = ((set_name, _total_cards(group), len(group), _frame_blocks(group, chunk_rows))
+            for set_name, group in out.groupby("Set", sort=True, dropna=False, observed=True))
+    return _write_set_files(sets, output_dir, prefix, page_per_set=page_per_set)
+
+SPILL_BLOCK_ROWS = 1_000
+
+def _na_last(value):
+    # Sort key of one cell: values in order, then missing ones, as sort_values(na_position="last") orders them
+    return (1, "") if value is None or value != value else (0, value)
+
+_SET, _FOIL_SORT, _NAME, _COLOR = (SORTED_CHECKLIST_COLUMNS.index(col)
+                                   for col in ("Set", "_foil_sort", "Product Name", "Color"))
+
+def _checklist_row_key(row):
+    return _na_last(row[_SET]), row[_FOIL_SORT], _na_last(row[_NAME]), _na_last(row[_COLOR])
+
+class ChecklistSpill:
+    """
+    The checklist rows of a streamed run, kept on disk rather than in memory.
+
+    add() sorts each chunk's checklist rows and writes them to a temporary
+    file as one sorted run; write() and write_by_set() merge the runs into
+    the same pages write_checklist() and write_checklists_by_set() make
+    from the whole frame. Only `block_rows` rows of each run are read back
+    at a time, and the page and per-set totals are counted as chunks are
+    added. Use it as a context manager, or call close(), to delete the
+    temporary files.
+    """
+
+    def __init__(self, block_rows=SPILL_BLOCK_ROWS, dir=None):
+        self.block_rows = block_rows
+        self._dir = tempfile.TemporaryDirectory(prefix="checklist-", dir=dir)
+        self._runs = []
+        self._cards = 0.0
+        self.items = 0
+        # _na_last(set name) -> [cards, items]
+        self._sets = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._dir.cleanup()
+
+    def add(self, df):
+        out = _sorted_checklist(df)
+        if out.empty:
+            return
+        path = os.path.join(self._dir.name, f"run{len(self._runs)}.pickle")
+        with open(path, "wb") as f:
+            for block in _frame_blocks(out, self.block_rows):
+                pickle.dump(list(block.itertuples(index=False, name=None)), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._runs.append(path)
+        quantity = pd.to_numeric(out["Quantity"], errors="coerce").fillna(0)
+        self._cards += quantity.sum()
+        self.items += len(out)
+        by_set = quantity.groupby(out["Set"], sort=False, dropna=False, observed=True)
+        cards_by_set = by_set.sum()
+        for set_name, cards, items in zip(cards_by_set.index, cards_by_set, by_set.size()):
+            totals = self._sets.setdefault(_na_last(set_name), [0.0, 0])
+            totals[0] += cards
+            totals[1] += items
+
+    @property
+    def total_cards(self):
+        return int(self._cards)
+
+    @staticmethod
+    def _read_run(path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield from pickle.load(f)
+                except EOFError:
+                    return
+
+    def _rows(self):
+        # Runs are in file order and heapq.merge() takes ties from earlier runs first, so the merge is stable like
+        # sort_values() over the whole file
+        return heapq.merge(*map(self._read_run, self._runs), key=_checklist_row_key)
+
+    def _blocks(self, rows, chunk_rows):
+        while True:
+            block = list(itertools.islice(rows, chunk_rows))
+            if not block:
+                return
+            yield pd.DataFrame.from_records(block, columns=SORTED_CHECKLIST_COLUMNS)
+
+    def _set_groups(self, chunk_rows):
+        for key, rows in itertools.groupby(self._rows(), key=lambda row: _na_last(row[_SET])):
+            cards, items = self._sets[key]
+            yield (key[1] if key[0] == 0 else np.nan), int(cards), items, self._blocks(rows, chunk_rows)
+
+    def write(self, stream, chunk_rows=CHECKLIST_CHUNK_ROWS, page_per_set=False,
+              heading="TCGplayer Pull List Checklist"):
+        """write_checklist() for the rows added so far"""
+        if page_per_set:
+            _write_page(stream, heading, self.total_cards, self.items, sets=self._set_groups(chunk_rows))
+        else:
+            _write_page(stream, heading, self.total_cards, self.items, blocks=self._blocks(self._rows(), chunk_rows))
+
+    def write_by_set(self, output_dir, prefix="checklist", chunk_rows=CHECKLIST_CHUNK_ROWS, page_per_set=False):
+        """write_checklists_by_set() for the rows added so far"""
+        return _write_set_files(self._set_groups(chunk_rows), output_dir, prefix, page_per_set=page_per_set)
+
+def _merge_stats(total, stats):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            _merge_stats(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+
+def enrich_csv_stream(source, dest, set_map, chunksize=DEFAULT_CHUNKSIZE, stats=None,
+                      progress: Optional[ProgressCallback] = None, checklist: Optional["ChecklistSpill"] = None,
+                      **fill_kwargs):
+    """
+    Enrich a CSV export chunk by chunk, appending each chunk to `dest`.
+
+    Only `chunksize` rows of the export are enriched and held at a time.
+    The trailing row of the export is dropped as in read_pull_list(): the
+    last row of every chunk is held back and prepended to the next one, so
+    only the final row of the whole file is discarded. If `checklist` (a
+    ChecklistSpill) is given, every enriched chunk's checklist rows are
+    added to it, so the checklist can be written without reading the
+    export back or holding its rows in memory. A card repeated in several
+    chunks is looked up once (see fill_colors(known=...)); only the colors
+    of the unique cards are kept between chunks. Remaining keyword
+    arguments are passed to fill_colors(). Returns (rows, filled, skipped).
+    """
+    metrics = fill_kwargs.get("metrics")
+    stage = metrics.stage if metrics is not None else nullcontext
+    if isinstance(dest, (str, os.PathLike)):
+        if os.fspath(dest).endswith(".gz"):
+            # A .gz path gets a gzip-compressed CSV, compressed as the chunks are written; like write_export(), with
+            # no timestamp in the header, so the same input always gives the same bytes
+            opened = io.TextIOWrapper(gzip.GzipFile(dest, "wb", mtime=0), newline="", encoding="utf-8")
+        else:
+            opened = open(dest, "w", newline="", encoding="utf-8")
+        with opened as f:
+            return enrich_csv_stream(source, f, set_map, chunksize=chunksize, stats=stats,
+                                     progress=progress, checklist=checklist, **fill_kwargs)
+    if progress is None:
+        progress = _no_progress
+    rows = filled = skipped = 0
+    carry = None
+    # Colors by lookup key across chunks, so a card repeated in several chunks is only looked up once
+    known = {}
+    header = True
+    # The same dtypes as read_pull_list(), so every chunk reads a column alike and writes it as the in-memory path does
+    reader = pd.read_csv(source, chunksize=chunksize, dtype=_pull_list_dtypes())
+    for n in itertools.count(1):
+        with stage("parse_csv"):
+            chunk = next(reader, None)
+        if chunk is None:
+            break
+        if carry is not None:
+            chunk = pd.concat([carry, chunk])
+        carry = chunk.iloc[-1:]
+        chunk = chunk.iloc[:-1]
+        if chunk.empty:
+            continue
+        if header:
+            missing = missing_columns(chunk)
+            if missing:
+                raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+        chunk_stats = {}
+        chunk, chunk_filled, chunk_skipped = fill_colors(
+            chunk, set_map, stats=chunk_stats,
+            progress=lambda fraction, text: progress(fraction, f"Chunk {n}: {text}"), known=known,
+            **fill_kwargs,
+        )
+        with stage("write_csv"):
+            chunk.to_csv(dest, index=False, header=header)
+        if checklist is not None:
+            with stage("checklist"):
+                checklist.add(chunk)
+        header = False
+        rows += len(chunk)
+        filled += chunk_filled
+        skipped += chunk_skipped
+        if stats is not None:
+            _merge_stats(stats, chunk_stats)
+    return rows, filled, skipped
+
+def build_report(rows, filled, skipped, stats=None, metrics=None):
+    """Run report offered for download alongside the enriched CSV; metrics (a RunMetrics) adds diagnostics"""
+    report = {
+        "filled": int(filled),
+        "skipped_or_unknown": int(skipped),
+        "rows": int(rows),
+    }
+    report.update(stats or {})
+    if metrics is not None:
+        report["diagnostics"] = metrics.to_dict()
+    return report
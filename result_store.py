@@ -0,0 +1,129 @@
+"""
+Memory-bounded storage for the results sessions keep between reruns.
+
+Streamlit keeps a session's state for as long as its browser tab is open,
+and every session used to hold its whole enriched DataFrame (and, for a
+batch, every file's CSV and checklist bytes) in it. A ResultStore, one per
+server process, holds results compacted instead: DataFrames as
+zstd-compressed Parquet, other payloads zlib-compressed. All entries share
+one memory budget, and the least recently used ones are evicted beyond it.
+Sessions only keep the keys of their entries. A frame's first rows and
+row count are kept alongside it for display, so the whole frame is only
+rebuilt when it's needed, e.g. for a download; a key whose entry was
+evicted gives None.
+"""
+
+import io
+import os
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_BUDGET_BYTES = 256 * 2**20
+PREVIEW_ROWS = 20
+
+
+def compact_frame(df: pd.DataFrame) -> bytes:
+    """df as zstd-compressed Parquet; dtypes and index survive the round trip"""
+    buf = io.BytesIO()
+    df.to_parquet(buf, engine="pyarrow", compression="zstd", index=True)
+    return buf.getvalue()
+
+
+def rebuild_frame(payload: bytes) -> pd.DataFrame:
+    return pd.read_parquet(io.BytesIO(payload), engine="pyarrow")
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, or None where /proc isn't available"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ResultStore:
+    """Compacted results by key, evicting the least recently used beyond budget_bytes; thread-safe"""
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        # key -> (kind, payload, size in bytes, metadata)
+        self._entries: "OrderedDict[str, Tuple[str, bytes, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.used_bytes = 0
+        self.evictions = 0
+
+    def _put(self, kind: str, payloads: List[bytes], meta: Any = None, meta_bytes: int = 0) -> List[str]:
+        keys = [uuid.uuid4().hex for _ in payloads]
+        with self._lock:
+            for key, payload in zip(keys, payloads):
+                size = len(payload) + meta_bytes
+                self._entries[key] = (kind, payload, size, meta)
+                self.used_bytes += size
+            # New entries stay even if they alone are over budget; the session that made them is using them
+            while self.used_bytes > self.budget_bytes and len(self._entries) > len(keys):
+                _, (_, _, size, _) = self._entries.popitem(last=False)
+                self.used_bytes -= size
+                self.evictions += 1
+        return keys
+
+    def _get(self, key: Optional[str], kind: str) -> Optional[Tuple[str, bytes, int, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != kind:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put_frame(self, df: pd.DataFrame, preview_rows: int = PREVIEW_ROWS) -> str:
+        preview = df.head(preview_rows).copy()
+        return self._put("frame", [compact_frame(df)], meta=(preview, len(df)),
+                         meta_bytes=int(preview.memory_usage(deep=True).sum()))[0]
+
+    def frame(self, key: Optional[str]) -> Optional[pd.DataFrame]:
+        """The DataFrame stored under key, rebuilt; None if it was evicted"""
+        entry = self._get(key, "frame")
+        return rebuild_frame(entry[1]) if entry is not None else None
+
+    def preview(self, key: Optional[str]) -> Optional[Tuple[pd.DataFrame, int]]:
+        """The first rows of the DataFrame stored under key and its row count, without rebuilding it; None if it was evicted"""
+        entry = self._get(key, "frame")
+        return entry[3] if entry is not None else None
+
+    def put_bytes(self, data: bytes) -> str:
+        return self.put_bytes_many([data])[0]
+
+    def put_bytes_many(self, items: List[bytes]) -> List[str]:
+        """Store several payloads of one result together, so none of them evicts another"""
+        return self._put("bytes", [zlib.compress(data, 1) for data in items])
+
+    def data(self, key: Optional[str]) -> Optional[bytes]:
+        """The bytes stored under key; None if they were evicted"""
+        entry = self._get(key, "bytes")
+        return zlib.decompress(entry[1]) if entry is not None else None
+
+    def __contains__(self, key: Any) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def discard(self, keys: Iterable[Optional[str]]):
+        """Drop entries a session no longer needs, e.g. its previous run's results"""
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self.used_bytes -= entry[2]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "used_bytes": self.used_bytes,
+                "budget_bytes": self.budget_bytes,
+                "evictions": self.evictions,
+            }
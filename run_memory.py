@@ -0,0 +1,102 @@
+"""
+Colors from earlier runs, keyed by a fingerprint of each pull list row.
+
+Shops upload overlapping pull lists many times a day. Rows whose (set
+code, Number, Product Name, Condition) fingerprint was resolved in an
+earlier run reuse that color instead of going through the lookups again (see
+pipeline.row_fingerprints and fill_colors(reuse=...)). The app keeps a
+RunMemory in session state so it survives reruns, and it can be saved to
+a JSON file to survive restarts. Sessions share that file: a save merges
+the entries remembered since the last save into what is on disk, so one
+session's save never drops another's.
+"""
+
+import json
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from atomic_file import atomic_write
+
+DEFAULT_MAX_ENTRIES = 500_000
+FORMAT_VERSION = 1
+
+# Saves from every session of the process read, merge and replace the file one at a time
+_save_lock = threading.Lock()
+
+
+def _empty() -> pd.Series:
+    return pd.Series([], index=pd.Index([], dtype=np.uint64), dtype=object)
+
+
+def _newest_first(new: pd.Series, old: pd.Series, max_entries: Optional[int]) -> pd.Series:
+    """new ahead of old, keeping new's color for a fingerprint in both, bounded to max_entries"""
+    combined = pd.concat([new, old])
+    combined = combined[~combined.index.duplicated(keep="first")]
+    return combined.iloc[:max_entries] if max_entries else combined
+
+
+class RunMemory:
+    """Fingerprint -> color, newest first, bounded to max_entries"""
+
+    def __init__(self, max_entries: Optional[int] = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.colors = _empty()
+        # Entries remembered since the last save(), the only ones it writes
+        self._unsaved = _empty()
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    def lookup(self, fingerprints: pd.Series) -> pd.Series:
+        """Remembered colors aligned with `fingerprints`; NaN where a row is new"""
+        return pd.Series(self.colors.reindex(fingerprints.to_numpy()).to_numpy(), index=fingerprints.index)
+
+    def remember(self, fingerprints: pd.Series, colors: pd.Series):
+        """Add resolved rows; newer colors replace older ones and the oldest entries drop out first"""
+        new = pd.Series(colors.to_numpy(), index=pd.Index(fingerprints.to_numpy(), dtype=np.uint64), dtype=object)
+        self.colors = _newest_first(new, self.colors, self.max_entries)
+        self._unsaved = _newest_first(new, self._unsaved, self.max_entries)
+
+    def clear(self):
+        """Forget everything this memory holds; a file it was loaded from or saved to keeps its entries"""
+        self.colors = self.colors.iloc[:0]
+        self._unsaved = self._unsaved.iloc[:0]
+
+    def save(self, path: str):
+        """
+        Merge the entries remembered since the last save into the file at path.
+
+        The file is read, merged and replaced under a process-wide lock, so
+        entries other sessions saved in the meantime are kept; for a
+        fingerprint in both, this memory's newer color wins. Raises
+        ValueError if the file holds an unsupported format.
+        """
+        with _save_lock:
+            on_disk = RunMemory.load(path, self.max_entries)
+            merged = _newest_first(self._unsaved, on_disk.colors, self.max_entries)
+            data = {"version": FORMAT_VERSION, "colors": dict(zip(map(str, merged.index), merged))}
+            with atomic_write(path, encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            self._unsaved = self._unsaved.iloc[:0]
+
+    @classmethod
+    def load(cls, path: str, max_entries: Optional[int] = DEFAULT_MAX_ENTRIES) -> "RunMemory":
+        """Load a saved memory; a missing file gives an empty one"""
+        memory = cls(max_entries)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return memory
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported run memory format {data.get('version')!r} in {path}")
+        colors = data.get("colors") or {}
+        memory.colors = pd.Series(list(colors.values()),
+                                  index=pd.Index(np.fromiter(map(int, colors), dtype=np.uint64, count=len(colors))),
+                                  dtype=object)
+        if max_entries:
+            memory.colors = memory.colors.iloc[:max_entries]
+        return memory
@@ -0,0 +1,92 @@
+"""
+Batched card lookups through Scryfall's /cards/collection endpoint.
+
+One POST resolves up to 75 {set, collector_number} identifiers, so a large
+pull list needs a few dozen requests instead of one per row. Identifiers
+Scryfall reports as not_found are returned to the caller for the rest of
+the per-row fallback chain (set + cn search, then set + exact name); rows
+of a chunk whose request failed get the whole chain.
+"""
+
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+
+from scryfall_client import SCRYFALL_API, request
+
+MAX_IDENTIFIERS = 75
+
+CardKey = Tuple[str, str]
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def card_key(set_code: str, cn: str) -> CardKey:
+    return (str(set_code).lower(), str(cn))
+
+
+def fetch_collection(keys: Sequence[CardKey], session=None, base_url: str = SCRYFALL_API,
+                     timeout: float = 20, limiter=None, metrics=None) -> Optional[Dict[CardKey, Dict[str, Any]]]:
+    """POST one chunk of (set, cn) keys; returns found cards by key, or None if the request failed"""
+    identifiers = [{"set": s, "collector_number": cn} for s, cn in keys]
+    r = request("POST", f"{base_url}/cards/collection", session=session, limiter=limiter,
+                metrics=metrics, tier="collection", json={"identifiers": identifiers}, timeout=timeout)
+    if r.status_code != 200:
+        return None
+    found = {}
+    for card in r.json().get("data") or []:
+        found[card_key(card.get("set", ""), card.get("collector_number", ""))] = card
+    return found
+
+
+def resolve_batch(lookups: Dict[Hashable, CardKey], session=None, base_url: str = SCRYFALL_API,
+                  timeout: float = 20, on_chunk=None, limiter=None, metrics=None,
+                  cancel=None) -> Tuple[Dict[Hashable, Dict[str, Any]], List[Hashable], List[Hashable]]:
+    """
+    Resolve many rows at once.
+
+    lookups maps a row id (e.g. a DataFrame index) to its (set code, collector
+    number). Returns (cards by row id, row ids Scryfall listed as not found,
+    row ids whose chunk failed, e.g. throttled or a network error). Rows
+    sharing a key use a single identifier slot. on_chunk(done, total) is
+    called after each request; limiter (a TokenBucket) is acquired before
+    each request, and metrics (a RunMetrics) records the "collection" tier.
+    Once `cancel` (a threading.Event) is set no further chunks are sent;
+    their rows are in none of the results.
+    """
+    rows_by_key: Dict[CardKey, List[Hashable]] = {}
+    for row_id, (set_code, cn) in lookups.items():
+        rows_by_key.setdefault(card_key(set_code, cn), []).append(row_id)
+
+    keys = list(rows_by_key)
+    chunks = list(chunked(keys, MAX_IDENTIFIERS))
+    found: Dict[Hashable, Dict[str, Any]] = {}
+    not_found: List[Hashable] = []
+    failed: List[Hashable] = []
+    for n, chunk in enumerate(chunks, start=1):
+        if cancel is not None and cancel.is_set():
+            break
+        try:
+            cards = fetch_collection(chunk, session=session, base_url=base_url, timeout=timeout, limiter=limiter,
+                                     metrics=metrics)
+        except requests.RequestException:
+            cards = None
+        if metrics is not None:
+            hits = sum(1 for key in chunk if cards and key in cards)
+            metrics.record_outcome("collection", True, hits)
+            metrics.record_outcome("collection", False, len(chunk) - hits)
+        for key in chunk:
+            card = cards.get(key) if cards else None
+            for row_id in rows_by_key[key]:
+                if card is not None:
+                    found[row_id] = card
+                elif cards is None:
+                    failed.append(row_id)
+                else:
+                    not_found.append(row_id)
+        if on_chunk:
+            on_chunk(n, len(chunks))
+    return found, not_found, failed
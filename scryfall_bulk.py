@@ -0,0 +1,118 @@
+"""
+Offline card lookups backed by a local Scryfall bulk-data dump.
+
+The full default-cards dump is several hundred MB of JSON, but coloring a
+pull list only needs the handful of fields read by `color_from_card`. The
+index keeps those fields per card (shared between cards with the same
+color profile) keyed by (set code, collector number), with a second
+index keyed by (set code, normalized name) for the name fallback.
+
+Build the compact index with `build_bulk_index.py`, then load it with
+`BulkCardIndex.load()`.
+"""
+
+import gzip
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+INDEX_VERSION = 1
+
+# Fields read by color_from_card(); everything else in the dump is dropped
+CARD_FIELDS = ("color_identity", "type_line", "colors", "color_indicator")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a card name for the (set, name) index"""
+    return " ".join(str(name).split()).casefold()
+
+
+def compact_card(card: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the fields needed to derive the color code"""
+    return {k: card[k] for k in CARD_FIELDS if card.get(k) is not None}
+
+
+def _open_json(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+class BulkCardIndex:
+    """In-memory (set, collector number) and (set, name) card index"""
+
+    def __init__(self):
+        self.by_number: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.by_name: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.by_number)
+
+    def _intern(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        # Thousands of cards share the same color profile; store each once
+        key = json.dumps(fields, sort_keys=True)
+        return self._profiles.setdefault(key, fields)
+
+    def add(self, set_code: str, cn: str, name: str, fields: Dict[str, Any]):
+        """Add one card; the first card seen for a (set, name) pair wins"""
+        profile = self._intern(fields)
+        set_code = str(set_code).lower()
+        if cn:
+            self.by_number.setdefault((set_code, str(cn)), profile)
+        if name:
+            self.by_name.setdefault((set_code, normalize_name(name)), profile)
+
+    def add_card(self, card: Dict[str, Any]):
+        """Add a card object straight from the Scryfall bulk dump"""
+        self.add(card.get("set", ""), card.get("collector_number", ""),
+                 card.get("name", ""), compact_card(card))
+
+    def lookup(self, set_code: str, cn: str, name: str) -> Optional[Dict[str, Any]]:
+        """Same order as fetch_card(): set + collector number, then set + exact name"""
+        set_code = str(set_code).lower()
+        card = self.by_number.get((set_code, str(cn)))
+        if card is None and name:
+            card = self.by_name.get((set_code, normalize_name(name)))
+        return card
+
+    @classmethod
+    def from_cards(cls, cards: Iterable[Dict[str, Any]]) -> "BulkCardIndex":
+        index = cls()
+        for card in cards:
+            index.add_card(card)
+        return index
+
+    @classmethod
+    def from_bulk_file(cls, path: str) -> "BulkCardIndex":
+        """Build an index from a Scryfall default-cards dump (.json or .json.gz)"""
+        with _open_json(path) as f:
+            cards = json.load(f)
+        if not isinstance(cards, list):
+            raise ValueError(f"{path} is not a Scryfall bulk card list")
+        return cls.from_cards(cards)
+
+    def to_dict(self) -> Dict[str, Any]:
+        profiles: List[Dict[str, Any]] = list(self._profiles.values())
+        profile_ids = {id(p): i for i, p in enumerate(profiles)}
+        numbers = [[s, cn, profile_ids[id(p)]] for (s, cn), p in self.by_number.items()]
+        names = [[s, n, profile_ids[id(p)]] for (s, n), p in self.by_name.items()]
+        return {"version": INDEX_VERSION, "profiles": profiles, "numbers": numbers, "names": names}
+
+    def save(self, path: str):
+        """Write the compact index as JSON (gzip-compressed if path ends in .gz)"""
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wt", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "BulkCardIndex":
+        """Load an index written by save()"""
+        with _open_json(path) as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported bulk index version in {path}: {data.get('version')}")
+        index = cls()
+        profiles = [index._intern(p) for p in data["profiles"]]
+        index.by_number = {(s, cn): profiles[pid] for s, cn, pid in data["numbers"]}
+        index.by_name = {(s, n): profiles[pid] for s, n, pid in data["names"]}
+        return index
@@ -0,0 +1,216 @@
+"""
+Shared HTTP session for Scryfall requests.
+
+All lookups go through one pooled `requests.Session`, so connections (and
+TLS sessions) are reused across rows and worker threads; its pool grows
+to the number of workers using it. 429 and 5xx responses are retried with
+exponential backoff that honours Retry-After. If a request is still
+throttled (429/503) after the last retry, `RateLimited` is raised so
+callers can tell it apart from a genuine "not found"; other server errors
+are returned for the caller to raise.
+
+The asyncio engine sends the same requests through an `aiohttp`
+ClientSession with async_request(), which retries the same way without
+blocking the event loop; aiohttp is only needed for that engine.
+"""
+
+import asyncio
+import email.utils
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Overridable so benchmarks and tests can point the app at a local stand-in
+SCRYFALL_API = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com").rstrip("/")
+USER_AGENT = "TCGplayerPullListOrganizer/1.0"
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLED_STATUSES = (429, 503)
+DEFAULT_POOL_SIZE = 16
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+
+
+class RateLimited(requests.RequestException):
+    """Scryfall kept answering 429/503 after all retries"""
+
+
+_session: Optional[requests.Session] = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+
+def _mount_pool(session: requests.Session, pool_size: int):
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def make_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Create a Session keeping up to `pool_size` connections per host, one per worker thread"""
+    session = requests.Session()
+    _mount_pool(session, pool_size)
+    session.headers.update({"User-Agent": USER_AGENT, "Accept": "application/json"})
+    return session
+
+
+def get_session(pool_size: Optional[int] = None) -> requests.Session:
+    """
+    Process-wide shared session, created on first use.
+
+    Callers running `pool_size` requests at once pass it so the pool keeps
+    a connection for each; the pool only ever grows.
+    """
+    global _session, _session_pool_size
+    pool_size = max(pool_size or 0, DEFAULT_POOL_SIZE)
+    with _session_lock:
+        if _session is None:
+            _session = make_session(pool_size)
+            _session_pool_size = pool_size
+        elif pool_size > _session_pool_size:
+            _mount_pool(_session, pool_size)
+            _session_pool_size = pool_size
+        return _session
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def make_async_client(pool_size: int = DEFAULT_POOL_SIZE) -> "aiohttp.ClientSession":
+    """An aiohttp ClientSession keeping up to `pool_size` connections, for one async run"""
+    if aiohttp is None:
+        raise RuntimeError("The async lookup engine needs aiohttp; install it with pip install aiohttp")
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=pool_size),
+        headers={"User-Agent": USER_AGENT, "Accept": "application/json"},
+    )
+
+
+class FetchedResponse:
+    """An aiohttp response with its body read, offering the parts of requests.Response the lookups use"""
+
+    def __init__(self, url: str, status_code: int, headers, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+def _retry_delay(response, attempt: int, backoff: float) -> float:
+    delay = retry_after_seconds(response)
+    if delay is None:
+        delay = backoff * (2 ** attempt)
+    return min(delay, MAX_BACKOFF)
+
+
+def request(method: str, url: str, session: Optional[requests.Session] = None, limiter=None,
+            max_retries: int = DEFAULT_MAX_RETRIES, backoff: float = DEFAULT_BACKOFF,
+            metrics=None, tier: str = "http", **kwargs) -> requests.Response:
+    """
+    Send a request, retrying 429 and 5xx responses.
+
+    limiter (a TokenBucket) is acquired before every attempt, including
+    retries. Raises RateLimited if the last attempt is still throttled
+    (429/503); any other status, including a 5xx that outlasted the
+    retries, is returned.
+    If given, metrics (a RunMetrics) records every attempt's latency and
+    status, the retries and the time spent waiting on the limiter under
+    the lookup tier name `tier`.
+    """
+    http = session or get_session()
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            waited = limiter.acquire()
+            if metrics is not None:
+                metrics.record_wait(waited)
+        start = time.perf_counter()
+        try:
+            r = http.request(method, url, **kwargs)
+        except requests.RequestException:
+            if metrics is not None:
+                metrics.record_http(tier, time.perf_counter() - start, "error")
+            raise
+        if metrics is not None:
+            metrics.record_http(tier, time.perf_counter() - start, r.status_code)
+        if r.status_code not in RETRY_STATUSES:
+            return r
+        if attempt == max_retries:
+            break
+        if metrics is not None:
+            metrics.record_retry(tier)
+        time.sleep(_retry_delay(r, attempt, backoff))
+    if r.status_code not in THROTTLED_STATUSES:
+        return r
+    raise RateLimited(f"Scryfall returned {r.status_code} for {url} after {max_retries} retries", response=r)
+
+
+async def async_request(method: str, url: str, client: "aiohttp.ClientSession", limiter=None,
+                        max_retries: int = DEFAULT_MAX_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                        metrics=None, tier: str = "http", timeout: Optional[float] = None,
+                        **kwargs) -> FetchedResponse:
+    """
+    request() for an aiohttp ClientSession (see make_async_client()).
+
+    Waits on the limiter and between retries without blocking the event
+    loop; retries, RateLimited and metrics are as in request(). Transport
+    errors are aiohttp.ClientError or asyncio.TimeoutError rather than
+    requests.RequestException.
+    """
+    if timeout is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            waited = await limiter.acquire_async()
+            if metrics is not None:
+                metrics.record_wait(waited)
+        start = time.perf_counter()
+        try:
+            async with client.request(method, url, **kwargs) as response:
+                r = FetchedResponse(url, response.status, response.headers, await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if metrics is not None:
+                metrics.record_http(tier, time.perf_counter() - start, "error")
+            raise
+        if metrics is not None:
+            metrics.record_http(tier, time.perf_counter() - start, r.status_code)
+        if r.status_code not in RETRY_STATUSES:
+            return r
+        if attempt == max_retries:
+            break
+        if metrics is not None:
+            metrics.record_retry(tier)
+        await asyncio.sleep(_retry_delay(r, attempt, backoff))
+    if r.status_code not in THROTTLED_STATUSES:
+        return r
+    raise RateLimited(f"Scryfall returned {r.status_code} for {url} after {max_retries} retries", response=r)
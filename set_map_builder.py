@@ -0,0 +1,178 @@
+"""
+Shared set-map building for update_set_codes.py and merge_set_sources.py.
+
+Both scripts turn Scryfall's /sets list into the set name -> Scryfall code
+mapping in set_code_map.json. The /sets response is cached on disk along
+with its ETag and Last-Modified headers, so a rebuild sends a conditional
+request and reuses the cached list when Scryfall answers 304 Not Modified.
+Duplicate set names are resolved in a single pass over the list, and the
+TCGplayer mapping files can be folded in for names Scryfall doesn't use.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from atomic_file import atomic_write
+from scryfall_client import SCRYFALL_API, request
+
+SETS_URL = f"{SCRYFALL_API}/sets"
+DEFAULT_SETS_CACHE = "scryfall_sets_cache.json"
+# Folded in after Scryfall, in this order; for a given name the earlier source wins
+DEFAULT_TCGPLAYER_FILES = ("tcgplayer_code_to_scryfall_code.json", "tcgplayer_to_scryfall.json")
+
+SetList = List[Dict[str, Any]]
+
+
+def _set_list(data: Any) -> Optional[SetList]:
+    """The sets in a /sets response, a sets cache file or a bare list; None if it is neither"""
+    if isinstance(data, dict):
+        data = data.get("data")
+    return data if isinstance(data, list) else None
+
+
+def load_sets_cache(path: str) -> Optional[Dict[str, Any]]:
+    """Read a cache written by fetch_sets(); None if it is missing or unreadable"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return cached if isinstance(cached, dict) and _set_list(cached) is not None else None
+
+
+def save_sets_cache(path: str, sets: SetList, etag: Optional[str], last_modified: Optional[str]):
+    with atomic_write(path, encoding="utf-8") as f:
+        json.dump({"etag": etag, "last_modified": last_modified, "data": sets}, f, ensure_ascii=False)
+
+
+def fetch_sets(cache_path: Optional[str] = DEFAULT_SETS_CACHE, refresh: bool = False,
+               session=None) -> Tuple[SetList, bool]:
+    """
+    Fetch Scryfall's set list, skipping the download if it hasn't changed.
+
+    Returns (sets, changed). With a cached copy at cache_path the request
+    carries If-None-Match / If-Modified-Since, and a 304 answer returns the
+    cached list with changed=False. refresh=True ignores the cache.
+    Raises requests.RequestException or ValueError on failure.
+    """
+    cached = load_sets_cache(cache_path) if cache_path and not refresh else None
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    r = request("GET", SETS_URL, session=session, headers=headers, timeout=30)
+    if r.status_code == 304 and cached:
+        return cached["data"], False
+    r.raise_for_status()
+    data = r.json()
+    if data.get("object") != "list":
+        raise ValueError("Unexpected response format from Scryfall API")
+    sets = data.get("data", [])
+    if cache_path:
+        save_sets_cache(cache_path, sets, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+    return sets, True
+
+
+def load_sets_file(path: str) -> SetList:
+    """Read a saved set list: a /sets response, a sets cache file or a JSON list of sets"""
+    with open(path, "r", encoding="utf-8") as f:
+        sets = _set_list(json.load(f))
+    if sets is None:
+        raise ValueError(f"{path} does not contain a list of sets")
+    return sets
+
+
+def is_magic_set(s: Dict[str, Any]) -> bool:
+    """Scryfall includes other games; sets without a game field count unless they are tokens or memorabilia"""
+    game = (s.get("game") or "").lower()
+    if game:
+        return game in ("mtg", "magic")
+    return s.get("set_type") not in ("token", "memorabilia")
+
+
+def index_by_code(sets: SetList) -> Dict[str, Dict[str, Any]]:
+    """Set code -> set, first occurrence wins"""
+    by_code: Dict[str, Dict[str, Any]] = {}
+    for s in sets:
+        code = (s.get("code") or "").strip()
+        if code:
+            by_code.setdefault(code, s)
+    return by_code
+
+
+def _replaces(candidate: Dict[str, Any], existing: Dict[str, Any]) -> bool:
+    """For a duplicate name, a set with a release date beats one without, and a newer one beats an older one"""
+    new, old = candidate.get("released_at"), existing.get("released_at")
+    return bool(new) and (not old or new > old)
+
+
+def scryfall_name_map(sets: SetList) -> Dict[str, str]:
+    """Set name -> Scryfall code; duplicate names keep the set _replaces() prefers"""
+    by_code = index_by_code(sets)
+    mapping: Dict[str, str] = {}
+    for s in sets:
+        name = (s.get("name") or "").strip()
+        code = (s.get("code") or "").strip()
+        if not (name and code):
+            continue
+        existing = mapping.get(name)
+        if existing is None or _replaces(s, by_code[existing]):
+            mapping[name] = code
+    return mapping
+
+
+def read_tcgplayer_mapping(path: str) -> Dict[str, str]:
+    """
+    Read a TCGplayer set name -> Scryfall code mapping.
+
+    Accepts the simple format ({"Set Name": "code"}, e.g.
+    tcgplayer_code_to_scryfall_code.json) and the detailed format
+    ({"Set Name": {"scryfall_code": ..., "tcgplayer_code": ...}}, e.g.
+    tcgplayer_to_scryfall.json). Detailed entries use scryfall_code and
+    fall back to the lowercased tcgplayer_code. Raises ValueError for any
+    other layout.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Unrecognized TCGplayer file format in {path}")
+    mapping: Dict[str, str] = {}
+    for name, value in data.items():
+        if isinstance(value, str):
+            code = value
+        elif isinstance(value, dict) and (value.get("scryfall_code") or value.get("tcgplayer_code")):
+            code = value.get("scryfall_code") or value["tcgplayer_code"].lower()
+        else:
+            raise ValueError(f"Unrecognized TCGplayer file format in {path} (entry {name!r})")
+        mapping[name.strip()] = code.strip()
+    return mapping
+
+
+def combine_mappings(mappings: Iterable[Dict[str, str]]) -> Dict[str, str]:
+    """Union of several name -> code mappings; the first mapping with a name wins"""
+    combined: Dict[str, str] = {}
+    for mapping in mappings:
+        for name, code in mapping.items():
+            combined.setdefault(name, code)
+    return combined
+
+
+def fold_in(mapping: Dict[str, str], extra: Dict[str, str]) -> Tuple[int, List[Tuple[str, str, str]]]:
+    """
+    Add the names from `extra` that `mapping` lacks, in place.
+
+    Returns (names added, [(name, kept code, ignored code)]) where the two
+    sources disagree; the code already in `mapping` is always kept.
+    """
+    added = 0
+    conflicts = []
+    for name, code in extra.items():
+        existing = mapping.get(name)
+        if existing is None:
+            mapping[name] = code
+            added += 1
+        elif existing.lower() != code.lower():
+            conflicts.append((name, existing, code))
+    return added, conflicts
@@ -0,0 +1,99 @@
+import functools
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import pipeline
+import scryfall_batch
+import scryfall_client
+from mock_scryfall import MockScryfall
+
+
+class Clock:
+    """
+    A stand-in for time.time() or time.monotonic(): returns `now`, moved on
+    by `step` at every call. sleep() moves it on instead of waiting.
+    """
+
+    def __init__(self, now=1000.0, step=0.0):
+        self.now = now
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() under the test's control: move clock.now on by hand, or set clock.step"""
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+class FakeIndex:
+    """
+    Stands in for a BulkCardIndex, counting its lookups in `calls`.
+
+    Given `colors` (set code -> color letter) it knows one mono-colored card
+    per set code; otherwise every card with a plain collector number, in
+    assorted colors.
+    """
+
+    CARDS = [
+        {"color_identity": ["W"], "type_line": "Creature"},
+        {"color_identity": ["U", "B"], "type_line": "Instant"},
+        {"color_identity": [], "type_line": "Basic Land"},
+        {"color_identity": [], "type_line": "Artifact"},
+        {"color_identity": ["G"], "type_line": "Sorcery"},
+    ]
+
+    def __init__(self, colors=None):
+        self.colors = colors
+        self.calls = []
+
+    def lookup(self, set_code, cn, name):
+        self.calls.append((set_code, cn, name))
+        if self.colors is not None:
+            if set_code not in self.colors:
+                return None
+            return {"color_identity": [self.colors[set_code]], "type_line": "Creature"}
+        if not cn.isdigit():
+            return None
+        return self.CARDS[int(cn) % len(self.CARDS)]
+
+
+@pytest.fixture
+def mock_scryfall(monkeypatch):
+    """
+    Start a MockScryfall with the given options and point the pipeline at it.
+
+    Retries don't back off, so fault-injection tests don't sleep through
+    the 5xx backoff schedule (429s already carry Retry-After: 0).
+    """
+    servers = []
+
+    def start(**options):
+        mock = MockScryfall(**options).start()
+        servers.append(mock)
+        request = functools.partial(scryfall_client.request, backoff=0)
+        monkeypatch.setattr(pipeline, "SCRYFALL_API", mock.url)
+        monkeypatch.setattr(pipeline, "scryfall_request", request)
+        monkeypatch.setattr(pipeline, "scryfall_request_async", functools.partial(scryfall_client.async_request, backoff=0))
+        monkeypatch.setattr(pipeline, "resolve_batch", functools.partial(scryfall_batch.resolve_batch, base_url=mock.url))
+        monkeypatch.setattr(scryfall_batch, "request", request)
+        return mock
+
+    yield start
+    for mock in servers:
+        mock.stop()
@@ -0,0 +1,36 @@
+import pytest
+
+from atomic_file import atomic_write
+
+
+def test_the_file_is_replaced_once_written(tmp_path):
+    path = tmp_path / "table.bin"
+    path.write_bytes(b"old")
+    with atomic_write(str(path), "wb") as f:
+        f.write(b"new")
+        # Written beside the target under a name of its own, until the block exits
+        assert path.read_bytes() == b"old"
+        assert len(list(tmp_path.glob("table.bin.*.tmp"))) == 1
+    assert path.read_bytes() == b"new"
+    assert [p.name for p in tmp_path.iterdir()] == ["table.bin"]
+
+
+def test_a_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path), encoding="utf-8") as f:
+            f.write("half")
+            raise RuntimeError("interrupted")
+    assert path.read_text() == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["cache.json"]
+
+
+def test_concurrent_writers_use_separate_temporary_files(tmp_path):
+    path = str(tmp_path / "sets.json")
+    with atomic_write(path) as first, atomic_write(path) as second:
+        assert len(list(tmp_path.glob("sets.json.*.tmp"))) == 2
+        first.write("first")
+        second.write("second")
+    # The last one to finish wins, whole
+    assert open(path).read() == "first"
@@ -0,0 +1,96 @@
+"""
+BackgroundJob runs a short fake job on its thread: the result is readable
+once it is done, exceptions are captured, cancel() stops it early, and only
+the latest (throttled) progress update is kept.
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import pipeline
+from background_jobs import BackgroundJob
+from conftest import Clock
+from pipeline import throttle_progress
+
+
+def test_result_is_read_when_done():
+    release = threading.Event()
+
+    def job(a, b, progress, cancel, scale=1):
+        release.wait(5)
+        progress(1.0, "Done")
+        return (a + b) * scale
+
+    job = BackgroundJob(job, 2, 3, scale=10)
+    assert not job.done() and job.result is None
+    assert job.progress == (0.0, "Starting…")
+    release.set()
+    assert job.wait(5)
+    assert (job.result, job.error) == (50, None)
+    assert job.progress == (1.0, "Done")
+    elapsed = job.elapsed
+    assert job.elapsed == elapsed
+
+
+def test_errors_are_captured():
+    def job(progress, cancel):
+        progress(0.5, "Halfway")
+        raise ValueError("Missing required column(s): Set")
+
+    job = BackgroundJob(job)
+    assert job.wait(5)
+    assert isinstance(job.error, ValueError) and str(job.error) == "Missing required column(s): Set"
+    assert job.result is None
+    assert job.progress == (0.5, "Halfway")
+
+
+def test_cancel_stops_the_job_early():
+    started = threading.Event()
+
+    def job(progress, cancel):
+        done = 0
+        while not cancel.wait(0.001):
+            done += 1
+            progress(done / 1e9, f"Row {done}")
+            started.set()
+        return done
+
+    job = BackgroundJob(job)
+    assert started.wait(5)
+    assert not job.cancelled
+    job.cancel()
+    assert job.cancelled
+    assert job.wait(5)
+    assert job.error is None
+    # The job returns what it had when it stopped, and its last update is what was kept
+    assert job.progress == (job.result / 1e9, f"Row {job.result}")
+
+
+@pytest.fixture
+def monotonic(monkeypatch):
+    clock = Clock(now=0.0)
+    monkeypatch.setattr(pipeline, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_throttled_progress_keeps_the_latest_update(monotonic):
+    sent = []
+
+    def job(progress, cancel):
+        def record(fraction, text):
+            sent.append((fraction, text))
+            progress(fraction, text)
+
+        throttled = throttle_progress(record, interval=0.25)
+        for row in range(1, 101):
+            monotonic.now += 0.01
+            throttled(row / 100, f"Row {row}")
+        return "finished"
+
+    job = BackgroundJob(job)
+    assert job.wait(5) and job.result == "finished"
+    # One update per 0.25 s of the job's clock, plus the completion
+    assert [text for _, text in sent] == ["Row 1", "Row 26", "Row 51", "Row 76", "Row 100"]
+    assert job.progress == (1.0, "Row 100")
@@ -0,0 +1,96 @@
+"""
+Batch mode gives every file the same outputs as enriching it on its own,
+commits its cache writes, starting pools from several threads leaves
+__main__ as it was, and concurrent runs share one budget of workers.
+"""
+
+import io
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+import batch_runner
+from batch_runner import BatchSource, ProcessBudget, run_batch
+from card_cache import CardCache
+from pipeline import checklist_bytes, export_bytes, fill_colors, read_pull_list
+from synthetic import generate, set_code_map
+
+
+def pull_list_bytes(rows, seed):
+    buf = io.BytesIO()
+    generate(rows, seed=seed).to_csv(buf, index=False)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_batch_matches_enriching_each_file(mock_scryfall, processes):
+    mock_scryfall()
+    files = [pull_list_bytes(150, seed) for seed in (18, 19, 20)]
+    results, summary = run_batch([BatchSource(f"store{n}.csv", data=data) for n, data in enumerate(files)],
+                                 set_code_map(), processes=processes, requests_per_second=1000)
+    assert summary["processes"] == processes
+    assert summary["unique_lookups"] < summary["file_keys"]
+    for data, result in zip(files, results):
+        df, filled, skipped = fill_colors(read_pull_list(io.BytesIO(data)), set_code_map(), requests_per_second=1000)
+        assert (result["rows"], result["filled"], result["skipped"]) == (len(df), filled, skipped)
+        assert result["csv"] == export_bytes(df)
+        assert result["checklist"] == checklist_bytes(df)
+
+
+def test_batch_commits_its_cache_writes(mock_scryfall, tmp_path):
+    mock_scryfall()
+    path = str(tmp_path / "cache.sqlite3")
+    cache = CardCache(path)
+    files = [pull_list_bytes(60, seed) for seed in (21, 22)]
+    run_batch([BatchSource(f"store{n}.csv", data=data) for n, data in enumerate(files)],
+              set_code_map(), processes=1, requests_per_second=1000, cache=cache)
+    # The cache stays open, as the app's shared one does; another connection still sees every write
+    other = sqlite3.connect(path)
+    (seen,) = other.execute("SELECT COUNT(*) FROM cards").fetchone()
+    other.close()
+    (own,) = cache._conn.execute("SELECT COUNT(*) FROM cards").fetchone()
+    assert seen == own > 0
+    assert not cache._conn.in_transaction
+    cache.close()
+
+
+def test_main_script_is_restored_when_pools_start_together():
+    main = sys.modules["__main__"]
+    entered = [threading.Event(), threading.Event()]
+    release = [threading.Event(), threading.Event()]
+
+    def start(n):
+        with batch_runner._main_script_hidden():
+            entered[n].set()
+            release[n].wait(5)
+
+    threads = [threading.Thread(target=start, args=(n,)) for n in range(2)]
+    threads[0].start()
+    entered[0].wait(5)
+    threads[1].start()
+    # The second waits for the first to put __main__ back before hiding it, so the first can finish first
+    assert not entered[1].wait(0.2)
+    release[0].set()
+    threads[0].join()
+    release[1].set()
+    threads[1].join()
+    assert sys.modules["__main__"] is main
+
+
+def test_process_budget_is_shared_by_concurrent_runs():
+    budget = ProcessBudget(3)
+    with budget.reserve(2) as first:
+        assert first == 2
+        # One worker left isn't a pool: the run stays in its own process
+        with budget.reserve(4) as second:
+            assert second == 1
+            assert budget.free == 1
+    assert budget.free == 3
+    with budget.reserve(8) as third:
+        assert third == 3 and budget.free == 0
+    with pytest.raises(RuntimeError):
+        with budget.reserve(2):
+            raise RuntimeError("run failed")
+    assert budget.free == 3
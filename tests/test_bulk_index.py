@@ -0,0 +1,116 @@
+"""
+The offline card index built from a tiny bulk dump (fixtures/bulk-cards.json):
+lookups by set + collector number and by set + name, the saved index and
+the color table built by build_bulk_index.py.
+"""
+
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from color_table import ColorTable, load_offline_index
+from conftest import ROOT
+from pipeline import color_from_card, fill_colors
+from scryfall_bulk import CARD_FIELDS, BulkCardIndex
+
+BULK_FILE = os.path.join(os.path.dirname(__file__), "fixtures", "bulk-cards.json")
+
+# (set code, collector number, name) -> color code
+EXPECTED = {
+    ("m11", "149", "Lightning Bolt"): "R",
+    ("m11", "33", "Serra Angel"): "W",
+    ("m11", "246", "Forest"): "L",
+    ("c21", "263", "Sol Ring"): "C",
+    ("grn", "192", "Niv-Mizzet, Parun"): "Gd",
+    ("roe", "7", "Kozilek's Channeler"): "C",
+    ("isd", "51", "Delver of Secrets // Insectile Aberration"): "U",
+    ("plst", "M10-146", "Lightning Bolt"): "R",
+    # A made-up printing with a different color, so the name index's first-seen rule is visible
+    ("m11", "149p", "Lightning Bolt"): "U",
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return BulkCardIndex.from_bulk_file(BULK_FILE)
+
+
+def color(index, set_code, cn, name):
+    card = index.lookup(set_code, cn, name)
+    return color_from_card(card) if card is not None else None
+
+
+def test_dump_is_compacted(index):
+    assert len(index) == 10
+    assert len(index.by_name) == 8
+    for card in index.by_number.values():
+        assert set(card) <= set(CARD_FIELDS)
+    # Cards with the same color profile share one dict
+    assert index.by_number[("m11", "246")] is index.by_number[("m11", "247")]
+    assert index.by_number[("m11", "149")] is index.by_number[("plst", "M10-146")]
+
+
+@pytest.mark.parametrize("key, expected", EXPECTED.items(), ids=[f"{s}/{cn}" for s, cn, _ in EXPECTED])
+def test_lookup_by_number(index, key, expected):
+    assert color(index, *key) == expected
+
+
+def test_lookup_by_name(index):
+    # Unknown collector numbers fall back to the name, matched case- and whitespace-insensitively
+    assert color(index, "M11", "999", "  serra   ANGEL ") == "W"
+    assert color(index, "grn", "", "Niv-Mizzet, Parun") == "Gd"
+    # The first card in the dump with a (set, name) pair wins
+    assert color(index, "m11", "999", "Lightning Bolt") == "R"
+    # Names only match within their set
+    assert color(index, "m10", "999", "Lightning Bolt") is None
+    assert color(index, "m11", "999", "") is None
+
+
+@pytest.mark.parametrize("file_name", ["bulk_index.json", "bulk_index.json.gz"])
+def test_saved_index_round_trips(index, tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    index.save(path)
+    loaded = BulkCardIndex.load(path)
+    assert loaded.by_number == index.by_number
+    assert loaded.by_name == index.by_name
+    assert loaded.by_number[("m11", "246")] is loaded.by_number[("m11", "247")]
+
+
+def build(tmp_path, *args):
+    subprocess.run([sys.executable, os.path.join(ROOT, "build_bulk_index.py"), *args],
+                   cwd=tmp_path, check=True, capture_output=True)
+
+
+def test_build_bulk_index_json_and_table(index, tmp_path):
+    build(tmp_path, "--bulk-file", BULK_FILE)
+    build(tmp_path, "--index-file", "bulk_index.json", "--format", "table")
+    built = load_offline_index(str(tmp_path / "bulk_index.json"))
+    table = load_offline_index(str(tmp_path / "color_table.bin"))
+    try:
+        assert isinstance(built, BulkCardIndex) and isinstance(table, ColorTable)
+        assert built.by_number == index.by_number
+        lookups = {key: key for key in EXPECTED}
+        lookups[("m11", "999", "Serra Angel")] = ("m11", "999", "Serra Angel")
+        lookups[("m10", "999", "Lightning Bolt")] = ("m10", "999", "Lightning Bolt")
+        expected = {key: color(index, *key) for key in lookups}
+        assert table.colors(lookups) == expected
+        assert {key: table.color(*key) for key in lookups} == expected
+    finally:
+        table.close()
+
+
+def test_fill_colors_from_the_index(index):
+    df = pd.DataFrame({
+        "Product Line": ["Magic", "Magic", "Magic", "Magic", "Pokemon"],
+        "Set": ["Magic 2011", "Guilds of Ravnica", "Magic 2011", "Unknown Set", "Magic 2011"],
+        "Product Name": ["Lightning Bolt", "Niv-Mizzet, Parun", "Serra Angel", "Sol Ring", "Lightning Bolt"],
+        "Number": ["149", 192.0, "000", "263", "149"],
+        "Condition": ["Near Mint", "Near Mint Foil", "Near Mint", "Near Mint", "Near Mint"],
+    })
+    set_map = {"Magic 2011": "M11", "Guilds of Ravnica": "grn"}
+    out, filled, skipped = fill_colors(df, set_map, bulk_index=index)
+    assert out["Color"].astype(object).tolist() == ["R", "Gd", "W", "", ""]
+    assert (filled, skipped) == (3, 1)
@@ -0,0 +1,211 @@
+import sqlite3
+
+import pandas as pd
+
+import card_cache
+from card_cache import CardCache
+from pipeline import fill_colors
+from synthetic import set_code_map
+
+
+def test_runs_count_their_own_cache_use(tmp_path):
+    cache = CardCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("neo", "1", "Card A", "W")
+    cache.put_unresolved("neo", "9", "Missing")
+    first, second = cache.for_run(), cache.for_run()
+
+    assert first.get("neo", "1", "Card A") == "W"
+    assert first.is_unresolved("neo", "9", "Missing")
+    assert second.get("neo", "2", "Card B") is None
+    second.put("neo", "2", "Card B", "U")
+    assert second.get("neo", "2", "Card B") == "U"
+
+    assert first.stats() == {"hits": 1, "misses": 0, "evictions": 0, "negative_hits": 1}
+    assert second.stats() == {"hits": 1, "misses": 1, "evictions": 0, "negative_hits": 0}
+    totals = cache.stats()
+    assert (totals["hits"], totals["misses"], totals["negative_hits"]) == (2, 1, 1)
+    cache.close()
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = CardCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=100)
+    cache.put("neo", "1", "Card A", "W")
+    clock.now += 99
+    assert cache.get("neo", "1", "Card A") == "W"
+    clock.now += 2
+    # Expired by its creation time, not its last use; both rows of the card go
+    assert cache.get("neo", "2", "Card A") is None
+    assert cache.get("neo", "1", "") is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+
+def test_least_recently_used_cards_are_evicted(tmp_path, clock):
+    cache = CardCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    for cn, name in [("1", "Card A"), ("2", "Card B"), ("3", "Card C")]:
+        clock.now += 1
+        cache.put("neo", cn, name, "W")
+    clock.now += 1
+    assert cache.get("neo", "9", "Card A") == "W"
+    clock.now += 1
+    run = cache.for_run()
+    run.put("neo", "4", "Card D", "U")
+    run.flush()
+    # Card B, used least recently, is evicted under both of its keys; the limit counts cards, not rows
+    assert cache.get("neo", "2", "") is None
+    assert cache.get("neo", "9", "Card B") is None
+    assert [cache.get("neo", cn, "") for cn in "134"] == ["W", "W", "U"]
+    assert cache.stats()["entries"] == 3
+    assert run.stats()["evictions"] == 1
+    cache.close()
+
+
+def test_limits_are_checked_every_few_writes(tmp_path):
+    cache = CardCache(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    for i in range(card_cache.CHECK_EVERY - 1):
+        cache.put("neo", str(i), f"Card {i}", "W")
+    assert cache.stats()["entries"] == card_cache.CHECK_EVERY - 1
+    cache.put("neo", "last", "Last Card", "W")
+    assert cache.stats()["entries"] == 10
+    # Committed with the check, so another connection sees the writes
+    other = sqlite3.connect(str(tmp_path / "cache.sqlite3"))
+    assert other.execute("SELECT COUNT(DISTINCT card) FROM cards").fetchone() == (10,)
+    other.close()
+    cache.close()
+
+
+def test_hits_are_committed_in_batches(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = CardCache(path)
+    cache.put("neo", "1", "Card A", "W")
+    cache.flush()
+    clock.now += 10
+    assert cache.get("neo", "1", "Card A") == "W"
+    assert cache.get("neo", "2", "Card B") is None
+    # The hit's last-used time waits for the next batch commit like any other write
+    other = sqlite3.connect(path)
+    assert other.execute("SELECT MAX(last_used) FROM cards").fetchone() == (1000.0,)
+    cache.flush()
+    assert other.execute("SELECT MAX(last_used) FROM cards").fetchone() == (1010.0,)
+    other.close()
+    cache.close()
+
+
+def fill(cache, clock, n):
+    for i in range(n):
+        clock.now += 1
+        cache.put("neo", str(i), f"A long card name to take up some room {i}", "W")
+    cache.flush()
+
+
+def test_byte_budget_evicts_oldest_cards(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    n = 3 * card_cache.MIN_CARDS_KEPT
+    cache = CardCache(path, max_entries=None)
+    fill(cache, clock, n)
+    full = cache._used_bytes()
+    cache.close()
+
+    cache = CardCache(path, max_entries=None, max_bytes=full // 2)
+    cache.flush()
+    entries = cache.stats()["entries"]
+    assert card_cache.MIN_CARDS_KEPT < entries < n
+    assert cache._used_bytes() <= full // 2
+    # The most recently used cards are the ones kept
+    assert cache.get("neo", str(n - entries), "") == "W"
+    assert cache.get("neo", str(n - entries - 1), "") is None
+    assert cache.stats()["evictions"] == n - entries
+    cache.close()
+
+
+def test_byte_budget_below_an_empty_cache_keeps_a_floor(tmp_path, clock):
+    n = 2 * card_cache.MIN_CARDS_KEPT
+    cache = CardCache(str(tmp_path / "cache.sqlite3"), max_entries=None, max_bytes=1)
+    fill(cache, clock, n)
+    assert cache.stats()["entries"] == card_cache.MIN_CARDS_KEPT
+    assert cache.get("neo", str(n - 1), "") == "W"
+    cache.put("neo", "new", "New Card", "U")
+    cache.flush()
+    assert cache.stats()["entries"] == card_cache.MIN_CARDS_KEPT
+    assert cache.get("neo", "new", "") == "U"
+    cache.close()
+
+
+def test_caches_without_card_ids_are_rebuilt(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE cards (key TEXT PRIMARY KEY, color TEXT NOT NULL, created_at REAL NOT NULL, "
+                 "last_used REAL NOT NULL)")
+    conn.execute("INSERT INTO cards VALUES ('cn|neo|1', 'W', 0, 0)")
+    conn.commit()
+    conn.close()
+    cache = CardCache(path)
+    assert cache.stats()["entries"] == 0
+    cache.put("neo", "1", "Card A", "W")
+    assert cache.get("neo", "1", "") == "W"
+    cache.close()
+
+
+def test_unresolved_cards_expire_after_the_negative_ttl(tmp_path, clock):
+    cache = CardCache(str(tmp_path / "cache.sqlite3"), negative_ttl_seconds=100)
+    cache.put_unresolved("neo", "9", "Missing")
+    clock.now += 99
+    assert cache.is_unresolved("neo", "9", "  missing ")
+    clock.now += 2
+    assert not cache.is_unresolved("neo", "9", "Missing")
+    # The expired entry is gone, not just skipped
+    clock.now -= 10
+    assert not cache.is_unresolved("neo", "9", "Missing")
+    assert cache.stats()["unresolved_entries"] == 0
+    cache.close()
+
+
+def test_clear_unresolved_only_clears_that_set(tmp_path):
+    cache = CardCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_unresolved("NEO", "9", "Missing")
+    cache.put_unresolved("neo", "10", "Also Missing")
+    cache.put_unresolved("m11", "9", "Missing")
+    assert cache.clear_unresolved("Neo") == 2
+    assert not cache.is_unresolved("neo", "9", "Missing")
+    assert not cache.is_unresolved("neo", "10", "Also Missing")
+    assert cache.is_unresolved("m11", "9", "Missing")
+    assert cache.clear_unresolved() == 1
+    assert cache.stats()["unresolved_entries"] == 0
+    cache.close()
+
+
+def test_runs_skip_unresolved_cards_until_they_expire(mock_scryfall, tmp_path, clock):
+    mock = mock_scryfall()
+    cache = CardCache(str(tmp_path / "cache.sqlite3"), negative_ttl_seconds=100)
+    df = pd.DataFrame({
+        "Product Line": ["Magic", "Magic", "Magic"],
+        "Set": ["Synthetic Set 001", "Synthetic Set 001", "Synthetic Set 002"],
+        "Number": ["1", "9999", "9999"],
+        "Product Name": ["Synthetic Card s001-1", "No Such Card", "No Such Card"],
+        "Condition": ["Near Mint"] * 3,
+    })
+
+    def run():
+        stats = {}
+        out, filled, skipped = fill_colors(df.copy(), set_code_map(), cache=cache, batch=False, stats=stats)
+        assert filled == 1
+        return stats["cache"], mock.reset_counts()
+
+    _, first_calls = run()
+    assert first_calls
+    # Inside the negative TTL neither missing card is requested again
+    clock.now += 99
+    counts, calls = run()
+    assert (counts["negative_hits"], counts["hits"], calls) == (2, 1, {})
+    # Clearing one set brings back only its card
+    cache.clear_unresolved("s001")
+    counts, one_card = run()
+    assert counts["negative_hits"] == 1
+    assert 0 < sum(one_card.values()) < sum(first_calls.values())
+    # Once the other entry expires, both missing cards are looked up again
+    clock.now += 101
+    counts, calls = run()
+    assert counts["negative_hits"] == 0
+    assert calls == {tier: 2 * n for tier, n in one_card.items()}
+    cache.close()
@@ -0,0 +1,42 @@
+import os
+
+import pandas as pd
+
+from pipeline import write_checklists_by_set
+
+
+def test_sets_with_the_same_file_name_are_all_written(tmp_path):
+    df = pd.DataFrame({
+        "Product Name": ["A", "B", "C", "D"],
+        "Quantity": [1, 1, 1, 1],
+        "Color": ["W", "U", "B", "R"],
+        "Number": ["1", "2", "3", "4"],
+        "Set": ["Foo: Bar", "Foo - Bar", "foo bar", "Other"],
+        "Product Line": ["Magic"] * 4,
+    })
+    paths = write_checklists_by_set(df, str(tmp_path), prefix="list")
+    assert len(paths) == len(set(p.lower() for p in paths)) == 4
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in paths)
+    headings = set()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        headings.update(name for name in df["Set"] if f"<h1>TCGplayer Pull List Checklist — {name}</h1>" in html)
+    assert headings == set(df["Set"])
+
+
+def test_set_and_product_names_are_escaped(tmp_path):
+    df = pd.DataFrame({
+        "Product Name": ['Fire & Ice <"Split">'],
+        "Quantity": [1],
+        "Color": ["M"],
+        "Number": ["128"],
+        "Set": ['Apocalypse <Promos> & "Friends"'],
+        "Product Line": ["Magic"],
+    })
+    (path,) = write_checklists_by_set(df, str(tmp_path), prefix="list")
+    with open(path, encoding="utf-8") as f:
+        html = f.read()
+    assert "<h1>TCGplayer Pull List Checklist — Apocalypse &lt;Promos&gt; &amp; &quot;Friends&quot;</h1>" in html
+    assert "<td>Fire &amp; Ice &lt;&quot;Split&quot;&gt;</td>" in html
+    assert "<Promos>" not in html and "<\"Split\">" not in html
@@ -0,0 +1,79 @@
+"""
+RunCheckpoint: an interrupted run picks up from its JSON-lines file, torn
+last lines are skipped, and remove_stale() clears abandoned checkpoints.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+from checkpoint import SUFFIX, RunCheckpoint, checkpoint_path, remove_stale
+from pipeline import fill_colors
+from synthetic import generate, set_code_map
+
+
+def test_interrupted_run_resumes_from_its_file(mock_scryfall, tmp_path):
+    mock = mock_scryfall()
+    df = generate(120, seed=20).iloc[:-1]
+    options = dict(batch=False, workers=1, requests_per_second=1000)
+    whole, filled, _ = fill_colors(df, set_code_map(), **options)
+    whole_calls = Counter(mock.reset_counts())
+
+    path = checkpoint_path(str(tmp_path), "run")
+    cancel = threading.Event()
+
+    def stop_partway(fraction, text):
+        if text.startswith("Looked up") and fraction >= 0.4:
+            cancel.set()
+
+    stats = {}
+    fill_colors(df, set_code_map(), checkpoint=RunCheckpoint(path), cancel=cancel, progress=stop_partway,
+                stats=stats, **options)
+    assert stats["cancelled"] > 0
+    first_calls = Counter(mock.reset_counts())
+
+    resumed = RunCheckpoint(path)
+    assert 0 < len(resumed.restored) < stats["unique_lookups"]
+    stats = {}
+    out, resumed_filled, _ = fill_colors(df, set_code_map(), checkpoint=resumed, stats=stats, **options)
+    assert stats["resumed_lookups"] == len(resumed.restored)
+    pd.testing.assert_series_equal(out["Color"], whole["Color"])
+    assert resumed_filled == filled
+    # Keys in the file weren't looked up again: the two runs made the requests of one
+    assert first_calls + Counter(mock.reset_counts()) == whole_calls
+    assert len(RunCheckpoint(path)) == stats["unique_lookups"]
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / f"run{SUFFIX}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('["m11", "149", "Lightning Bolt", "R"]\n["m11", "33", "Serra Angel", null]\n["m11", "24')
+    checkpoint = RunCheckpoint(path)
+    assert checkpoint.colors == {("m11", "149", "Lightning Bolt"): "R", ("m11", "33", "Serra Angel"): None}
+
+    # The next append starts on a line of its own, so it isn't lost with the torn one
+    checkpoint.record_many({("m11", "246", "Forest"): "L"})
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert json.loads(lines[-1]) == ["m11", "246", "Forest", "L"]
+    assert RunCheckpoint(path).colors == checkpoint.colors
+    assert len(checkpoint) == 3
+
+
+def test_remove_stale(tmp_path):
+    old, fresh = checkpoint_path(str(tmp_path), "old"), checkpoint_path(str(tmp_path), "fresh")
+    other = str(tmp_path / "notes.jsonl")
+    for path in (old, fresh, other):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("[]\n")
+    day_ago = time.time() - 24 * 3600
+    os.utime(old, (day_ago, day_ago))
+    os.utime(other, (day_ago, day_ago))
+
+    assert remove_stale(str(tmp_path), max_age_seconds=3600) == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in (fresh, other))
+    assert remove_stale(str(tmp_path / "missing")) == 0
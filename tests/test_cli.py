@@ -0,0 +1,109 @@
+"""
+cli.main() against the mock Scryfall server: it writes the enriched CSV,
+checklist and report, streams to the same output with --chunksize, rejects
+option combinations it can't run with exit code 1, and never imports
+Streamlit.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+from pipeline import fill_colors, read_pull_list, write_checklist, write_export
+from synthetic import generate, set_code_map
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    csv_path = tmp_path / "pull_list.csv"
+    generate(120, seed=4).to_csv(csv_path, index=False)
+    map_path = tmp_path / "set_code_map.json"
+    map_path.write_text(json.dumps(set_code_map()), encoding="utf-8")
+    return str(csv_path), str(map_path)
+
+
+def run_cli(inputs, tmp_path, *options):
+    csv_path, map_path = inputs
+    out_dir = tmp_path / "out"
+    cli.main([csv_path, "--set-map", map_path, "--output-dir", str(out_dir),
+              "--cache", str(tmp_path / "cache.sqlite3"), "--quiet", *options])
+    return out_dir
+
+
+@pytest.mark.parametrize("options", [[], ["--chunksize", "25"]])
+def test_writes_the_export_checklist_and_report(mock_scryfall, inputs, tmp_path, capsys, options):
+    mock_scryfall()
+    out_dir = run_cli(inputs, tmp_path, *options)
+
+    df, filled, skipped = fill_colors(read_pull_list(inputs[0]), set_code_map(), workers=4)
+    write_export(df, str(tmp_path / "expected.csv"))
+    assert (out_dir / "pull_list_with_colors.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+    html = io.StringIO()
+    write_checklist(df, html)
+    assert (out_dir / "pull_list_checklist.html").read_text(encoding="utf-8") == html.getvalue()
+
+    report = json.loads((out_dir / "pull_list_report.json").read_text(encoding="utf-8"))
+    assert (report["rows"], report["filled"], report["skipped_or_unknown"]) == (len(df), filled, skipped)
+    assert report["diagnostics"]["http_calls"] > 0
+    assert f"Filled: {filled} | Skipped/Unknown: {skipped} | Rows: {len(df)}" in capsys.readouterr().out
+    # Nothing but the outputs is left behind, in particular no spilled checklist rows
+    assert sorted(p.name for p in out_dir.iterdir()) == [
+        "pull_list_checklist.html", "pull_list_report.json", "pull_list_with_colors.csv"]
+
+
+def test_split_by_set_writes_a_checklist_per_set(mock_scryfall, inputs, tmp_path, capsys):
+    mock_scryfall()
+    out_dir = run_cli(inputs, tmp_path, "--split-by-set", "--chunksize", "50")
+    set_files = sorted(os.listdir(out_dir / "pull_list_checklist"))
+    sets = read_pull_list(inputs[0])["Set"].dropna().unique()
+    assert len(set_files) == len(sets)
+    assert all(name.startswith("pull_list_checklist_") and name.endswith(".html") for name in set_files)
+    assert f"Wrote {len(sets)} per-set checklists" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("options, message", [
+    (["--chunksize", "10", "--max-rows", "5"], "--max-rows can't be combined with --chunksize"),
+    (["--chunksize", "10", "--export-format", "parquet"], "--chunksize streams CSV"),
+])
+def test_conflicting_options_exit_with_an_error(inputs, tmp_path, capsys, options, message):
+    with pytest.raises(SystemExit) as exc:
+        run_cli(inputs, tmp_path, *options)
+    assert exc.value.code == 1
+    assert message in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
+
+
+def test_missing_columns_exit_with_an_error(tmp_path, capsys):
+    csv_path = tmp_path / "other.csv"
+    csv_path.write_text("Name,Quantity\nLightning Bolt,1\n", encoding="utf-8")
+    with pytest.raises(SystemExit) as exc:
+        cli.main([str(csv_path), "--output-dir", str(tmp_path / "out"), "--quiet"])
+    assert exc.value.code == 1
+    assert "Missing required column(s)" in capsys.readouterr().err
+
+
+def test_no_input_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli.main([])
+    assert exc.value.code == 2
+    assert "input_csv" in capsys.readouterr().err
+
+
+def test_streamlit_is_not_imported(mock_scryfall, inputs, tmp_path):
+    mock = mock_scryfall()
+    csv_path, map_path = inputs
+    script = "import sys, cli; cli.main(sys.argv[1:]); print('streamlit' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", script, csv_path, "--set-map", map_path, "--output-dir", str(tmp_path / "out"),
+         "--no-cache", "--quiet"],
+        cwd=ROOT, env={**os.environ, "SCRYFALL_API_URL": mock.url}, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.splitlines()[-1] == "False"
+    assert (tmp_path / "out" / "pull_list_with_colors.csv").exists()
@@ -0,0 +1,111 @@
+"""
+The memory-mapped color table on its own: keys written and read back,
+missing keys, colliding hashes, and a table reopened while the file is
+replaced.
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+import color_table
+from color_table import CODES, HEADER, MAGIC, TABLE_VERSION, ColorTable, write_color_table
+
+NUMBERS = [("m11", "149", "R"), ("m11", "33", "W"), ("grn", "192", "Gd"), ("c21", "263", "C"), ("m11", "246", "L"),
+           ("roe", "7", "C"), ("isd", "51", "U"), ("m19", "106", "B"), ("m19", "200", "G"), ("xyz", "1", "")]
+NAMES = [("m11", "lightning bolt", "R"), ("plst", "Lightning  Bolt", "R"), ("grn", "niv-mizzet, parun", "Gd")]
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    path = str(tmp_path / "color_table.bin")
+    write_color_table(path, NUMBERS, NAMES)
+    return path
+
+
+@pytest.fixture
+def table(table_path):
+    table = ColorTable(table_path)
+    yield table
+    table.close()
+
+
+def test_written_keys_are_read_back(table):
+    assert len(table) == len(NUMBERS)
+    assert {CODES[code] for code in table.number_codes} == set(CODES)
+    for set_code, cn, color in NUMBERS:
+        assert table.color(set_code.upper(), cn, "") == color
+    # A number miss falls back to the normalized name
+    assert table.color("PLST", "M10-146", "LIGHTNING BOLT") == "R"
+    assert table.color("grn", "999", " Niv-Mizzet,  Parun ") == "Gd"
+    lookups = {n: (s, cn, "") for n, (s, cn, _) in enumerate(NUMBERS)}
+    lookups["name"] = ("m11", "999", "Lightning Bolt")
+    assert table.colors(lookups) == {**{n: color for n, (_, _, color) in enumerate(NUMBERS)}, "name": "R"}
+
+
+def test_missing_keys(table):
+    misses = [("m11", "999", ""), ("m11", "999", "Not A Card"), ("zzz", "149", "Lightning Bolt"), ("", "", "")]
+    for key in misses:
+        assert table.color(*key) is None
+    assert table.colors(dict(enumerate(misses))) == dict.fromkeys(range(len(misses)))
+    # Hashes sorting before the first key and past the last one
+    edges = np.array([0, 2**64 - 1], dtype="<u8")
+    assert ColorTable._find(table.number_keys, table.number_codes, edges).tolist() == [-1, -1]
+
+
+def test_empty_table(tmp_path):
+    path = str(tmp_path / "empty.bin")
+    write_color_table(path, [], [])
+    table = ColorTable(path)
+    try:
+        assert len(table) == 0
+        assert table.color("m11", "149", "Lightning Bolt") is None
+        assert table.colors({1: ("m11", "149", "Lightning Bolt")}) == {1: None}
+    finally:
+        table.close()
+
+
+def test_colliding_hashes_keep_the_first_key(tmp_path, monkeypatch):
+    # Every key hashes to one of four values
+    monkeypatch.setattr(color_table, "key_hash", lambda *parts: sum(map(len, parts)) % 4)
+    path = str(tmp_path / "collide.bin")
+    write_color_table(path, [("a", "1", "W"), ("b", "2", "U"), ("a", "12", "B"), ("aa", "123", "G")], [])
+    table = ColorTable(path)
+    try:
+        assert table.number_keys.tolist() == [1, 2, 3]
+        # ("b", "2") hashes like ("a", "1"), which was written first
+        assert [table.color(s, cn, "") for s, cn in [("a", "1"), ("b", "2"), ("a", "12"), ("aa", "123")]] == \
+            ["W", "W", "B", "G"]
+        assert table.color("abc", "1", "") is None
+    finally:
+        table.close()
+
+
+def test_reopened_table_sees_the_replaced_file(table_path):
+    old = ColorTable(table_path)
+    try:
+        write_color_table(table_path, [("m11", "149", "U")], [])
+        # The open table keeps mapping the file it opened; the file was replaced, not rewritten
+        assert old.color("m11", "149", "") == "R"
+        assert len(old) == len(NUMBERS)
+        new = ColorTable(table_path)
+        try:
+            assert new.color("m11", "149", "") == "U"
+            assert new.color("m11", "33", "") is None
+        finally:
+            new.close()
+    finally:
+        old.close()
+    assert old.number_keys is None
+
+
+@pytest.mark.parametrize("header, message", [
+    (HEADER.pack(b"NOTCOLOR", TABLE_VERSION, 0, 0, 0), "is not a color table"),
+    (HEADER.pack(MAGIC, TABLE_VERSION + 1, 0, 0, 0), "Unsupported color table version"),
+])
+def test_bad_headers_are_rejected(tmp_path, header, message):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(header + struct.pack("<Q", 0))
+    with pytest.raises(ValueError, match=message):
+        ColorTable(str(path))
@@ -0,0 +1,87 @@
+"""
+The serial, thread-pool and asyncio lookup engines fill the same Color
+column, including when the mock server answers with 429s and 5xx errors.
+"""
+
+import functools
+
+import pytest
+
+import pipeline
+import scryfall_client
+from instrumentation import RunMetrics
+from pipeline import fill_colors
+from synthetic import generate, set_code_map
+
+ENGINES = {"serial": ("thread", 1), "thread": ("thread", 8), "async": ("async", 8)}
+
+
+def run_engines(df, **options):
+    results = {}
+    for label, (engine, workers) in ENGINES.items():
+        stats = {}
+        metrics = RunMetrics()
+        out, filled, skipped = fill_colors(df, set_code_map(), batch=False, stats=stats, metrics=metrics,
+                                           engine=engine, workers=workers, requests_per_second=10_000, **options)
+        results[label] = (out, filled, skipped, stats, metrics.to_dict())
+    return results
+
+
+def statuses(metrics):
+    total = {}
+    for tier in metrics["http"].values():
+        for status, n in tier["statuses"].items():
+            total[status] = total.get(status, 0) + n
+    return total
+
+
+def test_engines_agree_without_faults(mock_scryfall):
+    mock_scryfall()
+    df = generate(400, seed=11).iloc[:-1]
+    results = run_engines(df)
+    serial, filled, skipped, _, _ = results["serial"]
+    assert filled > 0
+    for label, (out, *counts, stats, _) in results.items():
+        assert out["Color"].equals(serial["Color"]), label
+        assert counts == [filled, skipped], label
+
+
+@pytest.mark.parametrize("faults", [{"rate_limit_rate": 0.3}, {"error_rate": 0.3},
+                                    {"rate_limit_rate": 0.2, "error_rate": 0.2}],
+                         ids=["429", "5xx", "429 and 5xx"])
+def test_engines_agree_when_retries_succeed(mock_scryfall, monkeypatch, faults):
+    mock_scryfall()
+    df = generate(400, seed=11).iloc[:-1]
+    expected = run_engines(df)["serial"]
+
+    mock_scryfall(seed=5, **faults)
+    # Enough retries that every lookup eventually gets through the injected faults
+    monkeypatch.setattr(pipeline, "scryfall_request", functools.partial(scryfall_client.request, backoff=0, max_retries=25))
+    monkeypatch.setattr(pipeline, "scryfall_request_async",
+                        functools.partial(scryfall_client.async_request, backoff=0, max_retries=25))
+    for label, (out, filled, skipped, stats, metrics) in run_engines(df).items():
+        assert out["Color"].equals(expected[0]["Color"]), label
+        assert (filled, skipped) == expected[1:3], label
+        assert stats["rate_limited"] == stats["lookup_errors"] == 0, label
+        seen = statuses(metrics)
+        if faults.get("rate_limit_rate"):
+            assert seen.get("429", 0) > 0, label
+        if faults.get("error_rate"):
+            assert seen.get("500", 0) > 0, label
+
+
+@pytest.mark.parametrize("faults, counted_as", [({"rate_limit_rate": 1.0}, "rate_limited"),
+                                                ({"error_rate": 1.0}, "lookup_errors")],
+                         ids=["429", "5xx"])
+def test_engines_agree_when_retries_run_out(mock_scryfall, faults, counted_as):
+    mock_scryfall(**faults)
+    df = generate(100, seed=12).iloc[:-1]
+    results = run_engines(df)
+    serial, _, _, serial_stats, _ = results["serial"]
+    assert serial_stats[counted_as] == serial_stats["lookup_rows"] > 0
+    for label, (out, filled, skipped, stats, _) in results.items():
+        assert out["Color"].equals(serial["Color"]), label
+        assert filled == 0, label
+        # Rows that failed aren't reported as cards Scryfall doesn't have
+        assert skipped == serial_stats["looked_up_rows"] - stats[counted_as], label
+        assert stats[counted_as] == serial_stats[counted_as], label
@@ -0,0 +1,126 @@
+"""
+Streaming a pull list through enrich_csv_stream() gives the same export and
+checklist as enriching it in memory, wherever the chunks are cut, and looks
+each card up once however many chunks it appears in.
+"""
+
+import io
+import os
+
+import numpy as np
+import pytest
+
+from pipeline import (ChecklistSpill, ResolvedKeys, enrich_csv_stream, fill_colors, read_pull_list, write_checklist,
+                      write_checklists_by_set, write_export)
+from scryfall_bulk import BulkCardIndex
+from synthetic import generate, set_code_map
+
+BULK_FILE = os.path.join(os.path.dirname(__file__), "fixtures", "bulk-cards.json")
+SET_MAP = {"Magic 2011": "m11", "Guilds of Ravnica": "grn", "Commander 2021": "c21"}
+
+# Groups of related rows: one card in several conditions, so they share a lookup and sort next to each other
+GROUPS = [
+    [("Magic 2011", "149", "Lightning Bolt", "Near Mint", "2"),
+     ("Magic 2011", "149", "Lightning Bolt", "Near Mint Foil", "1"),
+     ("Magic 2011", "149", "Lightning Bolt", "Lightly Played", "3")],
+    [("Guilds of Ravnica", "192", "Niv-Mizzet, Parun", "Near Mint", "1"),
+     ("Guilds of Ravnica", "192", "Niv-Mizzet, Parun", "Near Mint Foil", "1")],
+    [("Magic 2011", "33", "Serra Angel", "Near Mint", "4"),
+     ("Magic 2011", "33", "Serra Angel", "Damaged", "1"),
+     ("Magic 2011", "33", "Serra Angel", "Near Mint Foil", "2"),
+     ("Magic 2011", "33", "Serra Angel", "Moderately Played", "1")],
+    [("Commander 2021", "263", "Sol Ring", "Near Mint", "5"),
+     ("Unknown Set", "1", "Mystery Card", "Near Mint", "1")],
+]
+
+
+@pytest.fixture(scope="module")
+def pull_list(tmp_path_factory):
+    rows = ["TCGplayer Id,Product Line,Set,Number,Product Name,Condition,Quantity"]
+    rows += [f'{131200 + n},Magic,{s},{cn},"{name}",{cond},{qty}'
+             for n, (s, cn, name, cond, qty) in enumerate(row for group in GROUPS for row in group)]
+    rows.append(",Total,,,,,12")
+    path = tmp_path_factory.mktemp("stream") / "pull_list.csv"
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def index():
+    return BulkCardIndex.from_bulk_file(BULK_FILE)
+
+
+def checklist_html(df):
+    out = io.StringIO()
+    write_checklist(df, out)
+    return out.getvalue()
+
+
+@pytest.fixture(scope="module")
+def in_memory(pull_list, index):
+    df, filled, skipped = fill_colors(read_pull_list(pull_list, engine="c"), SET_MAP, bulk_index=index)
+    out = io.BytesIO()
+    write_export(df, out)
+    return out.getvalue().decode(), checklist_html(df), (len(df), filled, skipped)
+
+
+# 2 and 4 cut inside the first and third groups; 11 leaves the trailing Total row alone in the last chunk
+@pytest.mark.parametrize("chunksize", [1, 2, 4, 11, 100])
+def test_chunks_match_the_in_memory_path(pull_list, index, in_memory, tmp_path, chunksize):
+    csv_text, html, counts = in_memory
+    dest = tmp_path / "out.csv"
+    with ChecklistSpill(block_rows=2, dir=str(tmp_path)) as spill:
+        result = enrich_csv_stream(pull_list, str(dest), SET_MAP, chunksize=chunksize, checklist=spill,
+                                   bulk_index=index)
+        out = io.StringIO()
+        spill.write(out)
+    assert result == counts == (sum(map(len, GROUPS)), 10, 1)
+    assert dest.read_text(encoding="utf-8") == csv_text
+    # Ids are written as they were read, although the trailing row's is blank
+    assert "\n131200,Magic," in csv_text
+    assert out.getvalue() == html
+    # The spill's temporary files are gone
+    assert [p.name for p in tmp_path.iterdir()] == ["out.csv"]
+
+
+def test_cards_repeated_across_chunks_are_looked_up_once(mock_scryfall, tmp_path):
+    mock = mock_scryfall()
+    path = tmp_path / "pull_list.csv"
+    generate(300, seed=8).to_csv(path, index=False)
+    # Per-card lookups only: /cards/collection batches are cut at chunk boundaries too, so they'd differ anyway
+    fill_colors(read_pull_list(str(path)), set_code_map(), batch=False, requests_per_second=1000)
+    in_memory = mock.reset_counts()
+    enrich_csv_stream(str(path), str(tmp_path / "out.csv"), set_code_map(), chunksize=40, batch=False,
+                      requests_per_second=1000)
+    assert mock.reset_counts() == in_memory
+
+
+@pytest.fixture
+def enriched():
+    df = generate(300, seed=9).iloc[:-1]
+    df, _, _ = fill_colors(df, set_code_map(), resolved=ResolvedKeys({}))
+    rng = np.random.default_rng(9)
+    df["Color"] = rng.choice(np.array(["W", "U", "Gd", "", None], dtype=object), len(df))
+    # Rows without a set sort last, on a page of their own
+    df["Set"] = df["Set"].astype(object).where(rng.random(len(df)) > 0.05)
+    return df
+
+
+@pytest.mark.parametrize("page_per_set", [False, True])
+def test_spilled_checklists_match_the_in_memory_ones(enriched, tmp_path, page_per_set):
+    with ChecklistSpill(block_rows=3, dir=str(tmp_path)) as spill:
+        for start in range(0, len(enriched), 37):
+            spill.add(enriched.iloc[start:start + 37])
+        spilled = io.StringIO()
+        spill.write(spilled, chunk_rows=7, page_per_set=page_per_set)
+        spilled_paths = spill.write_by_set(str(tmp_path / "spilled"), prefix="list", page_per_set=page_per_set)
+    expected = io.StringIO()
+    write_checklist(enriched, expected, chunk_rows=7, page_per_set=page_per_set)
+    assert spilled.getvalue() == expected.getvalue()
+
+    paths = write_checklists_by_set(enriched, str(tmp_path / "memory"), prefix="list", page_per_set=page_per_set)
+    assert [os.path.basename(p) for p in spilled_paths] == [os.path.basename(p) for p in paths]
+    assert any(p.endswith("list_nan.html") for p in paths)
+    for spilled_path, path in zip(spilled_paths, paths):
+        with open(spilled_path, encoding="utf-8") as a, open(path, encoding="utf-8") as b:
+            assert a.read() == b.read()
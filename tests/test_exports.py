@@ -0,0 +1,76 @@
+"""
+Exports of the enriched pull list: Parquet keeps the categorical columns,
+and gzip CSVs are the same bytes whenever they are written.
+"""
+
+import gzip
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline import (CATEGORY_COLUMNS, ENRICHED_COLUMNS, enrich_csv_stream, export_bytes, fill_colors, read_pull_list,
+                      write_export)
+from scryfall_bulk import BulkCardIndex
+
+BULK_FILE = os.path.join(os.path.dirname(__file__), "fixtures", "bulk-cards.json")
+SET_MAP = {"Magic 2011": "m11", "Guilds of Ravnica": "grn"}
+PULL_LIST = """Product Line,Set,Number,Product Name,Condition,Quantity
+Magic,Magic 2011,149,Lightning Bolt,Near Mint,2
+Magic,Magic 2011,149,Lightning Bolt,Near Mint Foil,1
+Magic,Guilds of Ravnica,192,"Niv-Mizzet, Parun",Lightly Played,1
+Magic,Magic 2011,33,Serra Angel,Near Mint,3
+Magic,Unknown Set,1,Mystery Card,Damaged,1
+Pokemon,Base Set,4,Charizard,Near Mint Holofoil,1
+Total,,,,,9
+"""
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    index = BulkCardIndex.from_bulk_file(BULK_FILE)
+    df, _, _ = fill_colors(read_pull_list(io.BytesIO(PULL_LIST.encode())), SET_MAP, bulk_index=index)
+    return df
+
+
+def test_parquet_keeps_the_categorical_columns(enriched, tmp_path):
+    path = tmp_path / "out.parquet"
+    write_export(enriched, str(path), "parquet")
+    back = pd.read_parquet(path)
+    for col in CATEGORY_COLUMNS + ENRICHED_COLUMNS:
+        if col in enriched:
+            assert isinstance(back[col].dtype, pd.CategoricalDtype), col
+    pd.testing.assert_frame_equal(back, enriched)
+    assert back["Color"].tolist()[:4] == ["R", "R", "Gd", "W"]
+
+
+@pytest.fixture
+def new_day_every_call(clock):
+    """time.time() moving on a day at every call, so a timestamp written anywhere would differ"""
+    clock.step = 24 * 3600
+
+
+def test_csv_gz_is_the_same_bytes_every_time(enriched, tmp_path, new_day_every_call):
+    paths = [tmp_path / "a" / "out.csv.gz", tmp_path / "b" / "out.csv.gz"]
+    for path in paths:
+        os.makedirs(path.parent)
+        write_export(enriched, str(path), "csv.gz")
+    first, second = (path.read_bytes() for path in paths)
+    assert first == second
+    # In memory there's no file name in the header either
+    assert export_bytes(enriched, "csv.gz") == export_bytes(enriched, "csv.gz")
+    assert gzip.decompress(first) == gzip.decompress(export_bytes(enriched, "csv.gz")) == export_bytes(enriched, "csv")
+
+
+def test_streamed_csv_gz_is_the_same_bytes_every_time(tmp_path, new_day_every_call):
+    index = BulkCardIndex.from_bulk_file(BULK_FILE)
+    paths = [tmp_path / "a" / "out.csv.gz", tmp_path / "b" / "out.csv.gz"]
+    for path in paths:
+        os.makedirs(path.parent)
+        enrich_csv_stream(io.BytesIO(PULL_LIST.encode()), str(path), SET_MAP, chunksize=2, bulk_index=index)
+    first, second = (path.read_bytes() for path in paths)
+    assert first == second
+    plain = tmp_path / "out.csv"
+    enrich_csv_stream(io.BytesIO(PULL_LIST.encode()), str(plain), SET_MAP, chunksize=2, bulk_index=index)
+    assert gzip.decompress(first) == plain.read_bytes()
@@ -0,0 +1,102 @@
+"""
+RunMetrics accumulates stage times and per-tier HTTP statistics, serializes
+them with to_dict(), and build_report() carries them as diagnostics.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import instrumentation
+from conftest import Clock
+from instrumentation import RunMetrics
+from pipeline import build_report, fill_colors
+from synthetic import generate, set_code_map
+
+
+@pytest.fixture
+def perf_counter(monkeypatch):
+    clock = Clock(now=0.0)
+    monkeypatch.setattr(instrumentation, "time", SimpleNamespace(perf_counter=clock))
+    return clock
+
+
+def test_stages_accumulate(perf_counter):
+    metrics = RunMetrics()
+    for seconds in (1.5, 2.0):
+        with metrics.stage("row_lookups"):
+            perf_counter.now += seconds
+    with pytest.raises(RuntimeError):
+        with metrics.stage("checklist"):
+            perf_counter.now += 0.25
+            raise RuntimeError("render failed")
+    metrics.record_stage("parse_csv", 3.0)
+    metrics.record_stage("parse_csv", 0.5)
+    assert metrics.to_dict()["stages_seconds"] == {"row_lookups": 3.5, "checklist": 0.25, "parse_csv": 0.5}
+
+
+def test_http_latencies_retries_and_outcomes():
+    metrics = RunMetrics()
+    for seconds, status in [(0.01, 200), (0.05, 200), (0.3, 429), (7.0, 503)]:
+        metrics.record_http("direct", seconds, status)
+    metrics.record_retry("direct")
+    metrics.record_retry("direct")
+    metrics.record_outcome("direct", True, count=3)
+    metrics.record_outcome("direct", False)
+    metrics.record_http("collection", 0.2, 200)
+    metrics.record_outcome("collection", True, count=75)
+    metrics.record_wait(0.4)
+    metrics.record_wait(0)
+    metrics.record_shared()
+
+    assert metrics.to_dict() == {
+        "stages_seconds": {},
+        "http": {
+            "direct": {
+                "calls": 4, "retries": 2, "lookups": 4, "found": 3, "success_rate": 0.75,
+                "statuses": {"200": 2, "429": 1, "503": 1},
+                "latency_ms": {
+                    "mean": 1840.0, "max": 7000.0,
+                    # Bucket bounds are exclusive: 50 ms falls in <100ms
+                    "histogram": {"<50ms": 1, "<100ms": 1, "<250ms": 0, "<500ms": 1, "<1000ms": 0,
+                                  "<2500ms": 0, "<5000ms": 0, ">=5000ms": 1},
+                },
+            },
+            "collection": {
+                "calls": 1, "retries": 0, "lookups": 75, "found": 75, "success_rate": 1.0,
+                "statuses": {"200": 1},
+                "latency_ms": {"mean": 200.0, "max": 200.0, "histogram": {
+                    "<50ms": 0, "<100ms": 0, "<250ms": 1, "<500ms": 0, "<1000ms": 0, "<2500ms": 0, "<5000ms": 0,
+                    ">=5000ms": 0}},
+            },
+        },
+        "http_calls": 5,
+        "retries": 2,
+        "throttle_wait_seconds": 0.4,
+        "shared_lookups": 1,
+    }
+
+
+def test_unused_tier_has_no_rates():
+    metrics = RunMetrics()
+    metrics.record_retry("search_name")
+    tier = metrics.to_dict()["http"]["search_name"]
+    assert tier["success_rate"] is None and tier["latency_ms"]["mean"] is None
+
+
+def test_report_includes_the_runs_diagnostics(mock_scryfall):
+    mock_scryfall()
+    metrics = RunMetrics()
+    stats = {}
+    df, filled, skipped = fill_colors(generate(200, seed=2), set_code_map(), stats=stats, metrics=metrics)
+    report = build_report(len(df), filled, skipped, stats, metrics=metrics)
+
+    assert (report["rows"], report["filled"], report["skipped_or_unknown"]) == (len(df), filled, skipped)
+    assert report["unique_lookups"] == stats["unique_lookups"]
+    diagnostics = report["diagnostics"]
+    assert {"foil_columns", "lookup_keys", "batch_lookup", "broadcast"} <= set(diagnostics["stages_seconds"])
+    collection = diagnostics["http"]["collection"]
+    assert collection["calls"] > 0 and collection["statuses"] == {"200": collection["calls"]}
+    assert collection["lookups"] == stats["unique_lookups"]
+    assert diagnostics["http_calls"] == sum(tier["calls"] for tier in diagnostics["http"].values())
+    assert "diagnostics" not in build_report(len(df), filled, skipped, stats)
@@ -0,0 +1,117 @@
+"""
+TokenBucket enforces its rate and burst size on an injected clock, and
+run_concurrent() returns results in input order, records errors and stops
+starting tasks once it is cancelled.
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import lookup_engine
+from conftest import Clock
+from lookup_engine import LookupCancelled, TokenBucket, run_concurrent
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(now=0.0)
+
+    async def sleep_async(seconds):
+        clock.sleep(seconds)
+
+    # Replaced in lookup_engine only; the event loop keeps the real clock
+    monkeypatch.setattr(lookup_engine, "time", SimpleNamespace(monotonic=clock, sleep=clock.sleep))
+    monkeypatch.setattr(lookup_engine, "asyncio", SimpleNamespace(sleep=sleep_async))
+    return clock
+
+
+def test_burst_is_free_then_requests_are_spaced_by_the_rate(clock):
+    bucket = TokenBucket(rate=5, capacity=3)
+    waits = [bucket.acquire() for _ in range(10)]
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3:] == pytest.approx([0.2] * 7)
+    assert clock.now == pytest.approx(7 / 5)
+    assert bucket.waited == pytest.approx(7 / 5)
+
+
+def test_idle_time_refills_only_up_to_the_capacity(clock):
+    bucket = TokenBucket(rate=10)
+    for _ in range(10):
+        bucket.acquire()
+    clock.now += 60
+    waits = [bucket.acquire() for _ in range(15)]
+    assert waits.count(0) == 10
+    assert sum(waits) == pytest.approx(0.5)
+
+
+def test_rate_holds_over_a_long_run(clock):
+    bucket = TokenBucket(rate=4, capacity=1)
+    for _ in range(101):
+        bucket.acquire()
+    assert clock.now == pytest.approx(25)
+
+
+def test_async_acquire_shares_the_bucket(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    bucket.acquire()
+
+    async def take(n):
+        return [await bucket.acquire_async() for _ in range(n)]
+
+    assert asyncio.run(take(3)) == pytest.approx([0, 0.5, 0.5])
+    assert clock.now == pytest.approx(1)
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_results_come_back_in_input_order():
+    # Later tasks finish first
+    tasks = {f"card-{n}": (n,) for n in range(8)}
+    errors, calls = {}, []
+
+    def fn(n):
+        time.sleep((8 - n) * 0.01)
+        if n == 3:
+            raise RuntimeError("lookup failed")
+        return n * n
+
+    results = run_concurrent(tasks, fn, workers=8, errors=errors,
+                             on_done=lambda task_id, result, done, total: calls.append((task_id, done, total)))
+    assert list(results) == list(tasks)
+    assert results == {f"card-{n}": None if n == 3 else n * n for n in range(8)}
+    assert list(errors) == ["card-3"] and isinstance(errors["card-3"], RuntimeError)
+    # on_done sees the tasks as they finish, counting up to the total
+    assert [task_id for task_id, _, _ in calls] != list(tasks)
+    assert [(done, total) for _, done, total in calls] == [(n, 8) for n in range(1, 9)]
+
+
+def test_cancel_stops_starting_new_tasks():
+    cancel = threading.Event()
+    started, errors, done = [], {}, []
+
+    def fn(n):
+        started.append(n)
+        if n == 0:
+            cancel.set()
+        return n
+
+    results = run_concurrent({n: (n,) for n in range(20)}, fn, workers=1, errors=errors, cancel=cancel,
+                             on_done=lambda task_id, *_: done.append(task_id))
+    # The single worker may already have picked up the next task when the first one finishes
+    assert started in ([0], [0, 1])
+    assert list(results) == list(range(20))
+    assert [results[n] for n in started] == started
+    assert sorted(errors) == list(range(len(started), 20))
+    assert all(isinstance(e, LookupCancelled) for e in errors.values())
+    assert done == started
+
+
+def test_no_tasks():
+    assert run_concurrent({}, lambda: None) == {}
@@ -0,0 +1,87 @@
+"""
+Single-flight lookups shared by concurrent runs through one LookupService,
+including the /cards/collection batches.
+"""
+
+import threading
+
+import pandas as pd
+import pytest
+
+from instrumentation import RunMetrics
+from lookup_service import LookupService
+from pipeline import fill_colors
+from synthetic import generate, set_code_map
+
+
+def run_together(frames, service, **options):
+    """fill_colors() for every frame at once, each on its own thread like app sessions"""
+    results = [None] * len(frames)
+    start = threading.Barrier(len(frames))
+
+    def run(i):
+        metrics = RunMetrics()
+        start.wait()
+        out, filled, _ = fill_colors(frames[i], set_code_map(), service=service, metrics=metrics,
+                                     requests_per_second=1000, **options)
+        results[i] = (out, filled, metrics.to_dict())
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(frames))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+@pytest.mark.parametrize("engine", ["thread", "async"])
+def test_concurrent_runs_batch_each_card_once(mock_scryfall, engine):
+    # Slow enough that every run claims its keys while the first batch is still in flight
+    mock = mock_scryfall(latency=0.2)
+    df = generate(400, seed=21).iloc[:-1]
+    alone, filled, _ = fill_colors(df, set_code_map(), requests_per_second=1000)
+    calls = mock.reset_counts()
+    assert calls["collection"] >= 2
+
+    service = LookupService(requests_per_second=1000)
+    results = run_together([df, df.copy(), df.copy()], service, engine=engine)
+    # The three runs sent the batches and the per-card fallbacks of one run between them
+    assert mock.reset_counts() == calls
+    for out, run_filled, _ in results:
+        pd.testing.assert_series_equal(out["Color"], alone["Color"])
+        assert run_filled == filled
+    assert sum(metrics["shared_lookups"] for _, _, metrics in results) > 0
+    assert service.stats()["in_flight"] == 0
+
+
+def test_overlapping_runs_batch_the_union(mock_scryfall):
+    mock = mock_scryfall(latency=0.2)
+    df = generate(800, seed=22).iloc[:-1]
+    magic = df[df["Product Line"].eq("Magic")]
+    halves = [magic.iloc[:len(magic) * 2 // 3], magic.iloc[len(magic) // 3:]]
+    expected = [fill_colors(half, set_code_map(), requests_per_second=1000)[0] for half in halves]
+    separate = mock.reset_counts()["collection"]
+
+    service = LookupService(requests_per_second=1000)
+    results = run_together(halves, service)
+    keys = magic[magic["Set"].map(set_code_map()).notna()][["Set", "Number"]].drop_duplicates()
+    together = mock.reset_counts()["collection"]
+    # The shared third is batched once: the union of the keys, plus at most one partly filled chunk per run
+    assert together <= -(-len(keys) // 75) + 1 < separate
+    for (out, _, _), want in zip(results, expected):
+        pd.testing.assert_series_equal(out["Color"], want["Color"])
+
+
+def test_cancelled_run_releases_its_claims(mock_scryfall):
+    mock_scryfall()
+    df = generate(100, seed=23).iloc[:-1]
+    service = LookupService(requests_per_second=1000)
+    cancel = threading.Event()
+    cancel.set()
+    stats = {}
+    fill_colors(df, set_code_map(), service=service, cancel=cancel, stats=stats, requests_per_second=1000)
+    assert stats["cancelled"] > 0
+    # Nothing is left claimed for other runs to wait on forever
+    assert service.stats()["in_flight"] == 0
+    out, filled, _ = fill_colors(df, set_code_map(), service=service, requests_per_second=1000)
+    assert filled > 0
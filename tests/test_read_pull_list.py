@@ -0,0 +1,90 @@
+import io
+
+import pandas as pd
+import pytest
+
+from pipeline import NA_VALUES, pa_csv, read_pull_list
+
+pytestmark = pytest.mark.skipif(pa_csv is None, reason="pyarrow is not installed")
+
+HEADER = "Product Line,Set,Number,Product Name"
+CASES = {
+    "short row": f"{HEADER}\nMagic,A,1,X\nMagic,B,2\nTotal,,,\n",
+    "null spellings": f"{HEADER},Note\nMagic,A,None,X,<NA>\nMagic,B,2,None,NA\nTotal,,,,\n",
+    "repeated header": f"{HEADER},Number\nMagic,A,1,X,5\nMagic,B,2,Y,6\nTotal,,,,\n",
+    "date column": f"{HEADER},Set Release Date\nMagic,A,1,X,2024-01-02\nMagic,B,2,Y,\nTotal,,,,\n",
+    "time column": f"{HEADER},At\nMagic,A,1,X,12:30\nMagic,B,2,Y,\nTotal,,,,\n",
+    "booleans": f"{HEADER},Flag,Quantity\nMagic,A,1,X,True,1\nMagic,B,2,Y,false,0\nTotal,,,,,\n",
+    # Inferred, these would be None vs NaN and float64 vs object between the readers
+    "booleans with blanks": f"{HEADER},Flag\nMagic,A,1,X,True\nMagic,B,2,Y,\nMagic,C,3,Z,False\nTotal,,,,\n",
+    "ids beyond int64": f"{HEADER},TCGplayer Id\nMagic,A,1,X,18446744073709551616\nMagic,B,2,Y,-9223372036854775809\n"
+                        "Magic,C,3,Z,\nTotal,,,,\n",
+}
+
+
+@pytest.mark.parametrize("text", CASES.values(), ids=CASES.keys())
+def test_pyarrow_reads_like_the_c_parser(text):
+    arrow = read_pull_list(io.BytesIO(text.encode()), engine="pyarrow")
+    c = read_pull_list(io.BytesIO(text.encode()), engine="c")
+    pd.testing.assert_frame_equal(arrow, c)
+
+
+def test_fallback_rereads_from_the_callers_position():
+    text = f"{HEADER}\nMagic,A,1,X\nMagic,B,2\nTotal,,,\n"
+    source = io.BytesIO(b"junk\n" + text.encode())
+    source.readline()
+    df = read_pull_list(source, engine="pyarrow")
+    assert df["Number"].tolist() == ["1", "2"]
+
+
+class TextStream:
+    """A file-like giving str, without being an io.TextIOBase"""
+
+    def __init__(self, text):
+        self._text = text
+
+    def read(self, size=-1):
+        text, self._text = self._text, ""
+        return text
+
+
+@pytest.mark.parametrize("opener", ["path", "open text", "StringIO", "str file-like"])
+def test_text_streams_are_read(tmp_path, opener):
+    text = f"{HEADER},Condition\nMagic,A,1,X,Near Mint\nMagic,B,02,Y,NA\nTotal,,,,\n"
+    path = tmp_path / "pull_list.csv"
+    path.write_text(text, encoding="utf-8")
+    expected = read_pull_list(io.BytesIO(text.encode()), engine="c")
+    if opener == "path":
+        df = read_pull_list(str(path))
+    elif opener == "open text":
+        with open(path, "r", encoding="utf-8") as f:
+            df = read_pull_list(f)
+    elif opener == "StringIO":
+        df = read_pull_list(io.StringIO(text))
+    else:
+        df = read_pull_list(TextStream(text))
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_na_values_match_pandas_defaults():
+    text = "Product Line,Set,Number,Product Name,Note\n" + "".join(f"Magic,A,1,X,{v}\n" for v in NA_VALUES) + "Total,,,,\n"
+    c = read_pull_list(io.BytesIO(text.encode()), engine="c")
+    assert c["Note"].isna().all()
+    pd.testing.assert_frame_equal(read_pull_list(io.BytesIO(text.encode()), engine="pyarrow"), c)
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "c"])
+def test_blanks_and_big_ids_are_kept_as_text(engine):
+    df = read_pull_list(io.BytesIO(CASES["ids beyond int64"].encode()), engine=engine)
+    assert df["TCGplayer Id"].tolist()[:2] == ["18446744073709551616", "-9223372036854775809"]
+    assert pd.isna(df["TCGplayer Id"].iloc[2]) and df["TCGplayer Id"].iloc[2] is not None
+    df = read_pull_list(io.BytesIO(CASES["booleans with blanks"].encode()), engine=engine)
+    assert df["Flag"].tolist()[::2] == ["True", "False"] and df["Flag"].iloc[1] is not None
+
+
+@pytest.mark.parametrize("usecols", [{"Set", "Product Name"}, {"Number", "Condition", "Not There"}])
+def test_usecols_match_the_c_parser(usecols):
+    text = f"{HEADER},Condition,Quantity\nMagic,A,1,X,Near Mint,2\nMagic,B,2,Y,Damaged,1\nTotal,,,,,3\n"
+    arrow = read_pull_list(io.BytesIO(text.encode()), usecols=usecols, engine="pyarrow")
+    pd.testing.assert_frame_equal(arrow, read_pull_list(io.BytesIO(text.encode()), usecols=usecols, engine="c"))
+    assert set(arrow.columns) == usecols - {"Not There"}
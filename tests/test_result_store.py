@@ -0,0 +1,52 @@
+"""
+ResultStore: least recently used entries are evicted beyond the budget,
+and the entries kept still give their frame, preview and row count.
+"""
+
+import io
+
+import pandas as pd
+
+from pipeline import read_pull_list
+from result_store import PREVIEW_ROWS, ResultStore
+from synthetic import generate
+
+
+def enriched(seed):
+    """A pull list as the app stores it: read from CSV, with a categorical Color column"""
+    df = read_pull_list(io.BytesIO(generate(200, seed=seed).to_csv(index=False).encode()))
+    df["Color"] = pd.Categorical(["W", "U", "B", "R", "G"] * (len(df) // 5))
+    return df
+
+
+def test_least_recently_used_entry_is_evicted():
+    frames = [enriched(seed) for seed in range(4)]
+    sizing = ResultStore()
+    sizing.put_frame(frames[0])
+    # Room for three of these frames, not four
+    store = ResultStore(budget_bytes=int(sizing.used_bytes * 3.5))
+
+    keys = [store.put_frame(df) for df in frames[:3]]
+    assert store.stats()["evictions"] == 0
+    # Reading the oldest makes the second one the least recently used
+    assert store.preview(keys[0])[1] == len(frames[0])
+    keys.append(store.put_frame(frames[3]))
+
+    assert store.stats()["evictions"] == 1
+    assert keys[1] not in store
+    assert store.frame(keys[1]) is None and store.preview(keys[1]) is None
+    for n in (0, 2, 3):
+        preview, rows = store.preview(keys[n])
+        assert rows == len(frames[n])
+        pd.testing.assert_frame_equal(preview, frames[n].head(PREVIEW_ROWS))
+        pd.testing.assert_frame_equal(store.frame(keys[n]), frames[n])
+    assert store.used_bytes <= store.budget_bytes
+
+
+def test_entry_over_budget_is_kept():
+    store = ResultStore(budget_bytes=1)
+    first = store.put_frame(enriched(0))
+    second = store.put_frame(enriched(1))
+    # The newest entry stays for the session using it; older ones go
+    assert first not in store
+    assert store.preview(second)[1] == 200
@@ -0,0 +1,80 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from conftest import FakeIndex
+from pipeline import fill_colors
+from run_memory import RunMemory
+
+
+def test_fixed_set_mapping_is_not_answered_from_memory():
+    df = pd.DataFrame({
+        "Product Line": ["Magic", "Magic", "Total"],
+        "Set": ["Alpha", "Beta", None],
+        "Number": ["1", "2", None],
+        "Product Name": ["A", "B", None],
+        "Condition": ["Near Mint", "Near Mint", None],
+    })
+    index = FakeIndex({"wrong": "G", "beta": "U", "lea": "W"})
+    memory = RunMemory()
+    out, _, _ = fill_colors(df, {"Alpha": "wrong", "Beta": "beta"}, bulk_index=index, reuse=memory)
+    assert out["Color"].tolist()[:2] == ["G", "U"]
+
+    stats = {}
+    out, _, _ = fill_colors(df, {"Alpha": "lea", "Beta": "beta"}, bulk_index=index, reuse=memory, stats=stats)
+    assert out["Color"].tolist()[:2] == ["W", "U"]
+    assert stats["reused_rows"] == 1
+
+
+def fingerprints(*values):
+    return pd.Series(np.array(values, dtype=np.uint64))
+
+
+def test_saves_from_several_sessions_are_merged(tmp_path):
+    path = str(tmp_path / "run_memory.json")
+    seed = RunMemory()
+    seed.remember(fingerprints(1, 2), pd.Series(["W", "U"]))
+    seed.save(path)
+
+    # Two sessions load the file, then each remembers and saves its own rows
+    first, second = RunMemory.load(path), RunMemory.load(path)
+    first.remember(fingerprints(3), pd.Series(["B"]))
+    second.remember(fingerprints(4, 2), pd.Series(["R", "G"]))
+    second.save(path)
+    first.save(path)
+
+    saved = RunMemory.load(path)
+    colors = saved.lookup(fingerprints(1, 2, 3, 4)).tolist()
+    # The first session's stale copy of fingerprint 2 doesn't undo the second session's newer color
+    assert colors == ["W", "G", "B", "R"]
+
+
+def test_forgetting_keeps_other_sessions_results(tmp_path):
+    path = str(tmp_path / "run_memory.json")
+    other = RunMemory()
+    other.remember(fingerprints(1), pd.Series(["W"]))
+    other.save(path)
+
+    session = RunMemory.load(path)
+    session.remember(fingerprints(2), pd.Series(["U"]))
+    session.clear()
+    assert len(session) == 0
+    session.remember(fingerprints(3), pd.Series(["B"]))
+    session.save(path)
+    saved = RunMemory.load(path).lookup(fingerprints(1, 2, 3))
+    assert saved.isna().tolist() == [False, True, False]
+    assert saved.dropna().tolist() == ["W", "B"]
+
+
+def test_concurrent_saves_lose_nothing(tmp_path):
+    path = str(tmp_path / "run_memory.json")
+    sessions = [RunMemory() for _ in range(8)]
+    for i, memory in enumerate(sessions):
+        memory.remember(fingerprints(*range(i * 100, i * 100 + 100)), pd.Series(["C"] * 100))
+    threads = [threading.Thread(target=memory.save, args=(path,)) for memory in sessions]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(RunMemory.load(path)) == 800
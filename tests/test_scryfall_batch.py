@@ -0,0 +1,118 @@
+"""
+/cards/collection batching against the mock Scryfall server: chunking,
+not_found handling and the per-card fallback for what the batch misses
+or couldn't ask about.
+"""
+
+import pandas as pd
+
+import pipeline
+from instrumentation import RunMetrics
+from mock_scryfall import make_card
+from pipeline import color_from_card, fill_colors
+from scryfall_batch import MAX_IDENTIFIERS, resolve_batch
+from synthetic import generate, set_code_map
+
+
+def test_keys_are_sent_in_chunks_of_75(mock_scryfall):
+    mock = mock_scryfall()
+    lookups = {i: ("s001", str(i)) for i in range(1, 201)}
+    chunks = []
+    found, not_found, failed = resolve_batch(lookups, base_url=mock.url, on_chunk=lambda done, total: chunks.append((done, total)))
+    # 75 + 75 + 50; the mock answers 422 to a chunk over 75, which would leave its rows not found
+    assert MAX_IDENTIFIERS == 75
+    assert mock.calls["collection"] == 3
+    assert chunks == [(1, 3), (2, 3), (3, 3)]
+    assert sorted(found) == list(range(1, 201))
+    assert not_found == failed == []
+    assert found[12] == make_card("s001", "12")
+
+
+def test_rows_sharing_a_key_use_one_identifier(mock_scryfall):
+    mock = mock_scryfall()
+    lookups = {i: ("S001", str(i % 75 + 1)) for i in range(300)}
+    found, not_found, failed = resolve_batch(lookups, base_url=mock.url)
+    assert mock.calls["collection"] == 1
+    assert len(found) == 300 and not_found == failed == []
+
+
+def test_not_found_keys_are_returned_for_the_fallback(mock_scryfall):
+    mock = mock_scryfall()
+    lookups = {"plain": ("s001", "5"), "promo": ("s001", "5p"), "no set": ("zzz", "5"), "too high": ("s002", "999")}
+    metrics = RunMetrics()
+    found, not_found, failed = resolve_batch(lookups, base_url=mock.url, metrics=metrics)
+    assert list(found) == ["plain"]
+    assert sorted(not_found) == ["no set", "promo", "too high"]
+    assert failed == []
+    collection = metrics.to_dict()["http"]["collection"]
+    assert (collection["lookups"], collection["found"]) == (4, 1)
+
+
+def test_failed_chunks_leave_every_row_for_the_fallback(mock_scryfall):
+    mock = mock_scryfall(error_rate=1.0)
+    lookups = {i: ("s001", str(i)) for i in range(1, 101)}
+    found, not_found, failed = resolve_batch(lookups, base_url=mock.url)
+    assert found == {} and not_found == []
+    assert sorted(failed) == list(range(1, 101))
+    # Both chunks were retried before giving up
+    assert mock.calls["collection"] == 2 * 5
+
+
+def expected_colors(df, set_map):
+    colors = []
+    for _, row in df.iterrows():
+        code = set_map.get(str(row["Set"]).strip())
+        card = make_card(code, str(row["Number"])) if row["Product Line"] == "Magic" and code else None
+        colors.append(color_from_card(card) if card else "")
+    return colors
+
+
+def test_batch_misses_fall_back_to_per_card_tiers(mock_scryfall):
+    mock = mock_scryfall()
+    df = generate(600, seed=3).iloc[:-1]
+    set_map = set_code_map()
+    metrics = RunMetrics()
+    stats = {}
+    out, filled, skipped = fill_colors(df, set_map, stats=stats, metrics=metrics, requests_per_second=1000)
+
+    keys = df.loc[df["Product Line"].eq("Magic") & df["Set"].map(set_map).notna(), ["Set", "Number", "Product Name"]]
+    unique_keys = keys.drop_duplicates()
+    promos = unique_keys["Number"].str.endswith("p").sum()
+    assert promos > 0
+    calls = mock.reset_counts()
+    assert calls["collection"] == -(-len(unique_keys[["Set", "Number"]].drop_duplicates()) // MAX_IDENTIFIERS)
+    # Promo numbers are listed as not found by the batch, so each skips the direct lookup the batch
+    # already answered and goes on to search by cn, then by name, which finds it
+    assert "direct" not in calls
+    assert calls["search"] == 2 * promos
+    assert out["Color"].astype(object).tolist() == expected_colors(df, set_map)
+    assert filled == len(keys) and stats["lookup_errors"] == stats["rate_limited"] == 0
+    assert skipped == len(df[df["Product Line"].eq("Magic")]) - len(keys)
+
+
+def test_failed_batches_fall_back_to_the_whole_chain(mock_scryfall, monkeypatch):
+    mock = mock_scryfall()
+    df = generate(200, seed=5).iloc[:-1]
+    expected, expected_filled, _ = fill_colors(df, set_code_map(), batch=False, requests_per_second=1000)
+    per_card = mock.reset_counts()
+
+    def failing_batch(lookups, **kwargs):
+        return {}, [], list(lookups)
+
+    monkeypatch.setattr(pipeline, "resolve_batch", failing_batch)
+    out, filled, _ = fill_colors(df, set_code_map(), requests_per_second=1000)
+    # Nothing is known about these keys, so they start at the direct lookup like unbatched ones
+    assert mock.reset_counts() == per_card
+    pd.testing.assert_series_equal(out["Color"], expected["Color"])
+    assert filled == expected_filled
+
+
+def test_batch_and_per_card_lookups_agree(mock_scryfall):
+    mock = mock_scryfall()
+    df = generate(300, seed=4).iloc[:-1]
+    batched, filled, _ = fill_colors(df, set_code_map(), requests_per_second=1000)
+    assert mock.reset_counts()["collection"] > 0
+    per_card, per_card_filled, _ = fill_colors(df, set_code_map(), batch=False, requests_per_second=1000)
+    assert "collection" not in mock.reset_counts()
+    pd.testing.assert_series_equal(batched["Color"], per_card["Color"])
+    assert filled == per_card_filled
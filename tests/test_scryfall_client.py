@@ -0,0 +1,96 @@
+"""
+scryfall_client.request() against a stubbed session: which statuses are
+retried, how long it sleeps between attempts and what it raises.
+"""
+
+import email.utils
+import time
+
+import pytest
+import requests
+
+import scryfall_client
+from scryfall_client import MAX_BACKOFF, RateLimited, request
+
+URL = "https://api.scryfall.example/cards/m11/149"
+
+
+def response(status, retry_after=None):
+    r = requests.Response()
+    r.status_code = status
+    r.url = URL
+    if retry_after is not None:
+        r.headers["Retry-After"] = retry_after
+    return r
+
+
+class StubSession:
+    """Answers with the given responses in turn, recording every call"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(scryfall_client.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_retry_after_in_seconds(sleeps):
+    session = StubSession(response(429, "3"), response(503, "0.5"), response(200))
+    assert request("GET", URL, session=session).status_code == 200
+    assert sleeps == [3.0, 0.5]
+    assert len(session.calls) == 3
+
+
+def test_retry_after_as_an_http_date(sleeps):
+    when = email.utils.formatdate(time.time() + 20, usegmt=True)
+    past = email.utils.formatdate(time.time() - 60, usegmt=True)
+    session = StubSession(response(429, when), response(429, past), response(200))
+    assert request("GET", URL, session=session).status_code == 200
+    # The date has whole-second resolution; a date in the past means no wait
+    assert 18 < sleeps[0] <= 20
+    assert sleeps[1] == 0.0
+
+
+def test_backoff_without_retry_after(sleeps):
+    session = StubSession(response(500), response(502), response(504), response(200))
+    assert request("GET", URL, session=session, backoff=0.5).status_code == 200
+    assert sleeps == [0.5, 1.0, 2.0]
+
+
+def test_waits_are_capped(sleeps):
+    session = StubSession(response(429, "3600"), response(500), response(200))
+    assert request("GET", URL, session=session, backoff=MAX_BACKOFF).status_code == 200
+    assert sleeps == [MAX_BACKOFF, MAX_BACKOFF]
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_throttled_after_the_last_retry_raises(sleeps, status):
+    session = StubSession(*[response(status, "1")] * 3)
+    with pytest.raises(RateLimited) as excinfo:
+        request("GET", URL, session=session, max_retries=2)
+    assert excinfo.value.response.status_code == status
+    assert len(session.calls) == 3
+    # No sleep after the last attempt
+    assert sleeps == [1.0, 1.0]
+
+
+def test_other_server_errors_are_returned(sleeps):
+    session = StubSession(*[response(500)] * 3)
+    assert request("GET", URL, session=session, max_retries=2, backoff=0).status_code == 500
+    assert len(session.calls) == 3
+
+
+def test_not_found_is_returned_without_retrying(sleeps):
+    session = StubSession(response(404))
+    assert request("GET", URL, session=session).status_code == 404
+    assert len(session.calls) == 1
+    assert sleeps == []
@@ -0,0 +1,123 @@
+"""
+Building set_code_map.json from fixture set lists: Scryfall's duplicate-name
+rules, the TCGplayer file formats and how the sources are merged, through
+set_map_builder and both scripts.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+from set_map_builder import (DEFAULT_TCGPLAYER_FILES, combine_mappings, fold_in, is_magic_set, load_sets_file,
+                             read_tcgplayer_mapping, scryfall_name_map)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+SETS_FILE = os.path.join(FIXTURES, "scryfall_sets.json")
+SIMPLE_FILE, DETAILED_FILE = (os.path.join(FIXTURES, name) for name in DEFAULT_TCGPLAYER_FILES)
+
+SCRYFALL_MAP = {
+    "Magic 2011": "m11",
+    "Guilds of Ravnica": "grn",
+    "The List": "ulst",
+    "Media Inserts": "pmei2",
+    "Portal Three Kingdoms": "ptk",
+}
+TCGPLAYER_MAP = {
+    "Magic 2011": "M11",
+    "Guilds of Ravnica": "gk1",
+    "M11 Prerelease Promos": "pm11",
+    "30th Anniversary Edition": "30a",
+    "The List Reprints": "plst",
+    "Portal: Three Kingdoms": "ptk",
+    "Mystery Booster": "mb1",
+}
+MERGED_MAP = {
+    **SCRYFALL_MAP,
+    "M11 Prerelease Promos": "pm11",
+    "30th Anniversary Edition": "30a",
+    "The List Reprints": "plst",
+    "Portal: Three Kingdoms": "ptk",
+    "Mystery Booster": "mb1",
+}
+
+
+@pytest.fixture(scope="module")
+def magic_sets():
+    return [s for s in load_sets_file(SETS_FILE) if is_magic_set(s)]
+
+
+def test_magic_sets(magic_sets):
+    # Tokens, memorabilia without a game field and other games are dropped
+    assert [s["code"] for s in magic_sets] == ["m11", "grn", "plst", "ulst", "pmei", "pmei2", "pmei3", "ptk", ""]
+
+
+def test_scryfall_duplicate_names(magic_sets):
+    # A dated set beats an undated one, then the newest release wins; sets without a code are left out
+    assert scryfall_name_map(magic_sets) == SCRYFALL_MAP
+    assert scryfall_name_map(list(reversed(magic_sets))) == SCRYFALL_MAP
+
+
+def test_read_tcgplayer_formats(tmp_path):
+    assert read_tcgplayer_mapping(SIMPLE_FILE) == {
+        "Magic 2011": "M11",
+        "Guilds of Ravnica": "gk1",
+        "M11 Prerelease Promos": "pm11",
+        "30th Anniversary Edition": "30a",
+        "The List Reprints": "plst",
+    }
+    # Detailed entries fall back to the lowercased TCGplayer code
+    assert read_tcgplayer_mapping(DETAILED_FILE) == {
+        "M11 Prerelease Promos": "ppm11",
+        "Portal: Three Kingdoms": "ptk",
+        "Mystery Booster": "mb1",
+    }
+    for bad in (["Magic 2011", "m11"], {"Magic 2011": {"match_type": "none"}}, {"Magic 2011": 3}):
+        path = tmp_path / "bad.json"
+        path.write_text(json.dumps(bad), encoding="utf-8")
+        with pytest.raises(ValueError):
+            read_tcgplayer_mapping(str(path))
+
+
+def test_combine_mappings_first_file_wins():
+    combined = combine_mappings([read_tcgplayer_mapping(SIMPLE_FILE), read_tcgplayer_mapping(DETAILED_FILE)])
+    assert combined == TCGPLAYER_MAP
+
+
+def test_fold_in_keeps_scryfall_codes():
+    mapping = dict(SCRYFALL_MAP)
+    added, conflicts = fold_in(mapping, TCGPLAYER_MAP)
+    assert mapping == MERGED_MAP
+    assert added == 5
+    # Codes differing only in case aren't conflicts
+    assert conflicts == [("Guilds of Ravnica", "grn", "gk1")]
+
+
+def run_script(cwd, script, *args):
+    subprocess.run([sys.executable, os.path.join(ROOT, script), "--sets-file", SETS_FILE, *args],
+                   cwd=cwd, check=True, capture_output=True)
+    with open(os.path.join(cwd, "set_code_map.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("script", ["merge_set_sources.py", "update_set_codes.py"])
+def test_scripts_build_the_same_map(tmp_path, script):
+    # Both scripts pick up the TCGplayer files in the working directory by default
+    for path in (SIMPLE_FILE, DETAILED_FILE):
+        shutil.copy(path, tmp_path)
+    assert run_script(tmp_path, script) == MERGED_MAP
+    assert run_script(tmp_path, script, "--no-tcgplayer") == SCRYFALL_MAP
+
+
+def test_merge_explicit_tcgplayer_files(tmp_path):
+    # Given explicitly, the earlier file wins for a name both have
+    merged = run_script(tmp_path, "merge_set_sources.py", "--tcgplayer-file", DETAILED_FILE,
+                        "--tcgplayer-file", SIMPLE_FILE)
+    assert merged == {**MERGED_MAP, "M11 Prerelease Promos": "ppm11"}
+    merged = run_script(tmp_path, "merge_set_sources.py", "--tcgplayer-file", SIMPLE_FILE)
+    assert merged == {name: code for name, code in MERGED_MAP.items()
+                      if name not in ("Portal: Three Kingdoms", "Mystery Booster")}
@@ -0,0 +1,206 @@
+"""
+The vectorized foil, holofoil, lookup-key, fingerprint and checklist-order
+code checked against a frozen copy of the row-wise (.apply / iterrows)
+implementation it replaced, and one lookup per unique card key.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import FakeIndex
+from pipeline import FINGERPRINT_COLUMNS, clean_cn, color_from_card, fill_colors, row_fingerprints, sort_checklist
+from synthetic import generate, set_code_map
+
+
+# ---------- Frozen row-wise implementation ----------
+
+def legacy_is_foil(condition):
+    """Check if condition indicates foil - returns '*' for foil, '' for non-foil"""
+    if pd.isna(condition):
+        return ""
+    condition_str = str(condition).lower()
+    return "*" if "foil" in condition_str else ""
+
+
+def legacy_pokemon_holofoil_type(condition, product_line):
+    """For Pokemon cards, detect if holofoil or reverse holofoil. Returns 'RH' for reverse, 'H' for holofoil, '' for non-foil"""
+    if pd.isna(condition) or pd.isna(product_line):
+        return ""
+    product_line_str = str(product_line).strip()
+    if product_line_str not in ["Pokemon", "Pokemon Japan"]:
+        return ""
+    condition_str = str(condition).lower()
+    if "reverse holofoil" in condition_str:
+        return "RH"
+    if "holofoil" in condition_str:
+        return "H"
+    return ""
+
+
+def legacy_fill_colors(df, set_map, fetch_card):
+    df = df.copy()
+    if "Color" not in df.columns:
+        df["Color"] = ""
+
+    if "Condition" in df.columns:
+        df["Foil"] = df["Condition"].apply(legacy_is_foil)
+        df["Is Foil"] = df["Condition"].apply(lambda x: "Yes" if "foil" in str(x).lower() else "No" if not pd.isna(x) else "No")
+        if "Product Line" in df.columns:
+            df["Pokemon Holofoil"] = df.apply(lambda row: legacy_pokemon_holofoil_type(row.get("Condition", ""), row.get("Product Line", "")), axis=1)
+        else:
+            df["Pokemon Holofoil"] = ""
+    else:
+        df["Foil"] = ""
+        df["Is Foil"] = "No"
+        df["Pokemon Holofoil"] = ""
+
+    magic_mask = df["Product Line"].astype(str).str.strip().eq("Magic")
+    candidates = df[magic_mask].copy()
+
+    filled = 0
+    skipped = 0
+    for idx, row in candidates.iterrows():
+        set_name = str(row.get("Set", "")).strip()
+        set_code = set_map.get(set_name)
+        cn = clean_cn(row.get("Number", ""))
+        name = str(row.get("Product Name", "")).strip()
+        if not set_code or not cn:
+            skipped += 1
+            continue
+        card = fetch_card(set_code, cn, name)
+        if card:
+            df.at[idx, "Color"] = color_from_card(card)
+            filled += 1
+        else:
+            skipped += 1
+    return df, filled, skipped
+
+
+def legacy_row_fingerprints(df):
+    rows = []
+    for _, row in df.iterrows():
+        parts = [str(row[col]).strip() if col in df.columns else "" for col in FINGERPRINT_COLUMNS]
+        parts[FINGERPRINT_COLUMNS.index("Number")] = clean_cn(parts[FINGERPRINT_COLUMNS.index("Number")])
+        rows.append(parts)
+    return pd.util.hash_pandas_object(pd.DataFrame(rows, columns=FINGERPRINT_COLUMNS, index=df.index, dtype=object),
+                                      index=False)
+
+
+def legacy_checklist_order(df):
+    cols = ["Product Name", "Quantity", "Color", "Number", "Set", "Product Line"]
+    safe_df = df.copy()
+    for c in cols:
+        if c not in safe_df.columns:
+            safe_df[c] = ""
+    if "Foil" not in safe_df.columns:
+        safe_df["Foil"] = ""
+    if "Pokemon Holofoil" not in safe_df.columns:
+        safe_df["Pokemon Holofoil"] = ""
+    out = safe_df[cols + ["Foil", "Pokemon Holofoil"]].copy()
+
+    def get_foil_sort_key(row):
+        foil_type = str(row.get("Pokemon Holofoil", "")).strip()
+        has_foil = str(row.get("Foil", "")).strip() != ""
+        if foil_type == "RH":
+            return 3
+        elif foil_type == "H":
+            return 2
+        elif has_foil:
+            return 1
+        else:
+            return 0
+
+    out["_foil_sort"] = out.apply(get_foil_sort_key, axis=1)
+    out = out.sort_values(by=["Set", "_foil_sort", "Product Name", "Color"], ascending=[True, True, True, True],
+                          na_position="last")
+    return out.drop(columns=["_foil_sort"])
+
+
+# ---------- Fixtures ----------
+
+EDGE_ROWS = [
+    # Blank, whitespace-only, missing and float collector numbers
+    {"Product Line": "Magic", "Set": "Synthetic Set 001", "Product Name": "Blank", "Number": "", "Condition": "Near Mint"},
+    {"Product Line": "Magic", "Set": "Synthetic Set 001", "Product Name": "Spaces", "Number": "  ", "Condition": "Near Mint"},
+    {"Product Line": "Magic", "Set": "Synthetic Set 002", "Product Name": "Missing", "Number": np.nan, "Condition": "Near Mint Foil"},
+    {"Product Line": "Magic", "Set": "Synthetic Set 002", "Product Name": "Float", "Number": 12.0, "Condition": "near mint FOIL"},
+    {"Product Line": " Magic ", "Set": " Synthetic Set 003 ", "Product Name": " Padded ", "Number": " 7 ", "Condition": np.nan},
+    # Unmapped set, odd conditions and product lines
+    {"Product Line": "Magic", "Set": "Not A Set", "Product Name": "Unmapped", "Number": "3", "Condition": 5},
+    {"Product Line": "Pokemon Japan ", "Set": "Base", "Product Name": "Pika", "Number": "25", "Condition": "Near Mint Reverse Holofoil - Japanese"},
+    {"Product Line": "Pokemon", "Set": "Base", "Product Name": "Char", "Number": "4", "Condition": np.nan},
+    {"Product Line": np.nan, "Set": "Base", "Product Name": "Nothing", "Number": "1", "Condition": "Holofoil"},
+]
+
+
+def pull_list(rows=400, seed=7, drop=()):
+    df = generate(rows, seed=seed).iloc[:-1]
+    df = pd.concat([df, pd.DataFrame(EDGE_ROWS)], ignore_index=True)
+    return df.drop(columns=list(drop))
+
+
+CASES = {
+    "all columns": {},
+    "no Condition": {"drop": ["Condition"]},
+    "no Quantity or Rarity": {"drop": ["Quantity", "Rarity"]},
+}
+
+
+# ---------- Tests ----------
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_fill_colors_matches_row_wise(options):
+    df = pull_list(**options)
+    expected, expected_filled, expected_skipped = legacy_fill_colors(df, set_code_map(), FakeIndex().lookup)
+    result, filled, skipped = fill_colors(df, set_code_map(), bulk_index=FakeIndex())
+    assert (filled, skipped) == (expected_filled, expected_skipped)
+    for col in ["Color", "Foil", "Is Foil", "Pokemon Holofoil"]:
+        assert result[col].astype(object).tolist() == expected[col].astype(object).tolist(), col
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_row_fingerprints_match_row_wise(options):
+    df = pull_list(**options)
+    df = df[df.columns.intersection(FINGERPRINT_COLUMNS)]
+    pd.testing.assert_series_equal(row_fingerprints(df), legacy_row_fingerprints(df))
+
+
+def test_float_and_text_collector_numbers_fingerprint_alike():
+    text = pd.DataFrame({"Set": ["A"], "Number": ["12"], "Product Name": ["X"], "Condition": ["Near Mint"]})
+    floats = text.assign(Number=[12.0])
+    assert row_fingerprints(text).tolist() == row_fingerprints(floats).tolist()
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_checklist_order_matches_row_wise(options):
+    result, _, _ = fill_colors(pull_list(**options), set_code_map(), bulk_index=FakeIndex())
+    plain = result.astype(object)
+    assert sort_checklist(plain).index.tolist() == legacy_checklist_order(plain).index.tolist()
+    assert sort_checklist(result).index.tolist() == legacy_checklist_order(plain).index.tolist()
+
+
+def test_repeated_cards_are_looked_up_once():
+    rows = [
+        ("Synthetic Set 001", "12", "Card A", "Near Mint"),
+        ("Synthetic Set 001", "12", "Card A", "Near Mint Foil"),
+        ("Synthetic Set 001", 12.0, "Card A", "Damaged"),
+        (" Synthetic Set 001 ", " 12 ", "Card A", "Lightly Played"),
+        ("Synthetic Set 001", "13", "Card B", "Near Mint"),
+        ("Synthetic Set 002", "12", "Card C", "Near Mint"),
+        ("Synthetic Set 002", "12", "Card C", "Near Mint Foil"),
+    ]
+    df = pd.DataFrame([{"Product Line": "Magic", "Set": s, "Number": cn, "Product Name": name, "Condition": cond}
+                       for s, cn, name, cond in rows])
+    df = pd.concat([df, pd.DataFrame([{"Product Line": "Pokemon", "Set": "Base", "Number": "12",
+                                       "Product Name": "Pika", "Condition": "Holofoil"}])], ignore_index=True)
+    index = FakeIndex()
+    stats = {}
+    result, filled, skipped = fill_colors(df, set_code_map(), bulk_index=index, stats=stats)
+
+    assert sorted(index.calls) == [("s001", "12", "Card A"), ("s001", "13", "Card B"), ("s002", "12", "Card C")]
+    assert (stats["unique_lookups"], stats["lookup_rows"]) == (3, 7)
+    assert (filled, skipped) == (7, 0)
+    expected = color_from_card(FakeIndex().lookup("s001", "12", "Card A"))
+    assert result["Color"].tolist()[:4] == [expected] * 4
+    assert result["Color"].iloc[5] == result["Color"].iloc[6] != ""
@@ -3,40 +3,49 @@
 Script to fetch Magic: The Gathering set codes from Scryfall API
 and generate/update set_code_map.json
 
+The simple mapping folds in the TCGplayer mapping files
+(tcgplayer_code_to_scryfall_code.json, tcgplayer_to_scryfall.json) where
+present, the same way merge_set_sources.py does, so running either script
+leaves the same set_code_map.json.
+
 Scryfall API provides:
 - Set codes (used for API lookups)
 - Set names (used in TCGplayer CSVs)
 - TCGplayer IDs (for reference)
 
+The /sets response is cached in scryfall_sets_cache.json; later runs send
+a conditional request and skip the download when nothing has changed.
+
 Usage:
-    python update_set_codes.py [--output OUTPUT_FILE] [--format FORMAT]
+    python update_set_codes.py [--output OUTPUT_FILE] [--format FORMAT] [--no-tcgplayer] [--sets-file FILE | --refresh]
 
 Options:
     --output: Output file path (default: set_code_map.json)
     --format: Output format - 'simple' (name->code) or 'detailed' (full info) (default: simple)
+    --no-tcgplayer: Scryfall names only; don't fold in the TCGplayer mapping files
+    --sets-cache: Where the /sets response is cached (default: scryfall_sets_cache.json)
+    --refresh: Download the set list even if the cached copy is current
+    --sets-file: Build from a saved set list instead of calling the API
 """
 
 import json
+import os
 import requests
 import argparse
 import sys
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from datetime import datetime
 
-SCRYFALL_SETS_URL = "https://api.scryfall.com/sets"
+from set_map_builder import (DEFAULT_SETS_CACHE, DEFAULT_TCGPLAYER_FILES, combine_mappings, fetch_sets, fold_in,
+                             is_magic_set, load_sets_file, read_tcgplayer_mapping, scryfall_name_map)
 
-def fetch_scryfall_sets() -> List[Dict[str, Any]]:
-    """Fetch all sets from Scryfall API"""
+def fetch_scryfall_sets(cache_path: Optional[str] = DEFAULT_SETS_CACHE, refresh: bool = False) -> List[Dict[str, Any]]:
+    """Fetch all sets from Scryfall API, reusing the cached list if it hasn't changed"""
     print("Fetching sets from Scryfall API...")
     try:
-        response = requests.get(SCRYFALL_SETS_URL, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get("object") != "list":
-            raise ValueError("Unexpected response format from Scryfall API")
-        
-        sets = data.get("data", [])
+        sets, changed = fetch_sets(cache_path, refresh=refresh)
+        if not changed:
+            print(f"Set list unchanged since last fetch, using {cache_path}")
         print(f"Found {len(sets)} sets from Scryfall")
         return sets
     except requests.RequestException as e:
@@ -46,47 +55,57 @@ def fetch_scryfall_sets() -> List[Dict[str, Any]]:
         print(f"Error processing Scryfall data: {e}", file=sys.stderr)
         sys.exit(1)
 
+def load_scryfall_sets(args) -> List[Dict[str, Any]]:
+    """Sets from --sets-file if given, otherwise from the API (see add_sets_arguments)"""
+    if not args.sets_file:
+        return fetch_scryfall_sets(args.sets_cache, refresh=args.refresh)
+    try:
+        sets = load_sets_file(args.sets_file)
+    except (OSError, ValueError) as e:
+        print(f"Error loading sets from {args.sets_file}: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Loaded {len(sets)} sets from {args.sets_file}")
+    return sets
+
+def add_sets_arguments(parser: argparse.ArgumentParser):
+    """Options for where the Scryfall set list comes from, shared with merge_set_sources.py"""
+    parser.add_argument(
+        "--sets-cache",
+        default=DEFAULT_SETS_CACHE,
+        help=f"Cache file for the Scryfall set list and its ETag (default: {DEFAULT_SETS_CACHE})"
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Download the set list even if the cached copy is current"
+    )
+    parser.add_argument(
+        "--sets-file",
+        help="Build from a saved set list (a /sets response or JSON list) instead of calling the API"
+    )
+
 def filter_magic_sets(sets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Filter to only Magic: The Gathering sets"""
-    magic_sets = []
-    for s in sets:
-        # Scryfall includes other games, filter to Magic only
-        game = s.get("game", "").lower()
-        if game == "mtg" or game == "magic":
-            magic_sets.append(s)
-        # Some sets might not have game field but are MTG
-        elif not game and s.get("set_type") not in ["token", "memorabilia"]:
-            magic_sets.append(s)
+    magic_sets = [s for s in sets if is_magic_set(s)]
     
     print(f"Filtered to {len(magic_sets)} Magic: The Gathering sets")
     return magic_sets
 
 def create_simple_mapping(sets: List[Dict[str, Any]]) -> Dict[str, str]:
     """Create simple name->code mapping (for set_code_map.json format)"""
-    mapping = {}
-    
-    for s in sets:
-        name = s.get("name", "").strip()
-        code = s.get("code", "").strip()
-        
-        if name and code:
-            # Handle duplicates - prefer the most recent or most relevant set
-            if name not in mapping:
-                mapping[name] = code
-            else:
-                # If duplicate, prefer the one with a release date (more official)
-                existing_code = mapping[name]
-                existing_set = next((x for x in sets if x.get("code") == existing_code), None)
-                current_set = s
-                
-                # Prefer set with release date, or newer set
-                if current_set.get("released_at") and not existing_set.get("released_at"):
-                    mapping[name] = code
-                elif current_set.get("released_at") and existing_set.get("released_at"):
-                    # Both have dates, prefer newer
-                    if current_set.get("released_at") > existing_set.get("released_at"):
-                        mapping[name] = code
-    
+    # Duplicate names prefer the set with a release date, then the newer set
+    return scryfall_name_map(sets)
+
+def add_tcgplayer_names(mapping: Dict[str, str], paths: List[str]) -> Dict[str, str]:
+    """Fold in TCGplayer names Scryfall doesn't use, as merge_set_sources.py does; unreadable files are skipped"""
+    mappings = []
+    for path in paths:
+        try:
+            mappings.append(read_tcgplayer_mapping(path))
+        except (OSError, ValueError) as e:
+            print(f"Skipping TCGplayer file {path}: {e}", file=sys.stderr)
+    added, _ = fold_in(mapping, combine_mappings(mappings))
+    print(f"Added {added} TCGplayer set names from {', '.join(paths)}")
     return mapping
 
 def create_detailed_mapping(sets: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
@@ -145,25 +164,34 @@ def main():
         action="store_true",
         help="Create a backup of existing output file before overwriting"
     )
+    parser.add_argument(
+        "--no-tcgplayer",
+        action="store_true",
+        help="Simple format from Scryfall names only, without the TCGplayer mapping files"
+    )
+    add_sets_arguments(parser)
     
     args = parser.parse_args()
     
     # Backup existing file if requested
     if args.backup:
         import shutil
-        import os
         if os.path.exists(args.output):
             backup_name = f"{args.output}.backup.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             shutil.copy2(args.output, backup_name)
             print(f"Created backup: {backup_name}")
     
     # Fetch sets from Scryfall
-    all_sets = fetch_scryfall_sets()
+    all_sets = load_scryfall_sets(args)
     magic_sets = filter_magic_sets(all_sets)
     
     # Create mapping based on format
     if args.format == "simple":
         mapping = create_simple_mapping(magic_sets)
+        # Same names as merge_set_sources.py, so neither script drops the other's entries
+        tcgplayer_files = [] if args.no_tcgplayer else [path for path in DEFAULT_TCGPLAYER_FILES if os.path.exists(path)]
+        if tcgplayer_files:
+            add_tcgplayer_names(mapping, tcgplayer_files)
     else:
         mapping = create_detailed_mapping(magic_sets)
     